@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from typing import Dict, Any
+from app.services.admission import admission_controller
+
+router = APIRouter()
+
+@router.get("/admission/stats")
+async def get_admission_stats() -> Dict[str, Any]:
+    """
+    Get admission control state for this worker: units in use, queue depth
+    per priority class, and requests admitted or rejected by reason.
+    """
+    return admission_controller.stats()
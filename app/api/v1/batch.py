@@ -1,67 +1,199 @@
-from fastapi import APIRouter, HTTPException
-from app.models.requests import BatchCrawlRequest
-from app.models.responses import BatchCrawlResponse, JobStatus
-from app.services.crawler import CrawlerService
-from datetime import datetime
-import uuid
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import Annotated, Any, AsyncIterator, Optional
+from app.config import settings
+from app.models.requests import (
+    BatchCrawlRequest, SiteCrawlRequest, StreamShape, ResultsPageQuery, URLResultQuery
+)
+from app.models.responses import JobStatus, URLResult, URLError, SitePagesResponse, BatchResultsPage
+from app.services.admission import admission_controller, AdmissionRejected, Ticket, BATCH
+from app.services.crawler import crawler_service
+from app.services.executor import postprocess_executor, ExecutorSaturatedError
+from app.services.payload import encode_json, encode_model, encode_results_page
+from app.services.jobs import job_store, job_worker
+from app.services.sinks import check_sink, SinkError
+from app.services import metrics
+import asyncio
 
 router = APIRouter()
-crawler_service = CrawlerService()
-jobs = {}
 
-@router.post("/crawl/batch", response_model=JobStatus)
+@router.post("/crawl/batch", response_model=JobStatus, status_code=202)
 async def start_batch_crawl(request: BatchCrawlRequest):
     """
-    Start a batch crawling job for multiple URLs.
-    Returns a job ID that can be used to check the status.
-    """
-    job_id = str(uuid.uuid4())
-    
-    # Create initial job status
-    status = JobStatus(
-        job_id=job_id,
-        status="pending",
-        progress=0.0,
-        message="Job started"
-    )
-    jobs[job_id] = status
-    
+    Queue a batch crawling job for multiple URLs.
+    Returns immediately with a job ID that can be used to check the status.
+    With a sink, results are written to files and the finished status
+    points at their manifest instead.
+    """
+    if request.sink is not None:
+        try:
+            check_sink(request.sink)
+        except SinkError as e:
+            raise HTTPException(status_code=422, detail=str(e))
     try:
-        # Start the crawling process
-        result = await crawler_service.crawl_batch(request)
-        
-        # Update job status with results
-        status.status = "completed"
-        status.progress = 100.0
-        status.message = f"Successfully crawled {len(result.successful_urls)} URLs"
-        status.result = result.dict()
-        status.updated_at = datetime.utcnow()
-        
-        return status
+        return await asyncio.to_thread(job_store.enqueue, request)
     except Exception as e:
-        # Update job status with error
-        status.status = "failed"
-        status.message = str(e)
-        status.updated_at = datetime.utcnow()
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/crawl/batch/{job_id}", response_model=JobStatus)
 async def get_batch_status(job_id: str):
     """
-    Get the status of a batch crawling job.
+    Get the status of a batch crawling job: progress counters and, once done,
+    the batch metadata. Per-URL results are paged from /crawl/batch/{job_id}/results.
+    """
+    status = await asyncio.to_thread(job_store.get, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+def _reject_sink_job(status: JobStatus) -> None:
+    sink = (status.result or {}).get("sink")
+    if sink is not None:
+        raise HTTPException(status_code=409, detail=f"Results of this job were written to a sink; see {sink['manifest_uri']}")
+
+@router.get("/crawl/batch/{job_id}/results", response_model=BatchResultsPage)
+async def get_batch_results(job_id: str, query: Annotated[ResultsPageQuery, Query()]):
+    """
+    Page through the results of a finished batch in request order, optionally
+    only succeeded or failed URLs, with the same field selection and
+    truncation options as /crawl.
+    """
+    status = await asyncio.to_thread(job_store.get, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    _reject_sink_job(status)
+    ok = {"all": None, "succeeded": True, "failed": False}[query.status]
+    total, rows = await asyncio.to_thread(job_store.results, job_id, query.offset, query.limit, ok)
+    header = {"job_id": job_id, "offset": query.offset, "limit": query.limit, "total": total}
+    try:
+        # Stored results are spliced in as-is unless fields are selected or cut
+        with metrics.stage(metrics.SERIALIZATION):
+            body = await postprocess_executor.run(
+                encode_results_page, header, [(bool(row["ok"]), row["payload"]) for row in rows], query
+            )
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return Response(content=body, media_type="application/json")
+
+@router.get("/crawl/batch/{job_id}/result")
+async def get_batch_url_result(job_id: str, query: Annotated[URLResultQuery, Query()]):
+    """
+    Get the result (a URLResult or a URLError) of one URL of a finished batch.
+    """
+    row = await asyncio.to_thread(job_store.result_for, job_id, str(query.url))
+    if row is None:
+        status = await asyncio.to_thread(job_store.get, job_id)
+        if status is not None:
+            _reject_sink_job(status)
+        raise HTTPException(status_code=404, detail="No result for this URL in the job")
+    body = encode_json(row["payload"], query) if row["ok"] else row["payload"].encode("utf-8")
+    return Response(content=body, media_type="application/json")
+
+@router.delete("/crawl/batch/{job_id}", response_model=JobStatus)
+async def cancel_batch_crawl(job_id: str):
+    """
+    Cancel a batch crawling job. Pending jobs are cancelled immediately;
+    running jobs stop at the next progress update.
+    """
+    status = await asyncio.to_thread(job_store.cancel, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+@router.post("/crawl/site", response_model=JobStatus, status_code=202)
+async def start_site_crawl(request: SiteCrawlRequest):
+    """
+    Queue a site crawl that starts from the seed URLs (and optionally their
+    sitemaps) and follows in-scope links up to max_depth and max_pages.
+    Poll it like a batch job; pages are listed by /crawl/site/{job_id}/pages.
     """
-    if job_id not in jobs:
+    try:
+        return await asyncio.to_thread(job_store.enqueue, request)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/crawl/site/{job_id}", response_model=JobStatus)
+async def get_site_crawl_status(job_id: str):
+    """
+    Get the status of a site crawl; the result holds the crawl summary.
+    """
+    status = await asyncio.to_thread(job_store.get, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+@router.get("/crawl/site/{job_id}/pages", response_model=SitePagesResponse)
+async def get_site_crawl_pages(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    Page through the results of a site crawl in crawl order.
+    Available while the crawl runs and until the job expires.
+    """
+    if await asyncio.to_thread(job_store.get, job_id) is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    
-    status = jobs[job_id]
-    if isinstance(status, JobStatus):
-        return status
-    
-    # Handle legacy job format
-    return JobStatus(
-        job_id=job_id,
-        status=status.get("status", "unknown"),
-        progress=100.0 if status.get("status") == "completed" else 0.0,
-        result=status.get("result"),
-        message=status.get("error", "Processing")
+    total, pages = await asyncio.to_thread(job_worker.site_crawler.store.pages, job_id, offset, limit)
+    return SitePagesResponse(job_id=job_id, offset=offset, limit=limit, total=total, pages=pages)
+
+def _event_type(item) -> str:
+    if isinstance(item, URLResult):
+        return "result"
+    if isinstance(item, URLError):
+        return "error"
+    return "metadata"
+
+async def _encode_stream(request: BatchCrawlRequest, shape: StreamShape) -> AsyncIterator[str]:
+    async for item in crawler_service.crawl_batch_stream(request):
+        event = _event_type(item)
+        with metrics.stage(metrics.SERIALIZATION):
+            if isinstance(item, URLResult):
+                payload = encode_model(item, shape).decode("utf-8")
+            else:
+                payload = item.model_dump_json()
+        if shape.format == "sse":
+            yield f"event: {event}\ndata: {payload}\n\n"
+        else:
+            yield f'{{"type": "{event}", "data": {payload}}}\n'
+
+class _AdmittedStream(StreamingResponse):
+    """Streaming response that hands its admission units back however the stream ends"""
+
+    def __init__(self, ticket: Ticket, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.ticket = ticket
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.ticket.release()
+
+@router.post("/crawl/batch/stream")
+async def stream_batch_crawl(
+    request: BatchCrawlRequest,
+    shape: Annotated[StreamShape, Query()],
+    api_key: Optional[str] = Header(None, alias=settings.admission_api_key_header)
+):
+    """
+    Crawl multiple URLs and stream each result as soon as it completes,
+    as NDJSON lines or server-sent events, followed by a BatchMetadata trailer.
+    The batch runs at most at the concurrency admission control granted it.
+    Results honor the field selection and truncation options of /crawl.
+    """
+    if request.sink is not None:
+        raise HTTPException(status_code=422, detail="A sink is only supported for queued batch jobs")
+    units = admission_controller.batch_units(len(request.urls), request.global_concurrent_limit)
+    try:
+        ticket = await admission_controller.acquire(units, BATCH, api_key)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+    request.global_concurrent_limit = ticket.units
+    media_type = "text/event-stream" if shape.format == "sse" else "application/x-ndjson"
+    return _AdmittedStream(
+        ticket,
+        _encode_stream(request, shape),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
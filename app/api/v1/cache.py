@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from typing import Dict, Any
+from app.services.cache import response_cache
+from app.services.crawler import inflight_crawls
+
+router = APIRouter()
+
+@router.get("/cache/stats")
+async def get_cache_stats() -> Dict[str, Any]:
+    """
+    Get response cache hit/miss counters and tier sizes, plus how many
+    concurrent identical crawls were coalesced.
+    """
+    stats = await response_cache.stats()
+    stats["coalescing"] = inflight_crawls.stats()
+    return stats
+
+@router.delete("/cache")
+async def clear_cache() -> Dict[str, str]:
+    """
+    Drop every cached crawl response from the memory and disk tiers.
+    """
+    await response_cache.clear()
+    return {"status": "cleared"}
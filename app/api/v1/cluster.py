@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from typing import Any, Dict
+from app.services.cluster import cluster_coordinator
+
+router = APIRouter()
+
+@router.get("/cluster/stats")
+async def get_cluster_stats() -> Dict[str, Any]:
+    """
+    Get the coordinator's worker nodes, nodes marked down, shard and
+    reassignment counters and URLs crawled per node.
+    """
+    return cluster_coordinator.stats()
@@ -1,18 +1,42 @@
-from fastapi import APIRouter, HTTPException
-from app.models.requests import BaseCrawlRequest
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from typing import Annotated, Optional
+from app.config import settings
+from app.models.requests import BaseCrawlRequest, ResponseShape
 from app.models.responses import BaseCrawlResponse
-from app.services.crawler import CrawlerService
+from app.services.admission import admission_controller, AdmissionRejected, INTERACTIVE
+from app.services.crawler import crawler_service
+from app.services.interactions import InteractionError
+from app.services.executor import postprocess_executor, serialize_model, ExecutorSaturatedError
+from app.services import metrics
+from app.services.session import SessionNotFoundError
 
 router = APIRouter()
-crawler_service = CrawlerService()
 
 @router.post("/crawl", response_model=BaseCrawlResponse)
-async def crawl_url(request: BaseCrawlRequest):
+async def crawl_url(
+    request: BaseCrawlRequest,
+    shape: Annotated[ResponseShape, Query()],
+    api_key: Optional[str] = Header(None, alias=settings.admission_api_key_header)
+):
     """
     Crawl a single URL and return the content in markdown format.
     Optionally extract images and links from the page.
+    Query parameters select fields and truncate long markdown or lists.
     """
     try:
-        return await crawler_service.crawl_url(request)
+        async with await admission_controller.acquire(1, INTERACTIVE, api_key):
+            result = await crawler_service.crawl_url(request)
+            # Large pages are serialized in the post-processing pool, not on the event loop
+            with metrics.stage(metrics.SERIALIZATION):
+                body = await postprocess_executor.run(serialize_model, result, shape)
+        return Response(content=body, media_type="application/json")
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except InteractionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
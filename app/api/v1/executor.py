@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from typing import Dict, Any
+from app.services.executor import postprocess_executor, loop_lag_monitor
+
+router = APIRouter()
+
+@router.get("/executor/stats")
+async def get_executor_stats() -> Dict[str, Any]:
+    """
+    Get post-processing pool queue depth and timings, plus event-loop lag
+    measured in this worker.
+    """
+    return {
+        "executor": postprocess_executor.stats(),
+        "loop_lag": loop_lag_monitor.stats(),
+    }
@@ -1,18 +1,55 @@
-from fastapi import APIRouter, HTTPException
-from app.models.requests import ContentExtractionRequest
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from typing import Annotated, Any, Dict, Optional
+from app.config import settings
+from app.models.requests import ContentExtractionRequest, ResponseShape
 from app.models.responses import ContentExtractionResponse
-from app.services.extractor import ExtractorService
+from app.services.admission import admission_controller, AdmissionRejected, INTERACTIVE
+from app.services.extractor import extractor_service
+from app.services.llm import llm_engine
+from app.services.llm_providers import LLMResponseError
+from app.services.interactions import InteractionError
+from app.services.executor import postprocess_executor, serialize_model, ExecutorSaturatedError
+from app.services import metrics
+from app.services.session import SessionNotFoundError
 
 router = APIRouter()
-extractor_service = ExtractorService()
 
 @router.post("/extract", response_model=ContentExtractionResponse)
-async def extract_content(request: ContentExtractionRequest):
+async def extract_content(
+    request: ContentExtractionRequest,
+    shape: Annotated[ResponseShape, Query()],
+    api_key: Optional[str] = Header(None, alias=settings.admission_api_key_header)
+):
     """
     Extract content from a URL using AI-powered extraction capabilities.
     Supports summarization, Q&A generation, and schema-based extraction.
+    Query parameters select fields and truncate long markdown or lists.
     """
     try:
-        return await extractor_service.extract_content(request)
+        async with await admission_controller.acquire(1, INTERACTIVE, api_key):
+            result = await extractor_service.extract_content(request)
+            with metrics.stage(metrics.SERIALIZATION):
+                body = await postprocess_executor.run(serialize_model, result, shape)
+        return Response(content=body, media_type="application/json")
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except InteractionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except LLMResponseError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/extract/stats")
+async def get_extract_stats() -> Dict[str, Any]:
+    """
+    Get LLM extraction counters: calls, batched calls, chunks,
+    memoized results and time spent waiting on provider rate limits.
+    """
+    stats = llm_engine.stats()
+    stats["memo"] = await llm_engine.memo.stats()
+    return stats
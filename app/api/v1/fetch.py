@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from typing import Dict, Any
+from app.services.http_fetch import http_fetcher
+
+router = APIRouter()
+
+@router.get("/fetch/stats")
+async def get_fetch_stats() -> Dict[str, Any]:
+    """
+    Get HTTP fetch tier counters: pages served without a browser,
+    escalations by reason and hosts pinned to the browser.
+    """
+    return http_fetcher.stats()
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from typing import Dict, Any
+from app.services.browser_pool import browser_pool
+
+router = APIRouter()
+
+@router.get("/pool/stats")
+async def get_pool_stats() -> Dict[str, Any]:
+    """
+    Get browser pool usage counters (checkouts, wait time, recycles)
+    for sizing the pool.
+    """
+    return browser_pool.stats()
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from typing import Dict, Any
+from app.services.scheduler import host_scheduler
+
+router = APIRouter()
+
+@router.get("/scheduler/stats")
+async def get_scheduler_stats() -> Dict[str, Any]:
+    """
+    Get the adaptive per-host concurrency limits, latency and backoff used
+    by batch crawls in this worker.
+    """
+    return host_scheduler.stats()
@@ -0,0 +1,60 @@
+from fastapi import APIRouter, HTTPException
+from typing import Any, Dict, List
+from app.models.requests import CreateSessionRequest
+from app.models.responses import SessionInfo
+from app.services.interactions import interaction_engine, InteractionError
+from app.services.session import (
+    session_service, SessionLimitError, SessionLoginError, SessionNotFoundError
+)
+
+router = APIRouter()
+
+@router.post("/sessions", response_model=SessionInfo, status_code=201)
+async def create_session(request: CreateSessionRequest):
+    """
+    Open login_url in a dedicated browser, run the login and interaction
+    steps once, and keep the session warm for crawls that pass its session_id.
+    """
+    try:
+        session = await session_service.create_session(request)
+    except SessionLimitError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except SessionLoginError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except InteractionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return session.info()
+
+@router.get("/sessions", response_model=List[SessionInfo])
+async def list_sessions():
+    """
+    List sessions live in this worker and those persisted on disk.
+    """
+    return await session_service.list_sessions()
+
+@router.get("/sessions/stats")
+async def get_session_stats() -> Dict[str, Any]:
+    """
+    Get live session counts, memory estimate and eviction counters,
+    plus interaction step plan cache and scripted/browser step counters.
+    """
+    return {**session_service.stats(), "interactions": interaction_engine.stats()}
+
+@router.get("/sessions/{session_id}", response_model=SessionInfo)
+async def get_session(session_id: str):
+    """
+    Get one session's status.
+    """
+    try:
+        return await session_service.get_info(session_id)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str) -> Dict[str, str]:
+    """
+    Close a session's browser and delete its stored cookies and storage.
+    """
+    if not await session_service.close_session(session_id):
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found")
+    return {"status": "deleted"}
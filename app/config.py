@@ -0,0 +1,309 @@
+import os
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+def _env_list(name: str, default: List[str]) -> List[str]:
+    value = os.environ.get(name)
+    if value is None:
+        return list(default)
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_optional_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else None
+
+
+DEFAULT_BLOCKED_DOMAINS = [
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "adservice.google.com",
+    "amazon-adsystem.com",
+    "adnxs.com",
+    "criteo.com",
+    "taboola.com",
+    "outbrain.com",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "hotjar.com",
+    "segment.io",
+    "connect.facebook.net",
+]
+
+DEFAULT_BLOCKED_RESOURCE_TYPES = ["image", "media", "font"]
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+
+class Settings(BaseModel):
+    # Browser pool
+    pool_min_browsers: int = 1
+    pool_max_browsers: int = 4
+    pool_max_pages_per_browser: int = 8
+    pool_recycle_after_pages: int = 200
+    pool_memory_threshold_mb: Optional[int] = None
+    pool_health_check_interval: float = 30.0
+    pool_acquire_timeout: float = 60.0
+
+    # Worker start-up: browsers launched and warmed before /ready reports ready (None: pool_min_browsers)
+    warmup_browsers: Optional[int] = None
+    warmup_render: bool = True
+
+    # Batch job queue
+    job_db_path: str = "crawl4ai_jobs.db"
+    job_workers: int = 1
+    job_poll_interval: float = 1.0
+    job_result_ttl: int = 3600
+    job_stale_after: float = 120.0
+    job_progress_interval: float = 1.0
+
+    # Response cache
+    cache_enabled: bool = True
+    cache_default_ttl: int = 600
+    cache_memory_max_bytes: int = 64 * 1024 * 1024
+    cache_disk_path: Optional[str] = "crawl4ai_cache.db"
+    cache_disk_max_bytes: int = 1024 * 1024 * 1024
+
+    # HTML post-processing
+    html_extractor: str = "lxml"
+    executor_kind: str = "thread"
+    executor_max_workers: int = 4
+    executor_max_queue: int = 64
+    executor_queue_timeout: float = 30.0
+    loop_lag_interval: float = 0.25
+
+    # Batch scheduling
+    scheduler_global_limit: int = 32
+    scheduler_initial_host_limit: int = 2
+    scheduler_max_host_limit: int = 8
+    scheduler_min_host_delay: float = 0.0
+    scheduler_latency_factor: float = 3.0
+
+    # Retries
+    retry_budget_ratio: float = 0.2
+    retry_budget_min: int = 10
+
+    # Fast render mode
+    fast_mode_blocked_resource_types: List[str] = DEFAULT_BLOCKED_RESOURCE_TYPES
+    fast_mode_blocked_domains: List[str] = DEFAULT_BLOCKED_DOMAINS
+
+    # Browserless HTTP fetch tier
+    http_tier_enabled: bool = True
+    http_tier_timeout: float = 15.0
+    http_tier_max_bytes: int = 10 * 1024 * 1024
+    http_tier_max_connections: int = 100
+    http_tier_min_text_chars: int = 200
+    http_tier_memory_ttl: float = 3600.0
+    http_tier_user_agent: str = DEFAULT_USER_AGENT
+
+    # Reusable browser sessions
+    session_store_dir: Optional[str] = "crawl4ai_sessions"
+    session_max_live: int = 8
+    session_idle_ttl: float = 900.0
+    session_state_ttl: float = 7 * 24 * 3600.0
+    session_memory_budget_mb: Optional[int] = 2048
+    session_sweep_interval: float = 30.0
+
+    # Interaction steps
+    interaction_plan_cache_size: int = 256
+    interaction_settle_ms: int = 3000
+
+    # LLM extraction
+    llm_timeout: float = 60.0
+    llm_tokenizer: str = "tiktoken"
+    llm_requests_per_minute: int = 60
+    llm_max_concurrency: int = 4
+    llm_batch_window: float = 0.05
+    llm_batch_max_documents: int = 8
+    llm_cache_path: Optional[str] = "crawl4ai_llm_cache.db"
+    llm_cache_memory_max_bytes: int = 16 * 1024 * 1024
+    llm_cache_disk_max_bytes: int = 256 * 1024 * 1024
+    llm_cache_ttl: int = 30 * 24 * 3600
+    # Serve provider "mock" with the deterministic local stand-in (tests and benchmarks only)
+    llm_mock_provider: bool = False
+    batch_extraction_concurrency: int = 8
+
+    # Incremental recrawls
+    recrawl_index_path: str = "crawl4ai_fingerprints.db"
+    recrawl_change_threshold: int = 3
+    recrawl_revalidate_timeout: float = 10.0
+
+    # Site crawls
+    site_crawl_bloom_capacity: int = 1_000_000
+    site_crawl_bloom_error_rate: float = 0.0001
+    site_crawl_max_frontier: int = 100_000
+    site_crawl_sitemap_max_urls: int = 50_000
+
+    # Metrics
+    metrics_enabled: bool = True
+    metrics_sample_interval: float = 5.0
+    metrics_max_hosts: int = 200
+
+    # Response compression
+    compression_enabled: bool = True
+    compression_min_bytes: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_zstd_level: int = 3
+
+    # Admission control
+    admission_max_units: int = 16
+    admission_max_queue: int = 64
+    admission_queue_timeout: float = 10.0
+    admission_max_batch_units: int = 8
+    admission_key_limit: int = 0
+    admission_key_limits: List[str] = []
+    admission_api_key_header: str = "X-API-Key"
+
+    # Coordinator mode: batches are sharded by host across these worker nodes
+    cluster_nodes: List[str] = []
+    cluster_virtual_nodes: int = 160
+    cluster_shard_size: int = 100
+    cluster_node_concurrency: int = 2
+    cluster_connect_timeout: float = 5.0
+    cluster_read_timeout: float = 120.0
+    cluster_node_cooldown: float = 30.0
+    cluster_max_reassignments: int = 2
+    cluster_api_key: Optional[str] = None
+
+    # Result sinks for batch jobs: a local directory or s3://bucket/prefix
+    sink_uri: str = "crawl4ai_results"
+    sink_s3_endpoint_url: Optional[str] = None
+    sink_s3_region: Optional[str] = None
+    sink_spool_dir: Optional[str] = None
+    sink_max_file_mb: int = 256
+    sink_buffer_bytes: int = 8 * 1024 * 1024
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Build settings from CRAWL4AI_* environment variables"""
+        return cls(
+            pool_min_browsers=_env_int("CRAWL4AI_POOL_MIN_BROWSERS", 1),
+            pool_max_browsers=_env_int("CRAWL4AI_POOL_MAX_BROWSERS", 4),
+            pool_max_pages_per_browser=_env_int("CRAWL4AI_POOL_MAX_PAGES_PER_BROWSER", 8),
+            pool_recycle_after_pages=_env_int("CRAWL4AI_POOL_RECYCLE_AFTER_PAGES", 200),
+            pool_memory_threshold_mb=_env_optional_int("CRAWL4AI_POOL_MEMORY_THRESHOLD_MB"),
+            pool_health_check_interval=_env_float("CRAWL4AI_POOL_HEALTH_CHECK_INTERVAL", 30.0),
+            pool_acquire_timeout=_env_float("CRAWL4AI_POOL_ACQUIRE_TIMEOUT", 60.0),
+            warmup_browsers=_env_optional_int("CRAWL4AI_WARMUP_BROWSERS"),
+            warmup_render=_env_bool("CRAWL4AI_WARMUP_RENDER", True),
+            job_db_path=os.environ.get("CRAWL4AI_JOB_DB_PATH", "crawl4ai_jobs.db"),
+            job_workers=_env_int("CRAWL4AI_JOB_WORKERS", 1),
+            job_poll_interval=_env_float("CRAWL4AI_JOB_POLL_INTERVAL", 1.0),
+            job_result_ttl=_env_int("CRAWL4AI_JOB_RESULT_TTL", 3600),
+            job_stale_after=_env_float("CRAWL4AI_JOB_STALE_AFTER", 120.0),
+            job_progress_interval=_env_float("CRAWL4AI_JOB_PROGRESS_INTERVAL", 1.0),
+            cache_enabled=_env_bool("CRAWL4AI_CACHE_ENABLED", True),
+            cache_default_ttl=_env_int("CRAWL4AI_CACHE_DEFAULT_TTL", 600),
+            cache_memory_max_bytes=_env_int("CRAWL4AI_CACHE_MEMORY_MAX_BYTES", 64 * 1024 * 1024),
+            cache_disk_path=os.environ.get("CRAWL4AI_CACHE_DISK_PATH", "crawl4ai_cache.db") or None,
+            cache_disk_max_bytes=_env_int("CRAWL4AI_CACHE_DISK_MAX_BYTES", 1024 * 1024 * 1024),
+            html_extractor=os.environ.get("CRAWL4AI_HTML_EXTRACTOR", "lxml"),
+            executor_kind=os.environ.get("CRAWL4AI_EXECUTOR_KIND", "thread"),
+            executor_max_workers=_env_int("CRAWL4AI_EXECUTOR_MAX_WORKERS", 4),
+            executor_max_queue=_env_int("CRAWL4AI_EXECUTOR_MAX_QUEUE", 64),
+            executor_queue_timeout=_env_float("CRAWL4AI_EXECUTOR_QUEUE_TIMEOUT", 30.0),
+            loop_lag_interval=_env_float("CRAWL4AI_LOOP_LAG_INTERVAL", 0.25),
+            scheduler_global_limit=_env_int("CRAWL4AI_SCHEDULER_GLOBAL_LIMIT", 32),
+            scheduler_initial_host_limit=_env_int("CRAWL4AI_SCHEDULER_INITIAL_HOST_LIMIT", 2),
+            scheduler_max_host_limit=_env_int("CRAWL4AI_SCHEDULER_MAX_HOST_LIMIT", 8),
+            scheduler_min_host_delay=_env_float("CRAWL4AI_SCHEDULER_MIN_HOST_DELAY", 0.0),
+            scheduler_latency_factor=_env_float("CRAWL4AI_SCHEDULER_LATENCY_FACTOR", 3.0),
+            retry_budget_ratio=_env_float("CRAWL4AI_RETRY_BUDGET_RATIO", 0.2),
+            retry_budget_min=_env_int("CRAWL4AI_RETRY_BUDGET_MIN", 10),
+            fast_mode_blocked_resource_types=_env_list(
+                "CRAWL4AI_FAST_MODE_BLOCKED_RESOURCE_TYPES", DEFAULT_BLOCKED_RESOURCE_TYPES
+            ),
+            fast_mode_blocked_domains=_env_list("CRAWL4AI_FAST_MODE_BLOCKED_DOMAINS", DEFAULT_BLOCKED_DOMAINS),
+            http_tier_enabled=_env_bool("CRAWL4AI_HTTP_TIER_ENABLED", True),
+            http_tier_timeout=_env_float("CRAWL4AI_HTTP_TIER_TIMEOUT", 15.0),
+            http_tier_max_bytes=_env_int("CRAWL4AI_HTTP_TIER_MAX_BYTES", 10 * 1024 * 1024),
+            http_tier_max_connections=_env_int("CRAWL4AI_HTTP_TIER_MAX_CONNECTIONS", 100),
+            http_tier_min_text_chars=_env_int("CRAWL4AI_HTTP_TIER_MIN_TEXT_CHARS", 200),
+            http_tier_memory_ttl=_env_float("CRAWL4AI_HTTP_TIER_MEMORY_TTL", 3600.0),
+            http_tier_user_agent=os.environ.get("CRAWL4AI_HTTP_TIER_USER_AGENT", DEFAULT_USER_AGENT),
+            session_store_dir=os.environ.get("CRAWL4AI_SESSION_STORE_DIR", "crawl4ai_sessions") or None,
+            session_max_live=_env_int("CRAWL4AI_SESSION_MAX_LIVE", 8),
+            session_idle_ttl=_env_float("CRAWL4AI_SESSION_IDLE_TTL", 900.0),
+            session_state_ttl=_env_float("CRAWL4AI_SESSION_STATE_TTL", 7 * 24 * 3600.0),
+            session_memory_budget_mb=_env_int("CRAWL4AI_SESSION_MEMORY_BUDGET_MB", 2048) or None,
+            session_sweep_interval=_env_float("CRAWL4AI_SESSION_SWEEP_INTERVAL", 30.0),
+            interaction_plan_cache_size=_env_int("CRAWL4AI_INTERACTION_PLAN_CACHE_SIZE", 256),
+            interaction_settle_ms=_env_int("CRAWL4AI_INTERACTION_SETTLE_MS", 3000),
+            llm_timeout=_env_float("CRAWL4AI_LLM_TIMEOUT", 60.0),
+            llm_tokenizer=os.environ.get("CRAWL4AI_LLM_TOKENIZER", "tiktoken"),
+            llm_requests_per_minute=_env_int("CRAWL4AI_LLM_REQUESTS_PER_MINUTE", 60),
+            llm_max_concurrency=_env_int("CRAWL4AI_LLM_MAX_CONCURRENCY", 4),
+            llm_batch_window=_env_float("CRAWL4AI_LLM_BATCH_WINDOW", 0.05),
+            llm_batch_max_documents=_env_int("CRAWL4AI_LLM_BATCH_MAX_DOCUMENTS", 8),
+            llm_cache_path=os.environ.get("CRAWL4AI_LLM_CACHE_PATH", "crawl4ai_llm_cache.db") or None,
+            llm_cache_memory_max_bytes=_env_int("CRAWL4AI_LLM_CACHE_MEMORY_MAX_BYTES", 16 * 1024 * 1024),
+            llm_cache_disk_max_bytes=_env_int("CRAWL4AI_LLM_CACHE_DISK_MAX_BYTES", 256 * 1024 * 1024),
+            llm_cache_ttl=_env_int("CRAWL4AI_LLM_CACHE_TTL", 30 * 24 * 3600),
+            llm_mock_provider=_env_bool("CRAWL4AI_LLM_MOCK_PROVIDER", False),
+            batch_extraction_concurrency=_env_int("CRAWL4AI_BATCH_EXTRACTION_CONCURRENCY", 8),
+            recrawl_index_path=os.environ.get("CRAWL4AI_RECRAWL_INDEX_PATH", "crawl4ai_fingerprints.db"),
+            recrawl_change_threshold=_env_int("CRAWL4AI_RECRAWL_CHANGE_THRESHOLD", 3),
+            recrawl_revalidate_timeout=_env_float("CRAWL4AI_RECRAWL_REVALIDATE_TIMEOUT", 10.0),
+            site_crawl_bloom_capacity=_env_int("CRAWL4AI_SITE_CRAWL_BLOOM_CAPACITY", 1_000_000),
+            site_crawl_bloom_error_rate=_env_float("CRAWL4AI_SITE_CRAWL_BLOOM_ERROR_RATE", 0.0001),
+            site_crawl_max_frontier=_env_int("CRAWL4AI_SITE_CRAWL_MAX_FRONTIER", 100_000),
+            site_crawl_sitemap_max_urls=_env_int("CRAWL4AI_SITE_CRAWL_SITEMAP_MAX_URLS", 50_000),
+            metrics_enabled=_env_bool("CRAWL4AI_METRICS_ENABLED", True),
+            metrics_sample_interval=_env_float("CRAWL4AI_METRICS_SAMPLE_INTERVAL", 5.0),
+            metrics_max_hosts=_env_int("CRAWL4AI_METRICS_MAX_HOSTS", 200),
+            compression_enabled=_env_bool("CRAWL4AI_COMPRESSION_ENABLED", True),
+            compression_min_bytes=_env_int("CRAWL4AI_COMPRESSION_MIN_BYTES", 1024),
+            compression_gzip_level=_env_int("CRAWL4AI_COMPRESSION_GZIP_LEVEL", 6),
+            compression_brotli_quality=_env_int("CRAWL4AI_COMPRESSION_BROTLI_QUALITY", 4),
+            compression_zstd_level=_env_int("CRAWL4AI_COMPRESSION_ZSTD_LEVEL", 3),
+            admission_max_units=_env_int("CRAWL4AI_ADMISSION_MAX_UNITS", 16),
+            admission_max_queue=_env_int("CRAWL4AI_ADMISSION_MAX_QUEUE", 64),
+            admission_queue_timeout=_env_float("CRAWL4AI_ADMISSION_QUEUE_TIMEOUT", 10.0),
+            admission_max_batch_units=_env_int("CRAWL4AI_ADMISSION_MAX_BATCH_UNITS", 8),
+            admission_key_limit=_env_int("CRAWL4AI_ADMISSION_KEY_LIMIT", 0),
+            admission_key_limits=_env_list("CRAWL4AI_ADMISSION_KEY_LIMITS", []),
+            admission_api_key_header=os.environ.get("CRAWL4AI_ADMISSION_API_KEY_HEADER", "X-API-Key"),
+            cluster_nodes=_env_list("CRAWL4AI_CLUSTER_NODES", []),
+            cluster_virtual_nodes=_env_int("CRAWL4AI_CLUSTER_VIRTUAL_NODES", 160),
+            cluster_shard_size=_env_int("CRAWL4AI_CLUSTER_SHARD_SIZE", 100),
+            cluster_node_concurrency=_env_int("CRAWL4AI_CLUSTER_NODE_CONCURRENCY", 2),
+            cluster_connect_timeout=_env_float("CRAWL4AI_CLUSTER_CONNECT_TIMEOUT", 5.0),
+            cluster_read_timeout=_env_float("CRAWL4AI_CLUSTER_READ_TIMEOUT", 120.0),
+            cluster_node_cooldown=_env_float("CRAWL4AI_CLUSTER_NODE_COOLDOWN", 30.0),
+            cluster_max_reassignments=_env_int("CRAWL4AI_CLUSTER_MAX_REASSIGNMENTS", 2),
+            cluster_api_key=os.environ.get("CRAWL4AI_CLUSTER_API_KEY") or None,
+            sink_uri=os.environ.get("CRAWL4AI_SINK_URI", "crawl4ai_results"),
+            sink_s3_endpoint_url=os.environ.get("CRAWL4AI_SINK_S3_ENDPOINT_URL") or None,
+            sink_s3_region=os.environ.get("CRAWL4AI_SINK_S3_REGION") or None,
+            sink_spool_dir=os.environ.get("CRAWL4AI_SINK_SPOOL_DIR") or None,
+            sink_max_file_mb=_env_int("CRAWL4AI_SINK_MAX_FILE_MB", 256),
+            sink_buffer_bytes=_env_int("CRAWL4AI_SINK_BUFFER_BYTES", 8 * 1024 * 1024),
+        )
+
+
+settings = Settings.from_env()
@@ -1,13 +1,66 @@
-from fastapi import FastAPI, HTTPException
+from app.services.startup import startup_monitor  # first, so the import clock covers the whole app
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1 import crawl, batch, extract
+from fastapi.responses import JSONResponse
+from app.api.v1 import admission, cluster, crawl, batch, extract, pool, cache, executor, scheduler, fetch, sessions
+from app.services.admission import admission_controller
+from app.services.browser_pool import browser_pool
+from app.services.cluster import cluster_coordinator
+from app.services.compression import CompressionMiddleware
+from app.services.executor import postprocess_executor, loop_lag_monitor
+from app.services.http_fetch import http_fetcher
+from app.services.jobs import job_worker
+from app.services.metrics import MetricsMiddleware, metrics_sampler, render as render_metrics
+from app.services.scheduler import host_scheduler
+from app.services.session import session_service
+
+startup_monitor.imports_done()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start shared resources with the app and shut them down cleanly.
+
+    Browsers are warmed in the background once the app serves; /ready
+    reports when that has finished.
+    """
+    postprocess_executor.start()
+    loop_lag_monitor.start()
+    await browser_pool.start()
+    session_service.start()
+    job_worker.start()
+    metrics_sampler.start(
+        pool=browser_pool,
+        sessions=session_service,
+        executor=postprocess_executor,
+        scheduler=host_scheduler,
+        admission=admission_controller,
+    )
+    startup_monitor.start(browser_pool)
+    try:
+        yield
+    finally:
+        await startup_monitor.stop()
+        await metrics_sampler.stop()
+        await job_worker.stop()
+        await session_service.close()
+        await browser_pool.close()
+        await http_fetcher.close()
+        await cluster_coordinator.close()
+        await loop_lag_monitor.stop()
+        postprocess_executor.shutdown()
 
 app = FastAPI(
     title="Crawl4AI API",
     description="A powerful web scraping API built with Crawl4AI and FastAPI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Innermost, so metrics time the compressed response
+app.add_middleware(CompressionMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -17,12 +70,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(crawl.router, prefix="/api/v1", tags=["crawl"])
 app.include_router(batch.router, prefix="/api/v1", tags=["batch"])
 app.include_router(extract.router, prefix="/api/v1", tags=["extract"])
+app.include_router(pool.router, prefix="/api/v1", tags=["pool"])
+app.include_router(cache.router, prefix="/api/v1", tags=["cache"])
+app.include_router(executor.router, prefix="/api/v1", tags=["executor"])
+app.include_router(scheduler.router, prefix="/api/v1", tags=["scheduler"])
+app.include_router(fetch.router, prefix="/api/v1", tags=["fetch"])
+app.include_router(sessions.router, prefix="/api/v1", tags=["sessions"])
+app.include_router(admission.router, prefix="/api/v1", tags=["admission"])
+app.include_router(cluster.router, prefix="/api/v1", tags=["cluster"])
 
 @app.get("/")
 async def root():
     """Health check endpoint"""
     return {"status": "healthy", "message": "Crawl4AI API is running"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness of this worker: 503 until its browsers are warmed up, with start-up timings"""
+    status = startup_monitor.status()
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics of every worker process"""
+    metrics_sampler.sample()
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
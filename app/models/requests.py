@@ -19,6 +19,20 @@ class WaitCondition(str, Enum):
     LOAD = "load"
     DOM_CONTENT_LOADED = "domcontentloaded"
 
+class StepCondition(str, Enum):
+    SELECTOR = "selector"
+    NETWORK_IDLE = "networkidle"
+    LOAD = "load"
+    DOM_CONTENT_LOADED = "domcontentloaded"
+    URL = "url"
+    URL_CHANGE = "url_change"
+    CONTENT_CHANGE = "content_change"
+
+class FetchMode(str, Enum):
+    AUTO = "auto"
+    HTTP = "http"
+    BROWSER = "browser"
+
 class Credentials(BaseModel):
     username: Optional[str] = None
     password: Optional[str] = None
@@ -29,18 +43,23 @@ class LLMConfig(BaseModel):
     model: str = "gpt-3.5-turbo"
     temperature: float = 0.7
     max_tokens: int = 500
+    max_input_tokens: int = Field(3000, ge=500, description="Input budget of one call; longer pages are chunked")
 
 class RetryConfig(BaseModel):
     max_attempts: int = 3
     min_delay: float = 1.0
     max_delay: float = 10.0
     exponential: bool = True
+    defer_retries: bool = Field(True, description="In batches, requeue a failed URL behind waiting ones instead of sleeping in its slot")
 
 class InteractionStep(BaseModel):
     action: BrowserAction
     selector: Optional[str] = None
     value: Optional[str] = None
-    timeout: Optional[int] = 30000
+    timeout: Optional[int] = Field(30000, description="Upper bound in ms; waits end as soon as their condition holds")
+    wait_for: Optional[StepCondition] = Field(None, description="Condition a wait step waits for, or an action step waits for after acting")
+    wait_target: Optional[str] = Field(None, description="Selector for wait_for=selector, URL glob for wait_for=url")
+    repeat: int = Field(1, ge=1, le=100, description="Repeat a click or scroll until the page stops changing, for infinite scroll and 'load more'")
 
 class SessionConfig(BaseModel):
     auth_required: bool = False
@@ -48,6 +67,8 @@ class SessionConfig(BaseModel):
     interaction_steps: List[InteractionStep] = []
     wait_conditions: List[WaitCondition] = [WaitCondition.NETWORK_IDLE]
     timeout: int = 30000
+    blocked_resource_types: Optional[List[str]] = Field(None, description="Playwright resource types to abort in fast mode; defaults to image, media and font")
+    blocked_domains: List[str] = Field([], description="Extra domains (and their subdomains) to abort in fast mode")
 
 class ExtractionConfig(BaseModel):
     extraction_type: ExtractionType
@@ -58,14 +79,90 @@ class BaseCrawlRequest(BaseModel):
     url: HttpUrl
     extract_images: bool = False
     extract_links: bool = False
+    include_attributes: bool = Field(False, description="Also return srcset/alt for images and rel/title for links")
+    fast_mode: bool = Field(False, description="Block heavy resources and ad/analytics domains, return at DOMContentLoaded")
+    fetch_mode: FetchMode = Field(FetchMode.AUTO, description="auto tries a plain HTTP fetch first and renders in the browser only when needed")
+    session_id: Optional[str] = Field(None, description="Crawl inside a session created with POST /sessions")
     session_config: Optional[SessionConfig] = None
+    retry_config: Optional[RetryConfig] = None
+    max_age: Optional[int] = Field(None, ge=0, description="Accept a cached result up to this many seconds old")
+    no_cache: bool = False
+
+class SinkConfig(BaseModel):
+    format: Literal["jsonl", "parquet"] = "jsonl"
+    compression: Optional[Literal["zstd", "gzip", "none"]] = Field(None, description="Defaults to zstd when available, else gzip")
+    max_file_mb: Optional[int] = Field(None, ge=1, description="Start a new file past this size; capped by CRAWL4AI_SINK_MAX_FILE_MB")
 
 class BatchCrawlRequest(BaseModel):
     urls: List[HttpUrl]
-    concurrent_limit: Optional[int] = 5
+    concurrent_limit: Optional[int] = Field(5, ge=1, description="Maximum concurrent requests per host")
+    global_concurrent_limit: Optional[int] = Field(None, ge=1, description="Maximum concurrent requests across all hosts")
+    per_host_delay: float = Field(0.0, ge=0, description="Minimum seconds between request starts on one host")
     retry_config: Optional[RetryConfig] = None
     extraction_config: Optional[ExtractionConfig] = None
+    extraction_concurrency: Optional[int] = Field(None, ge=1, description="Concurrent extractions while crawling continues")
     session_config: Optional[SessionConfig] = None
+    include_attributes: bool = False
+    fast_mode: bool = False
+    fetch_mode: FetchMode = FetchMode.AUTO
+    session_id: Optional[str] = None
+    max_age: Optional[int] = Field(None, ge=0, description="Accept cached results up to this many seconds old")
+    no_cache: bool = False
+    incremental: bool = Field(False, description="Only return pages that are new, changed or removed since the last crawl")
+    recrawl_set: str = Field("default", pattern=r"^[A-Za-z0-9_.-]{1,64}$", description="Fingerprint namespace for incremental crawls")
+    change_threshold: Optional[int] = Field(None, ge=0, le=64, description="Simhash bits that may differ before a page counts as changed")
+    sink: Optional[SinkConfig] = Field(None, description="Write a queued batch's results to files in the configured store instead of job storage")
+
+class SiteCrawlRequest(BaseModel):
+    seed_urls: List[HttpUrl] = Field(..., min_length=1)
+    max_depth: int = Field(2, ge=0, le=20, description="Link hops followed from a seed")
+    max_pages: int = Field(100, ge=1, le=100000, description="Pages crawled before the job stops")
+    allowed_domains: List[str] = Field([], description="Hosts that may be crawled; defaults to the seed hosts")
+    include_subdomains: bool = False
+    include_paths: List[str] = Field([], description="Glob patterns a URL path must match, e.g. /docs/*")
+    exclude_paths: List[str] = Field([], description="Glob patterns of paths that are never crawled")
+    use_sitemap: bool = Field(False, description="Also seed from the sitemaps of the seed hosts")
+    concurrent_limit: Optional[int] = Field(5, ge=1, description="Maximum concurrent requests per host")
+    global_concurrent_limit: Optional[int] = Field(None, ge=1, description="Maximum concurrent requests across all hosts")
+    per_host_delay: float = Field(0.0, ge=0, description="Minimum seconds between request starts on one host")
+    retry_config: Optional[RetryConfig] = None
+    session_config: Optional[SessionConfig] = None
+    include_attributes: bool = False
+    fast_mode: bool = False
+    fetch_mode: FetchMode = FetchMode.AUTO
+    session_id: Optional[str] = None
+    max_age: Optional[int] = Field(None, ge=0, description="Accept cached results up to this many seconds old")
+    no_cache: bool = False
 
 class ContentExtractionRequest(BaseCrawlRequest):
     extraction_config: ExtractionConfig
+
+# Top-level result fields a client may select; url is always returned
+SELECTABLE_FIELDS = (
+    "markdown", "images", "links", "image_details", "link_details", "metadata",
+    "extracted_content", "extraction_error", "change_status", "similarity",
+)
+_FIELD_NAME = "(?:" + "|".join(SELECTABLE_FIELDS) + ")"
+
+class ResponseShape(BaseModel):
+    fields: Optional[str] = Field(None, pattern=rf"^{_FIELD_NAME}(?:,{_FIELD_NAME})*$", description="Comma-separated fields to return, e.g. markdown,links; url is always included")
+    max_markdown_chars: Optional[int] = Field(None, ge=0, description="Cut markdown to this many characters")
+    max_links: Optional[int] = Field(None, ge=0, description="Return at most this many links (and link_details)")
+    max_images: Optional[int] = Field(None, ge=0, description="Return at most this many images (and image_details)")
+
+class StreamShape(ResponseShape):
+    format: Literal["ndjson", "sse"] = "ndjson"
+
+class ResultsPageQuery(ResponseShape):
+    offset: int = Field(0, ge=0)
+    limit: int = Field(100, ge=1, le=1000)
+    status: Literal["all", "succeeded", "failed"] = "all"
+
+class URLResultQuery(ResponseShape):
+    url: HttpUrl
+
+class CreateSessionRequest(BaseModel):
+    login_url: HttpUrl
+    session_id: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9_-]{1,64}$", description="Defaults to a random id")
+    session_config: SessionConfig = SessionConfig()
+    idle_ttl: Optional[int] = Field(None, ge=1, description="Close the warm browser after this many idle seconds")
@@ -2,12 +2,34 @@ from pydantic import BaseModel, HttpUrl, Field
 from typing import List, Dict, Optional, Any
 from datetime import datetime
 
+class InteractionTiming(BaseModel):
+    index: int
+    action: str
+    mode: str = Field(..., description="script when run inside one in-page script, browser for a Playwright call")
+    seconds: float
+    repeats: Optional[int] = None
+    waited_for: Optional[str] = None
+
 class CrawlMetadata(BaseModel):
     crawl_time: datetime
     content_type: Optional[str] = None
     status_code: int
     headers: Dict[str, str]
     final_url: HttpUrl
+    cache_status: Optional[str] = None
+    attempt_count: int = 1
+    elapsed_seconds: Optional[float] = None
+    fetch_seconds: Optional[float] = None
+    render_time_seconds: Optional[float] = None
+    blocked_requests: Optional[int] = None
+    bytes_saved_estimate: Optional[int] = None
+    fetch_tier: Optional[str] = None
+    escalation_reason: Optional[str] = None
+    interaction_timings: Optional[List[InteractionTiming]] = None
+
+class QAPair(BaseModel):
+    question: str
+    answer: str
 
 class ExtractedContent(BaseModel):
     summary: Optional[str] = None
@@ -20,14 +42,44 @@ class URLError(BaseModel):
     error: str
     attempt_count: int
     last_attempt: datetime
+    status_code: Optional[int] = None
+    retryable: Optional[bool] = None
+    elapsed_seconds: Optional[float] = None
 
 class URLResult(BaseModel):
     url: HttpUrl
     markdown: str
     images: List[str] = []
     links: List[str] = []
+    image_details: Optional[List[Dict[str, str]]] = None
+    link_details: Optional[List[Dict[str, str]]] = None
     metadata: CrawlMetadata
     extracted_content: Optional[ExtractedContent] = None
+    extraction_error: Optional[str] = None
+    change_status: Optional[str] = None
+    similarity: Optional[float] = None
+    truncated: Optional[Dict[str, int]] = None
+
+class StageTiming(BaseModel):
+    items: int = 0
+    busy_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    avg_seconds: float = 0.0
+    queue_wait_seconds: float = 0.0
+
+class ChangeSummary(BaseModel):
+    new: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    not_modified: int = 0
+    removed: int = 0
+    missing: int = 0
+    unavailable: int = 0
+
+class ClusterSummary(BaseModel):
+    shards: int = 0
+    reassigned_shards: int = 0
+    urls_by_node: Dict[str, int] = {}
 
 class BatchMetadata(BaseModel):
     start_time: datetime
@@ -35,20 +87,41 @@ class BatchMetadata(BaseModel):
     total_urls: int
     successful_count: int
     failed_count: int
+    duplicate_count: int = 0
     total_time_seconds: Optional[float] = None
+    stages: Dict[str, StageTiming] = {}
+    changes: Optional[ChangeSummary] = None
+    cluster: Optional[ClusterSummary] = None
 
 class BaseCrawlResponse(BaseModel):
     url: HttpUrl
     markdown: str
     images: List[str] = []
     links: List[str] = []
+    image_details: Optional[List[Dict[str, str]]] = None
+    link_details: Optional[List[Dict[str, str]]] = None
     metadata: CrawlMetadata
+    truncated: Optional[Dict[str, int]] = None
 
 class BatchCrawlResponse(BaseModel):
     successful_urls: List[URLResult]
     failed_urls: List[URLError]
     metadata: BatchMetadata
 
+class SinkFile(BaseModel):
+    uri: str
+    records: int
+    bytes: int
+
+class SinkManifest(BaseModel):
+    manifest_uri: str
+    format: str
+    compression: str
+    records: int
+    succeeded: int
+    failed: int
+    files: List[SinkFile] = []
+
 class ContentExtractionResponse(BaseCrawlResponse):
     extracted_content: ExtractedContent
 
@@ -57,6 +130,51 @@ class JobStatus(BaseModel):
     status: str
     progress: float
     message: Optional[str] = None
+    completed_count: int = 0
+    total_count: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     result: Optional[Dict[str, Any]] = None
+
+class BatchResultsPage(BaseModel):
+    job_id: str
+    offset: int
+    limit: int
+    total: int
+    successful_urls: List[URLResult] = []
+    failed_urls: List[URLError] = []
+
+class SiteCrawlSummary(BaseModel):
+    pages_crawled: int = 0
+    pages_failed: int = 0
+    urls_discovered: int = 0
+    urls_remaining: int = 0
+    sitemap_urls: int = 0
+    max_depth_reached: int = 0
+    stop_reason: Optional[str] = None
+    resumed_count: int = 0
+
+class SitePage(BaseModel):
+    url: HttpUrl
+    depth: int
+    parent_url: Optional[str] = None
+    result: Optional[URLResult] = None
+    error: Optional[URLError] = None
+
+class SitePagesResponse(BaseModel):
+    job_id: str
+    offset: int
+    limit: int
+    total: int
+    pages: List[SitePage] = []
+
+class SessionInfo(BaseModel):
+    session_id: str
+    login_url: HttpUrl
+    created_at: datetime
+    last_used_at: datetime
+    live: bool
+    active_crawls: int = 0
+    crawl_count: int = 0
+    memory_estimate_mb: Optional[float] = None
+    login_timings: Optional[List[InteractionTiming]] = None
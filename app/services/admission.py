@@ -0,0 +1,260 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import heapq
+import itertools
+import math
+import time
+
+from app.config import settings
+from app.services import metrics
+
+# Priority classes, served in this order when units free up
+INTERACTIVE = "interactive"
+BATCH = "batch"
+BACKGROUND = "background"
+PRIORITIES = {INTERACTIVE: 0, BATCH: 1, BACKGROUND: 2}
+
+ANONYMOUS = "anonymous"
+
+_NO_TIMEOUT = object()
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; carries the HTTP status and a Retry-After hint"""
+
+    def __init__(self, message: str, status_code: int, retry_after: int, reason: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(self.retry_after)}
+
+
+def parse_key_limits(entries: List[str]) -> Dict[str, int]:
+    """Per-key quotas from "key=units" entries"""
+    limits = {}
+    for entry in entries:
+        key, sep, value = entry.partition("=")
+        if not sep or not key.strip():
+            raise ValueError(f"Invalid admission key limit '{entry}', expected key=units")
+        limits[key.strip()] = int(value)
+    return limits
+
+
+class Ticket:
+    """Units held by one admitted request; release() is idempotent"""
+
+    def __init__(self, controller: "AdmissionController", units: int, key: str, priority: str):
+        self.controller = controller
+        self.units = units
+        self.key = key
+        self.priority = priority
+        self.admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+    async def __aenter__(self) -> "Ticket":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        self.release()
+
+
+class _Waiter:
+    __slots__ = ("rank", "seq", "units", "key", "priority", "future", "cancelled")
+
+    def __init__(self, rank: int, seq: int, units: int, key: str, priority: str, future: asyncio.Future):
+        self.rank = rank
+        self.seq = seq
+        self.units = units
+        self.key = key
+        self.priority = priority
+        self.future = future
+        self.cancelled = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.rank, self.seq) < (other.rank, other.seq)
+
+
+class AdmissionController:
+    """Global bound on concurrent crawl work, shared by the crawl, batch and extract routes.
+
+    Work is counted in units: one per interactive request, and a batch's
+    granted concurrency for batches. When all ``max_units`` are taken, callers
+    queue by priority class (interactive before batch before background jobs)
+    and then arrival order. A full queue or a wait over ``queue_timeout`` is a
+    503; going over a per-API-key quota is a 429. Both carry a Retry-After
+    estimated from recent hold times. Background work waits without limits.
+    """
+
+    def __init__(
+        self,
+        max_units: int = settings.admission_max_units,
+        max_queue: int = settings.admission_max_queue,
+        queue_timeout: float = settings.admission_queue_timeout,
+        max_batch_units: int = settings.admission_max_batch_units,
+        key_limit: int = settings.admission_key_limit,
+        key_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.max_units = max(1, max_units)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.max_batch_units = max(1, min(max_batch_units, self.max_units))
+        self.key_limit = max(0, key_limit)
+        self.key_limits = key_limits if key_limits is not None else parse_key_limits(settings.admission_key_limits)
+        self.in_use = 0
+        self._waiters: List[_Waiter] = []
+        self._queued: Dict[str, int] = {name: 0 for name in PRIORITIES}
+        self._key_units: Dict[str, int] = {}
+        self._seq = itertools.count()
+        self._hold_ewma = 1.0
+        self._stats: Dict[str, Any] = {
+            "admitted": {name: 0 for name in PRIORITIES},
+            "rejected": {"queue_full": 0, "timeout": 0, "quota": 0},
+            "wait_seconds": 0.0,
+            "waited": 0,
+        }
+
+    def quota(self, key: str) -> int:
+        """Units one API key may hold or wait for at once; 0 means unlimited"""
+        return self.key_limits.get(key, self.key_limit)
+
+    def batch_units(self, urls: int, requested: Optional[int] = None) -> int:
+        """Units a batch asks for: its concurrency, capped by the batch share of the capacity"""
+        return max(1, min(urls, requested or self.max_batch_units, self.max_batch_units))
+
+    def retry_after(self, units: int = 1) -> int:
+        """Seconds until roughly enough units drain for a new request"""
+        queued_units = sum(w.units for w in self._waiters if not w.cancelled)
+        rounds = (queued_units + units) / self.max_units
+        return max(1, min(60, math.ceil(self._hold_ewma * max(rounds, 1.0))))
+
+    def _reject(self, reason: str, message: str, status_code: int, units: int, priority: str) -> AdmissionRejected:
+        self._stats["rejected"][reason] += 1
+        metrics.count_rejection(reason, priority)
+        return AdmissionRejected(message, status_code, self.retry_after(units), reason)
+
+    def _ahead(self, rank: int) -> bool:
+        return any(self._queued[name] for name, other in PRIORITIES.items() if other <= rank)
+
+    def _grant(self, units: int, key: str, priority: str) -> Ticket:
+        self.in_use += units
+        self._stats["admitted"][priority] += 1
+        return Ticket(self, units, key, priority)
+
+    async def acquire(
+        self,
+        units: int = 1,
+        priority: str = INTERACTIVE,
+        key: Optional[str] = None,
+        timeout: Any = _NO_TIMEOUT,
+    ) -> Ticket:
+        """Admit a request or raise AdmissionRejected; release the ticket when the work ends"""
+        rank = PRIORITIES[priority]
+        units = max(1, min(units, self.max_units))
+        key = key or (BACKGROUND if priority == BACKGROUND else ANONYMOUS)
+        # Background jobs are bounded by the job worker count, not by API key quotas
+        quota = self.quota(key) if priority != BACKGROUND else 0
+        held = self._key_units.get(key, 0)
+        if quota and held + units > quota:
+            raise self._reject(
+                "quota", f"API key is over its quota of {quota} concurrent units", 429, units, priority
+            )
+        if timeout is _NO_TIMEOUT:
+            timeout = None if priority == BACKGROUND else self.queue_timeout
+
+        self._key_units[key] = held + units
+        if self.in_use + units <= self.max_units and not self._ahead(rank):
+            return self._grant(units, key, priority)
+        if priority != BACKGROUND and self.queued - self._queued[BACKGROUND] >= self.max_queue:
+            self._release_key(key, units)
+            raise self._reject("queue_full", "Server is at capacity, admission queue is full", 503, units, priority)
+
+        waiter = _Waiter(rank, next(self._seq), units, key, priority, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, waiter)
+        self._queued[priority] += 1
+        started = time.monotonic()
+        with metrics.stage(metrics.ADMISSION_WAIT):
+            try:
+                return await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+            except asyncio.TimeoutError:
+                if self._abandon(waiter):
+                    raise self._reject(
+                        "timeout", f"Server is at capacity, no slot within {timeout:g} seconds", 503, units, priority
+                    ) from None
+                return waiter.future.result()
+            except BaseException:
+                # Cancelled while queued (client went away); hand back units granted in the meantime
+                if not self._abandon(waiter):
+                    waiter.future.result().release()
+                raise
+            finally:
+                self._stats["waited"] += 1
+                self._stats["wait_seconds"] += time.monotonic() - started
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Drop a queued waiter; False if it was granted units first"""
+        if waiter.future.done():
+            return False
+        waiter.cancelled = True
+        waiter.future.cancel()
+        self._queued[waiter.priority] -= 1
+        self._release_key(waiter.key, waiter.units)
+        self._dispatch()
+        return True
+
+    def _release_key(self, key: str, units: int) -> None:
+        remaining = self._key_units.get(key, 0) - units
+        if remaining > 0:
+            self._key_units[key] = remaining
+        else:
+            self._key_units.pop(key, None)
+
+    def _release(self, ticket: Ticket) -> None:
+        self.in_use -= ticket.units
+        self._release_key(ticket.key, ticket.units)
+        held = time.monotonic() - ticket.admitted_at
+        self._hold_ewma = 0.8 * self._hold_ewma + 0.2 * held
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        # Strict priority: a large waiter at the head blocks smaller ones behind it so it cannot starve
+        while self._waiters:
+            head = self._waiters[0]
+            if head.cancelled:
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_use + head.units > self.max_units:
+                break
+            heapq.heappop(self._waiters)
+            self._queued[head.priority] -= 1
+            head.future.set_result(self._grant(head.units, head.key, head.priority))
+
+    @property
+    def queued(self) -> int:
+        return sum(self._queued.values())
+
+    def stats(self) -> Dict[str, Any]:
+        waited = self._stats["waited"]
+        return {
+            "max_units": self.max_units,
+            "in_use": self.in_use,
+            "queued": self.queued,
+            "queued_by_priority": dict(self._queued),
+            "max_queue": self.max_queue,
+            "admitted": dict(self._stats["admitted"]),
+            "rejected": dict(self._stats["rejected"]),
+            "avg_wait_seconds": self._stats["wait_seconds"] / waited if waited else 0.0,
+            "avg_hold_seconds": round(self._hold_ewma, 3),
+            "active_keys": len(self._key_units),
+        }
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,430 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Any, TYPE_CHECKING
+import asyncio
+import itertools
+import logging
+import time
+
+from app.config import settings
+from app.services import metrics
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil ships with crawl4ai but stay optional
+    psutil = None
+
+if TYPE_CHECKING:
+    from crawl4ai import AsyncWebCrawler, BrowserConfig
+
+logger = logging.getLogger(__name__)
+
+# Rendered by warm_up so the first real request does not open the browser's first page
+_BLANK_PAGE = "raw:<!DOCTYPE html><html><head><title>warm-up</title></head><body></body></html>"
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no browser page becomes available within the acquire timeout"""
+
+
+class PooledBrowser:
+    _ids = itertools.count(1)
+
+    def __init__(self, crawler: "AsyncWebCrawler"):
+        self.id = next(self._ids)
+        self.crawler = crawler
+        self.active_pages = 0
+        self.pages_served = 0
+        self.retiring = False
+        self.unhealthy = False
+        self.started_at = time.monotonic()
+        # Chromium's browser, renderer and helper processes, refreshed by the health check
+        self.pids: List[int] = []
+
+    def is_connected(self) -> bool:
+        """Best-effort liveness check of the underlying Playwright browser"""
+        manager = getattr(self.crawler.crawler_strategy, "browser_manager", None)
+        browser = getattr(manager, "browser", None)
+        if browser is None:
+            # Persistent/managed contexts have no Browser handle; trust the crawler
+            return bool(getattr(self.crawler, "ready", True))
+        return browser.is_connected()
+
+    async def refresh_pids(self) -> None:
+        """Ask the browser over CDP which processes are its own"""
+        manager = getattr(self.crawler.crawler_strategy, "browser_manager", None)
+        browser = getattr(manager, "browser", None)
+        if browser is None:
+            return
+        session = await browser.new_browser_cdp_session()
+        try:
+            info = await session.send("SystemInfo.getProcessInfo")
+        finally:
+            await session.detach()
+        self.pids = [process["id"] for process in info.get("processInfo", [])]
+
+    def memory_bytes(self) -> int:
+        total = 0
+        for pid in self.pids:
+            try:
+                total += psutil.Process(pid).memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return total
+
+
+class BrowserPool:
+    """A shared pool of long-lived AsyncWebCrawler instances.
+
+    Each browser serves up to ``max_pages_per_browser`` concurrent pages and is
+    recycled after ``recycle_after_pages`` pages or when the browser processes
+    exceed ``memory_threshold_mb``.
+    """
+
+    def __init__(
+        self,
+        browser_config: Optional["BrowserConfig"] = None,
+        min_browsers: int = settings.pool_min_browsers,
+        max_browsers: int = settings.pool_max_browsers,
+        max_pages_per_browser: int = settings.pool_max_pages_per_browser,
+        recycle_after_pages: int = settings.pool_recycle_after_pages,
+        memory_threshold_mb: Optional[int] = settings.pool_memory_threshold_mb,
+        health_check_interval: float = settings.pool_health_check_interval,
+        acquire_timeout: float = settings.pool_acquire_timeout,
+    ):
+        # Built on first launch, so importing the pool does not import crawl4ai
+        self.browser_config = browser_config
+        self.min_browsers = max(0, min_browsers)
+        self.max_browsers = max(1, max_browsers, self.min_browsers)
+        self.max_pages_per_browser = max(1, max_pages_per_browser)
+        self.recycle_after_pages = recycle_after_pages
+        self.memory_threshold_mb = memory_threshold_mb
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._browsers: List[PooledBrowser] = []
+        self._launching = 0
+        self._waiting = 0
+        self._condition = asyncio.Condition()
+        self._health_task: Optional[asyncio.Task] = None
+        self._started = False
+        self._closed = False
+
+        self._stats: Dict[str, float] = {
+            "checkouts": 0,
+            "launches": 0,
+            "recycles": 0,
+            "health_failures": 0,
+            "timeouts": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    async def start(self) -> None:
+        """Start health checks; browsers are launched by warm_up or on first use"""
+        if self._started:
+            return
+        self._started = True
+        self._closed = False
+        if self.health_check_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def warm_up(self, browsers: Optional[int] = None, render: bool = True) -> int:
+        """Launch up to ``browsers`` (default min_browsers) in parallel, rendering a blank page in each.
+
+        Returns how many browsers were launched. Browsers join the pool once
+        warm; requests arriving meanwhile wait for them or launch others
+        within max_browsers.
+        """
+        if not self._started:
+            await self.start()
+        target = self.min_browsers if browsers is None else browsers
+        async with self._condition:
+            count = max(0, min(target, self.max_browsers) - len(self._browsers) - self._launching)
+            self._launching += count
+        try:
+            results = await asyncio.gather(*(self._warm_browser(render) for _ in range(count)), return_exceptions=True)
+        except BaseException:
+            async with self._condition:
+                self._launching -= count
+                self._condition.notify_all()
+            raise
+        launched = [entry for entry in results if isinstance(entry, PooledBrowser)]
+        async with self._condition:
+            self._launching -= count
+            closed = self._closed
+            if not closed:
+                self._browsers.extend(launched)
+            self._condition.notify_all()
+        if closed:
+            await asyncio.gather(*(self._close_browser(b) for b in launched), return_exceptions=True)
+            return 0
+        errors = [error for error in results if isinstance(error, BaseException)]
+        if errors:
+            raise errors[0]
+        return len(launched)
+
+    async def _warm_browser(self, render: bool) -> PooledBrowser:
+        from crawl4ai import CacheMode, CrawlerRunConfig
+
+        entry = await self._launch()
+        if not render:
+            return entry
+        try:
+            result = await entry.crawler.arun(
+                url=_BLANK_PAGE, config=CrawlerRunConfig(cache_mode=CacheMode.BYPASS, verbose=False)
+            )
+            if not getattr(result, "success", True):
+                raise RuntimeError(getattr(result, "error_message", None) or "Warm-up render failed")
+        except BaseException:
+            await self._close_browser(entry)
+            raise
+        return entry
+
+    async def close(self) -> None:
+        """Stop health checks and close every browser in the pool"""
+        self._closed = True
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        async with self._condition:
+            browsers, self._browsers = self._browsers, []
+            self._condition.notify_all()
+        await asyncio.gather(*(self._close_browser(b) for b in browsers), return_exceptions=True)
+        self._started = False
+
+    async def _launch(self) -> PooledBrowser:
+        from crawl4ai import AsyncWebCrawler, BrowserConfig
+
+        if self.browser_config is None:
+            self.browser_config = BrowserConfig(headless=True, verbose=False)
+        crawler = AsyncWebCrawler(config=self.browser_config)
+        try:
+            await crawler.start()
+        except BaseException:
+            # Don't leave a half-started browser behind, e.g. when cancelled mid-launch
+            try:
+                await crawler.close()
+            except Exception as e:
+                logger.warning("Error closing a browser that failed to start: %s", e)
+            raise
+        self._stats["launches"] += 1
+        metrics.count_launch("pool")
+        entry = PooledBrowser(crawler)
+        await self._refresh_pids(entry)
+        return entry
+
+    async def _refresh_pids(self, entry: PooledBrowser) -> None:
+        if psutil is None:
+            return
+        try:
+            await entry.refresh_pids()
+        except Exception as e:
+            logger.debug("Could not list the processes of pooled browser %s: %s", entry.id, e)
+
+    async def _close_browser(self, entry: PooledBrowser) -> None:
+        try:
+            await entry.crawler.close()
+        except Exception as e:
+            logger.warning("Error closing pooled browser %s: %s", entry.id, e)
+
+    def _pick(self) -> Optional[PooledBrowser]:
+        candidates = [
+            b for b in self._browsers
+            if not b.retiring and b.active_pages < self.max_pages_per_browser
+        ]
+        if not candidates:
+            return None
+        # Least-loaded first so pages spread across browsers
+        return min(candidates, key=lambda b: b.active_pages)
+
+    async def _checkout(self) -> PooledBrowser:
+        if not self._started:
+            await self.start()
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+
+        async with self._condition:
+            while True:
+                entry = self._pick()
+                if entry:
+                    entry.active_pages += 1
+                    return entry
+                if len(self._browsers) + self._launching < self.max_browsers:
+                    self._launching += 1
+                    break
+                await self._condition.wait()
+
+        # Shielded so a checkout cancelled by acquire()'s timeout neither leaks
+        # the browser being launched nor its launch slot
+        launch = asyncio.ensure_future(self._launch_reserved(checkout=True))
+        try:
+            return await asyncio.shield(launch)
+        except asyncio.CancelledError:
+            launch.add_done_callback(self._abandon_checkout)
+            raise
+
+    async def _launch_reserved(self, checkout: bool) -> PooledBrowser:
+        """Launch a browser into a slot reserved in _launching, optionally with one page checked out"""
+        try:
+            entry = await self._launch()
+        except BaseException:
+            async with self._condition:
+                self._launching -= 1
+                self._condition.notify_all()
+            raise
+
+        async with self._condition:
+            self._launching -= 1
+            closed = self._closed
+            if not closed:
+                entry.active_pages += int(checkout)
+                self._browsers.append(entry)
+            self._condition.notify_all()
+        if closed:
+            await self._close_browser(entry)
+            raise RuntimeError("Browser pool is closed")
+        return entry
+
+    def _abandon_checkout(self, launch: "asyncio.Future[PooledBrowser]") -> None:
+        """Hand back the page of a launch whose checkout was cancelled"""
+        if not launch.cancelled() and launch.exception() is None:
+            asyncio.ensure_future(self._checkin(launch.result(), served=False))
+
+    async def _checkin(self, entry: PooledBrowser, served: bool = True) -> None:
+        to_close = None
+        async with self._condition:
+            entry.active_pages -= 1
+            if served:
+                entry.pages_served += 1
+            if self.recycle_after_pages and entry.pages_served >= self.recycle_after_pages:
+                entry.retiring = True
+            if entry.retiring and entry.active_pages == 0 and entry in self._browsers:
+                self._browsers.remove(entry)
+                if not entry.unhealthy:
+                    self._stats["recycles"] += 1
+                to_close = entry
+            self._condition.notify_all()
+        if to_close:
+            await self._close_browser(to_close)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator["AsyncWebCrawler"]:
+        """Check out a crawler for one page; waits while the pool is saturated"""
+        started = time.monotonic()
+        self._waiting += 1
+        try:
+            entry = await asyncio.wait_for(self._checkout(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise PoolTimeoutError(
+                f"No browser available after {self.acquire_timeout:.0f}s"
+            )
+        finally:
+            self._waiting -= 1
+        waited = time.monotonic() - started
+        metrics.observe_stage(metrics.BROWSER_ACQUIRE, waited)
+        self._stats["checkouts"] += 1
+        self._stats["total_wait_seconds"] += waited
+        self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+        try:
+            yield entry.crawler
+        finally:
+            await self._checkin(entry)
+
+    def _browser_memory_mb(self) -> Optional[float]:
+        """Resident memory of the pool's own browsers and their renderers.
+
+        Session browsers and post-processing workers are children of this
+        process too, but pool browsers should not be retired for their memory.
+        """
+        if psutil is None:
+            return None
+        return sum(b.memory_bytes() for b in self._browsers) / (1024 * 1024)
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.warning("Browser pool health check failed: %s", e)
+
+    async def check_health(self) -> None:
+        """Retire disconnected browsers, enforce the memory threshold and top up to min_browsers"""
+        to_close: List[PooledBrowser] = []
+        if self.memory_threshold_mb:
+            # Renderers come and go with pages, so the process list is re-read every check
+            await asyncio.gather(*(self._refresh_pids(b) for b in list(self._browsers)))
+        async with self._condition:
+            for entry in list(self._browsers):
+                try:
+                    healthy = entry.is_connected()
+                except Exception:
+                    healthy = False
+                if not healthy and not entry.unhealthy:
+                    self._stats["health_failures"] += 1
+                    entry.unhealthy = entry.retiring = True
+
+            memory_mb = self._browser_memory_mb()
+            if (
+                self.memory_threshold_mb
+                and memory_mb is not None
+                and memory_mb > self.memory_threshold_mb
+            ):
+                live = [b for b in self._browsers if not b.retiring]
+                if live:
+                    max(live, key=lambda b: b.pages_served).retiring = True
+
+            for entry in list(self._browsers):
+                if entry.retiring and entry.active_pages == 0:
+                    self._browsers.remove(entry)
+                    # Dead browsers are already counted as health failures
+                    if not entry.unhealthy:
+                        self._stats["recycles"] += 1
+                    to_close.append(entry)
+            live = len([b for b in self._browsers if not b.retiring])
+            # Reserve launch slots like a checkout does, so a top-up never exceeds max_browsers
+            missing = max(0, min(self.min_browsers - live, self.max_browsers - len(self._browsers) - self._launching))
+            self._launching += missing
+            self._condition.notify_all()
+
+        for entry in to_close:
+            await self._close_browser(entry)
+        try:
+            while missing and not self._closed:
+                missing -= 1
+                await self._launch_reserved(checkout=False)
+        finally:
+            if missing:
+                async with self._condition:
+                    self._launching -= missing
+                    self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool sizing and usage counters"""
+        checkouts = self._stats["checkouts"]
+        return {
+            "browsers": len(self._browsers),
+            "launching": self._launching,
+            "active_pages": sum(b.active_pages for b in self._browsers),
+            "waiting": self._waiting,
+            "capacity": self.max_browsers * self.max_pages_per_browser,
+            "min_browsers": self.min_browsers,
+            "max_browsers": self.max_browsers,
+            "max_pages_per_browser": self.max_pages_per_browser,
+            "checkouts": int(checkouts),
+            "launches": int(self._stats["launches"]),
+            "recycles": int(self._stats["recycles"]),
+            "health_failures": int(self._stats["health_failures"]),
+            "timeouts": int(self._stats["timeouts"]),
+            "avg_wait_seconds": self._stats["total_wait_seconds"] / checkouts if checkouts else 0.0,
+            "max_wait_seconds": self._stats["max_wait_seconds"],
+            "browser_memory_mb": self._browser_memory_mb(),
+        }
+
+
+browser_pool = BrowserPool()
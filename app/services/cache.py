@@ -0,0 +1,288 @@
+from collections import OrderedDict
+from contextlib import closing
+from typing import Any, Dict, Optional, Tuple, TYPE_CHECKING
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app.config import settings
+from app.models.requests import BaseCrawlRequest
+from app.services.urls import normalize_url
+
+if TYPE_CHECKING:
+    from app.services.http_fetch import HTTPFetcher
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(request: BaseCrawlRequest) -> str:
+    """Content address for a crawl: normalized URL plus every option that changes the output"""
+    options = {
+        "url": normalize_url(str(request.url)),
+        "extract_images": request.extract_images,
+        "extract_links": request.extract_links,
+        "include_attributes": request.include_attributes,
+        "fast_mode": request.fast_mode,
+        "fetch_mode": request.fetch_mode.value,
+        "session_id": request.session_id,
+        "session": request.session_config.model_dump(mode="json") if request.session_config else None,
+    }
+    encoded = json.dumps(options, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class CacheEntry:
+    __slots__ = ("key", "payload", "stored_at", "etag", "last_modified")
+
+    def __init__(
+        self,
+        key: str,
+        payload: bytes,
+        stored_at: float,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        self.key = key
+        self.payload = payload
+        self.stored_at = stored_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def size(self) -> int:
+        return len(self.payload)
+
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    def can_revalidate(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+class MemoryCacheTier:
+    """Per-process LRU bounded by the total payload size in bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, entry: CacheEntry) -> None:
+        if entry.size > self.max_bytes:
+            return
+        self.delete(entry.key)
+        self._entries[entry.key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+class DiskCacheTier:
+    """SQLite-backed tier shared by every worker process on the host.
+
+    Methods are blocking; the ResponseCache calls them through ``asyncio.to_thread``.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    payload BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT payload, stored_at, etag, last_modified FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return CacheEntry(key, bytes(row[0]), row[1], row[2], row[3])
+
+    def set(self, entry: CacheEntry) -> None:
+        if entry.size > self.max_bytes:
+            return
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, payload, size, stored_at, accessed_at, etag, last_modified) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (entry.key, entry.payload, entry.size, entry.stored_at, time.time(),
+                 entry.etag, entry.last_modified),
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            while total > self.max_bytes:
+                row = conn.execute(
+                    "SELECT key, size FROM cache ORDER BY accessed_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    break
+                conn.execute("DELETE FROM cache WHERE key = ?", (row[0],))
+                total -= row[1]
+                self.evictions += 1
+
+    def touch(self, key: str, stored_at: float) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE cache SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                (stored_at, time.time(), key),
+            )
+
+    def delete(self, key: str) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with closing(self._connect()) as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+
+
+class ResponseCache:
+    """Two-tier (memory LRU, then shared disk) cache of serialized crawl responses"""
+
+    def __init__(
+        self,
+        memory_max_bytes: int = settings.cache_memory_max_bytes,
+        disk_path: Optional[str] = settings.cache_disk_path,
+        disk_max_bytes: int = settings.cache_disk_max_bytes,
+        default_ttl: int = settings.cache_default_ttl,
+    ):
+        self.default_ttl = default_ttl
+        self.memory = MemoryCacheTier(memory_max_bytes)
+        self.disk = DiskCacheTier(disk_path, disk_max_bytes) if disk_path else None
+        self.counters: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stale": 0,
+            "revalidated": 0,
+            "stores": 0,
+            "bypasses": 0,
+            "errors": 0,
+        }
+
+    async def lookup(self, key: str) -> Tuple[Optional[CacheEntry], Optional[str]]:
+        """Return the stored entry regardless of age and the tier it came from"""
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry, "memory"
+        if self.disk is None:
+            return None, None
+        try:
+            entry = await asyncio.to_thread(self.disk.get, key)
+        except sqlite3.Error as e:
+            self.counters["errors"] += 1
+            logger.warning("Disk cache read failed: %s", e)
+            return None, None
+        if entry is None:
+            return None, None
+        self.memory.set(entry)
+        return entry, "disk"
+
+    def is_fresh(self, entry: CacheEntry, max_age: Optional[int]) -> bool:
+        ttl = self.default_ttl if max_age is None else max_age
+        return entry.age() <= ttl
+
+    async def store(self, key: str, payload: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        entry = CacheEntry(key, payload, time.time(), headers.get("etag"), headers.get("last-modified"))
+        self.memory.set(entry)
+        self.counters["stores"] += 1
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.set, entry)
+            except sqlite3.Error as e:
+                self.counters["errors"] += 1
+                logger.warning("Disk cache write failed: %s", e)
+
+    async def refresh(self, entry: CacheEntry) -> None:
+        """Mark a revalidated entry as fresh again in both tiers"""
+        entry.stored_at = time.time()
+        self.memory.set(entry)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.touch, entry.key, entry.stored_at)
+            except sqlite3.Error as e:
+                self.counters["errors"] += 1
+                logger.warning("Disk cache refresh failed: %s", e)
+
+    async def revalidate(self, url: str, entry: CacheEntry, fetcher: "HTTPFetcher", timeout: float = 10.0) -> bool:
+        """Conditional GET with the stored validators over the fetcher's pooled client; True if the origin answered 304"""
+        if not await fetcher.not_modified(url, entry.etag, entry.last_modified, timeout):
+            return False
+        self.counters["revalidated"] += 1
+        await self.refresh(entry)
+        return True
+
+    async def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.clear)
+
+    async def stats(self) -> Dict[str, Any]:
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["revalidated"]
+        lookups = hits + self.counters["misses"]
+        disk_stats = await asyncio.to_thread(self.disk.stats) if self.disk is not None else None
+        return {
+            **self.counters,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "memory_evictions": self.memory.evictions,
+            "memory": self.memory.stats(),
+            "disk": disk_stats,
+            "default_ttl": self.default_ttl,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,423 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+import asyncio
+import bisect
+import hashlib
+import logging
+import time
+
+import aiohttp
+
+from app.config import settings
+from app.models.requests import BatchCrawlRequest
+from app.models.responses import BatchMetadata, ChangeSummary, ClusterSummary, StageTiming, URLError, URLResult
+from app.services.payload import loads
+from app.services.scheduler import parse_retry_after
+from app.services.urls import host_of, normalize_url, unique_urls
+
+logger = logging.getLogger(__name__)
+
+# Retries of a shard on a node that answers 429/503 (admission control) before it counts as down
+_BUSY_RETRIES = 3
+_MAX_BUSY_WAIT = 30.0
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring; each node owns virtual_nodes points so hosts spread evenly"""
+
+    def __init__(self, nodes: Iterable[str], virtual_nodes: int = settings.cluster_virtual_nodes):
+        self.nodes = list(dict.fromkeys(nodes))
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(max(1, virtual_nodes)))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def preference(self, key: str) -> Iterator[str]:
+        """Distinct nodes for a key in ring order; the first is its home node"""
+        if not self._owners:
+            return
+        start = bisect.bisect(self._hashes, _hash(key))
+        seen: Set[str] = set()
+        for offset in range(len(self._owners)):
+            node = self._owners[(start + offset) % len(self._owners)]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self.nodes):
+                    return
+
+    def node_for(self, key: str, down: Iterable[str] = ()) -> Optional[str]:
+        """Home node of a key, or the next live node after it; None when every node is down"""
+        down = set(down)
+        return next((node for node in self.preference(key) if node not in down), None)
+
+
+class _NodeUnavailable(Exception):
+    """The node is unreachable, died mid-shard or kept shedding load"""
+
+
+class _ShardRejected(Exception):
+    """The node refused the shard itself (4xx), so another node would too"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+async def _lines(content: aiohttp.StreamReader) -> AsyncIterator[bytes]:
+    """NDJSON lines of any length; aiohttp's readline caps a line at its buffer size"""
+    buffer = bytearray()
+    scanned = 0
+    async for chunk in content.iter_any():
+        buffer.extend(chunk)
+        start = 0
+        while True:
+            end = buffer.find(b"\n", max(start, scanned))
+            if end == -1:
+                break
+            yield bytes(buffer[start:end])
+            start = end + 1
+        del buffer[:start]
+        scanned = len(buffer)
+    if buffer.strip():
+        yield bytes(buffer)
+
+
+def _merge_trailers(trailers: List[BatchMetadata]) -> Tuple[Dict[str, StageTiming], Optional[ChangeSummary]]:
+    """Stage timings and change counts of all shards: work is summed, wall time is the longest shard's"""
+    stages: Dict[str, StageTiming] = {}
+    changes: Optional[ChangeSummary] = None
+    for trailer in trailers:
+        for name, timing in trailer.stages.items():
+            merged = stages.setdefault(name, StageTiming())
+            merged.items += timing.items
+            merged.busy_seconds += timing.busy_seconds
+            merged.queue_wait_seconds += timing.queue_wait_seconds
+            merged.wall_seconds = max(merged.wall_seconds, timing.wall_seconds)
+        if trailer.changes is not None:
+            changes = changes or ChangeSummary()
+            for field in ChangeSummary.model_fields:
+                setattr(changes, field, getattr(changes, field) + getattr(trailer.changes, field))
+    for merged in stages.values():
+        merged.avg_seconds = merged.busy_seconds / merged.items if merged.items else 0.0
+    return stages, changes
+
+
+class ClusterCoordinator:
+    """Coordinator mode: shards batches across worker nodes over HTTP.
+
+    URLs are routed by consistent hashing on their host, so a host's
+    politeness limits, sessions, caches and recrawl fingerprints stay on one
+    node. Each shard is streamed from the node's /crawl/batch/stream, so
+    results arrive as they complete and a node that dies mid-shard loses
+    only the URLs it had not reported yet; those are routed again, skipping
+    nodes marked down for ``node_cooldown`` seconds. Shard trailers are
+    merged into a single BatchMetadata.
+    """
+
+    def __init__(
+        self,
+        nodes: Optional[List[str]] = None,
+        virtual_nodes: int = settings.cluster_virtual_nodes,
+        shard_size: int = settings.cluster_shard_size,
+        node_concurrency: int = settings.cluster_node_concurrency,
+        connect_timeout: float = settings.cluster_connect_timeout,
+        read_timeout: float = settings.cluster_read_timeout,
+        node_cooldown: float = settings.cluster_node_cooldown,
+        max_reassignments: int = settings.cluster_max_reassignments,
+        api_key: Optional[str] = settings.cluster_api_key,
+    ):
+        nodes = settings.cluster_nodes if nodes is None else nodes
+        self.nodes = [node.rstrip("/") for node in nodes]
+        self.ring = HashRing(self.nodes, virtual_nodes)
+        self.shard_size = max(1, shard_size)
+        self.node_concurrency = max(1, node_concurrency)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.node_cooldown = node_cooldown
+        self.max_reassignments = max(0, max_reassignments)
+        self.api_key = api_key
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._down_until: Dict[str, float] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._stats: Dict[str, Any] = {
+            "batches": 0,
+            "shards": 0,
+            "reassigned_shards": 0,
+            "busy_retries": 0,
+            "node_failures": {node: 0 for node in self.nodes},
+            "urls_by_node": {node: 0 for node in self.nodes},
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.nodes)
+
+    def _client(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            headers = {settings.admission_api_key_header: self.api_key} if self.api_key else None
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=len(self.nodes) * self.node_concurrency * 2),
+                headers=headers,
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _slot(self, node: str) -> asyncio.Semaphore:
+        slot = self._slots.get(node)
+        if slot is None:
+            slot = self._slots[node] = asyncio.Semaphore(self.node_concurrency)
+        return slot
+
+    def down_nodes(self) -> Set[str]:
+        now = time.monotonic()
+        return {node for node, until in self._down_until.items() if until > now}
+
+    def _mark_down(self, node: str, reason: str) -> None:
+        logger.warning("Cluster node %s is down for %.0fs: %s", node, self.node_cooldown, reason)
+        self._down_until[node] = time.monotonic() + self.node_cooldown
+        self._stats["node_failures"][node] += 1
+
+    def route(self, urls: List[str]) -> Tuple[List[Tuple[str, List[str]]], List[str]]:
+        """Shards as (node, urls), keeping each host on its home node, plus URLs no live node can take.
+
+        A shard holds whole hosts up to shard_size URLs; a host with more
+        URLs than that is split over several shards of the same node.
+        """
+        down = self.down_nodes()
+        by_node: "OrderedDict[str, OrderedDict[str, List[str]]]" = OrderedDict()
+        unroutable: List[str] = []
+        for url in urls:
+            host = host_of(url)
+            node = self.ring.node_for(host, down)
+            if node is None:
+                unroutable.append(url)
+                continue
+            by_node.setdefault(node, OrderedDict()).setdefault(host, []).append(url)
+
+        shards: List[Tuple[str, List[str]]] = []
+        for node, hosts in by_node.items():
+            shard: List[str] = []
+            for host_urls in hosts.values():
+                if shard and len(shard) + len(host_urls) > self.shard_size:
+                    shards.append((node, shard))
+                    shard = []
+                for start in range(0, len(host_urls), self.shard_size):
+                    chunk = host_urls[start:start + self.shard_size]
+                    if len(chunk) == self.shard_size:
+                        shards.append((node, chunk))
+                    else:
+                        shard.extend(chunk)
+            if shard:
+                shards.append((node, shard))
+        return shards, unroutable
+
+    async def crawl_batch_stream(
+        self,
+        request: BatchCrawlRequest,
+        progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None
+    ) -> AsyncIterator[Union[URLResult, URLError, BatchMetadata]]:
+        """Same contract as CrawlerService.crawl_batch_stream, with the crawling done by worker nodes"""
+        self._stats["batches"] += 1
+        start_time = datetime.utcnow()
+        urls = unique_urls(request.urls)
+        # Bounded, so slow consumers push back on the node streams
+        queue: asyncio.Queue = asyncio.Queue(maxsize=len(self.nodes) * self.node_concurrency)
+        tasks: Set[asyncio.Task] = set()
+        trailers: List[BatchMetadata] = []
+        summary = ClusterSummary()
+        resolved = successful_count = failed_count = open_shards = 0
+
+        def dispatch(shard_urls: List[str], attempt: int) -> List[str]:
+            nonlocal open_shards
+            shards, unroutable = self.route(shard_urls)
+            for node, shard in shards:
+                open_shards += 1
+                summary.shards += 1
+                self._stats["shards"] += 1
+                if attempt:
+                    summary.reassigned_shards += 1
+                    self._stats["reassigned_shards"] += 1
+                task = asyncio.create_task(self._run_shard(node, shard, attempt, request, queue))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            return unroutable
+
+        pending_errors = [
+            self._error(url, "No cluster node is available", retryable=True) for url in dispatch(urls, 0)
+        ]
+        try:
+            # Every shard ends with one "done" or "reassign" event, so trailers arriving after the last result are kept
+            while resolved < len(urls) or open_shards:
+                if pending_errors:
+                    item = pending_errors.pop()
+                    resolved += 1
+                    failed_count += 1
+                    if progress_callback:
+                        await progress_callback(resolved, len(urls))
+                    yield item
+                    continue
+                event = await queue.get()
+                kind = event[0]
+                if kind == "item":
+                    _, node, item = event
+                    resolved += 1
+                    if isinstance(item, URLResult):
+                        successful_count += 1
+                        summary.urls_by_node[node] = summary.urls_by_node.get(node, 0) + 1
+                        self._stats["urls_by_node"][node] += 1
+                    else:
+                        failed_count += 1
+                    if progress_callback:
+                        await progress_callback(resolved, len(urls))
+                    yield item
+                elif kind == "unchanged":
+                    # Incremental batches report unchanged pages only in the shard trailer
+                    resolved += event[1]
+                    successful_count += event[1]
+                    if progress_callback:
+                        await progress_callback(resolved, len(urls))
+                elif kind == "done":
+                    open_shards -= 1
+                    if event[1] is not None:
+                        trailers.append(event[1])
+                else:
+                    open_shards -= 1
+                    _, node, shard_urls, attempt, reason = event
+                    if attempt > self.max_reassignments:
+                        pending_errors.extend(
+                            self._error(url, f"Gave up after {attempt} nodes failed, last {node}: {reason}", retryable=True)
+                            for url in shard_urls
+                        )
+                    else:
+                        pending_errors.extend(
+                            self._error(url, "No cluster node is available", retryable=True)
+                            for url in dispatch(shard_urls, attempt)
+                        )
+        finally:
+            for task in list(tasks):
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        stages, changes = _merge_trailers(trailers)
+        end_time = datetime.utcnow()
+        yield BatchMetadata(
+            start_time=start_time,
+            end_time=end_time,
+            total_urls=len(urls),
+            successful_count=successful_count,
+            failed_count=failed_count,
+            duplicate_count=len(request.urls) - len(urls),
+            total_time_seconds=(end_time - start_time).total_seconds(),
+            stages=stages,
+            changes=changes,
+            cluster=summary
+        )
+
+    def _error(self, url: str, message: str, status_code: Optional[int] = None, retryable: bool = False) -> URLError:
+        return URLError(
+            url=url,
+            error=message,
+            attempt_count=1,
+            last_attempt=datetime.utcnow(),
+            status_code=status_code,
+            retryable=retryable
+        )
+
+    async def _run_shard(
+        self,
+        node: str,
+        urls: List[str],
+        attempt: int,
+        request: BatchCrawlRequest,
+        queue: asyncio.Queue
+    ) -> None:
+        """Stream one shard from a node; unreported URLs are handed back for rerouting if the node fails"""
+        remaining = {normalize_url(url): url for url in urls}
+        # A sink belongs to the coordinator's job; nodes only stream results back
+        body = request.model_dump(mode="json", exclude={"urls", "sink"}) | {"urls": urls}
+        try:
+            async with self._slot(node):
+                trailer = await self._stream_shard(node, body, remaining, queue)
+        except _ShardRejected as e:
+            for url in remaining.values():
+                await queue.put(("item", node, self._error(url, str(e), e.status_code)))
+            await queue.put(("done", None))
+            return
+        except (_NodeUnavailable, aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            reason = str(e) or type(e).__name__
+            self._mark_down(node, reason)
+            await queue.put(("reassign", node, list(remaining.values()), attempt + 1, reason))
+            return
+
+        if remaining and request.incremental:
+            await queue.put(("unchanged", len(remaining)))
+        else:
+            for url in remaining.values():
+                await queue.put(("item", node, self._error(url, f"Node {node} returned no result for this URL")))
+        await queue.put(("done", trailer))
+
+    async def _stream_shard(
+        self,
+        node: str,
+        body: Dict[str, Any],
+        remaining: Dict[str, str],
+        queue: asyncio.Queue
+    ) -> BatchMetadata:
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+        for busy in range(_BUSY_RETRIES + 1):
+            async with self._client().post(
+                f"{node}/api/v1/crawl/batch/stream", params={"format": "ndjson"}, json=body, timeout=timeout
+            ) as response:
+                if response.status in (429, 503):
+                    if busy == _BUSY_RETRIES:
+                        raise _NodeUnavailable(f"node kept answering HTTP {response.status}")
+                    self._stats["busy_retries"] += 1
+                    delay = parse_retry_after(response.headers.get("Retry-After")) or 1.0
+                    await asyncio.sleep(min(delay, _MAX_BUSY_WAIT))
+                    continue
+                if response.status >= 500:
+                    raise _NodeUnavailable(f"HTTP {response.status}")
+                if response.status != 200:
+                    detail = (await response.text())[:500]
+                    raise _ShardRejected(f"Node {node} rejected the shard: HTTP {response.status} {detail}", response.status)
+
+                async for line in _lines(response.content):
+                    if not line.strip():
+                        continue
+                    event = loads(line)
+                    kind, data = event["type"], event["data"]
+                    if kind == "metadata":
+                        return BatchMetadata.model_validate(data)
+                    item = URLResult.model_validate(data) if kind == "result" else URLError.model_validate(data)
+                    if remaining.pop(normalize_url(str(item.url)), None) is not None:
+                        await queue.put(("item", node, item))
+                raise _NodeUnavailable("stream ended before the batch trailer")
+        raise _NodeUnavailable("node is busy")
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "enabled": self.enabled,
+            "nodes": self.nodes,
+            "down": {node: round(until - now, 1) for node, until in self._down_until.items() if until > now},
+            "shard_size": self.shard_size,
+            "node_concurrency": self.node_concurrency,
+            "batches": self._stats["batches"],
+            "shards": self._stats["shards"],
+            "reassigned_shards": self._stats["reassigned_shards"],
+            "busy_retries": self._stats["busy_retries"],
+            "node_failures": dict(self._stats["node_failures"]),
+            "urls_by_node": dict(self._stats["urls_by_node"]),
+        }
+
+
+cluster_coordinator = ClusterCoordinator()
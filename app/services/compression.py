@@ -0,0 +1,201 @@
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import gzip
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - br is only offered when brotli is installed
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstd is only offered when zstandard is installed
+    zstandard = None
+
+# Bodies above this size are compressed in a thread so the event loop keeps serving
+_THREAD_THRESHOLD = 256 * 1024
+
+_COMPRESSIBLE = ("text/", "application/json", "application/x-ndjson", "application/xml", "application/javascript")
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdStream:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class Codec:
+    def __init__(self, compress: Callable[[bytes], bytes], stream: Callable[[], Any]):
+        self.compress = compress
+        self.stream = stream
+
+
+def _codecs() -> Dict[str, Codec]:
+    """Available encodings, in the order the server prefers them"""
+    codecs: Dict[str, Codec] = {}
+    if zstandard is not None:
+        level = settings.compression_zstd_level
+        codecs["zstd"] = Codec(lambda data: zstandard.ZstdCompressor(level=level).compress(data), lambda: _ZstdStream(level))
+    if brotli is not None:
+        quality = settings.compression_brotli_quality
+        codecs["br"] = Codec(lambda data: brotli.compress(data, quality=quality), lambda: _BrotliStream(quality))
+    level = settings.compression_gzip_level
+    codecs["gzip"] = Codec(lambda data: gzip.compress(data, compresslevel=level, mtime=0), lambda: _GzipStream(level))
+    return codecs
+
+
+CODECS = _codecs()
+
+
+def choose_encoding(accept_encoding: str, codecs: Dict[str, Codec] = CODECS) -> Optional[str]:
+    """Best supported coding for an Accept-Encoding header, honoring q-values; None for identity"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+    best, best_q = None, 0.0
+    for name in codecs:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def _compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "").lower()
+    return (
+        "content-encoding" not in headers
+        and (content_type.startswith(_COMPRESSIBLE) or content_type.endswith(("+json", "+xml")))
+    )
+
+
+class _CompressingSend:
+    """Wraps ASGI send for one response: whole bodies at once, streamed bodies flushed per message"""
+
+    def __init__(self, send: Any, encoding: str, codec: Codec, min_bytes: int):
+        self.send = send
+        self.encoding = encoding
+        self.codec = codec
+        self.min_bytes = min_bytes
+        self.start: Optional[Dict[str, Any]] = None
+        self.stream: Any = None
+        self.passthrough = False
+
+    def _set_encoding(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+
+    async def __call__(self, message: Dict[str, Any]) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            self.start = message
+            return
+        if kind != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is not None:
+            chunk = self.stream.compress(body) + (self.stream.flush() if more_body else self.stream.finish())
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+            return
+
+        start, self.start = self.start, None
+        headers = MutableHeaders(raw=start["headers"])
+        if (
+            start["status"] in (204, 304)
+            or not _compressible(headers)
+            or (not more_body and len(body) < self.min_bytes)
+        ):
+            self.passthrough = True
+            await self.send(start)
+            await self.send(message)
+            return
+
+        self._set_encoding(headers)
+        if not more_body:
+            if len(body) > _THREAD_THRESHOLD:
+                body = await asyncio.to_thread(self.codec.compress, body)
+            else:
+                body = self.codec.compress(body)
+            headers["Content-Length"] = str(len(body))
+            await self.send(start)
+            await self.send({"type": "http.response.body", "body": body, "more_body": False})
+            return
+
+        # Streaming (NDJSON/SSE): flush after every message so clients see each event as it is sent
+        if "content-length" in headers:
+            del headers["Content-Length"]
+        self.stream = self.codec.stream()
+        await self.send(start)
+        chunk = self.stream.compress(body) + self.stream.flush()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing JSON, NDJSON and text responses with zstd, br or gzip"""
+
+    def __init__(self, app: Any, min_bytes: int = settings.compression_min_bytes):
+        self.app = app
+        self.min_bytes = min_bytes
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not settings.compression_enabled:
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, encoding, CODECS[encoding], self.min_bytes))
@@ -1,140 +1,729 @@
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
-from bs4 import BeautifulSoup
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Optional, Any, Callable, Awaitable, AsyncIterator, Tuple, Union, TYPE_CHECKING
 import asyncio
-from tenacity import retry, stop_after_attempt, wait_exponential
+import time
 
 from app.models.requests import (
     BaseCrawlRequest, BatchCrawlRequest, SessionConfig,
-    RetryConfig, ContentExtractionRequest
+    RetryConfig, ContentExtractionRequest, FetchMode
 )
 from app.models.responses import (
     BaseCrawlResponse, BatchCrawlResponse, URLResult,
-    URLError, CrawlMetadata, BatchMetadata
+    URLError, CrawlMetadata, BatchMetadata, StageTiming
 )
+from app.services.browser_pool import BrowserPool, browser_pool
+from app.services.cache import ResponseCache, response_cache, cache_key
+from app.services.cluster import ClusterCoordinator, cluster_coordinator
+from app.services.singleflight import SingleFlight
+from app.services.html_extract import HTMLExtractor, ExtractedResources, get_extractor, extract_html
+from app.services.executor import PostProcessExecutor, postprocess_executor
+from app.services.urls import host_of, unique_urls
+from app.services.scheduler import HostScheduler, host_scheduler, parse_retry_after
+from app.services.fast_mode import (
+    SHARED_DATA_KEY, build_blocking_rules, choose_wait_until
+)
+from app.services.http_fetch import HTTPFetcher, http_fetcher, analyze_http_page
+from app.services.interactions import INTERACTIONS_DATA_KEY, InteractionRun, interaction_engine
+from app.services.page_hooks import SESSION_DATA_KEY, install_hooks
+from app.services.session import SessionService, SessionNotFoundError, session_service
+from app.services.llm import LLMEngine, llm_engine
+from app.services import metrics
+from app.services.recrawl import (
+    NO_CONTENT, UNCHANGED, ChangeTracker, FingerprintIndex,
+    content_fingerprint, fingerprint_index, is_success
+)
+from app.services.retry import (
+    CrawlError, RetryBudget, RetryPolicy, classify_failure, is_retryable, is_retryable_status
+)
+from app.config import settings
+
+if TYPE_CHECKING:
+    from crawl4ai import AsyncWebCrawler
+
+# Shared by every CrawlerService in the process so all routers coalesce together
+inflight_crawls = SingleFlight()
+# Retry budget for single-URL requests; batches get their own
+request_retry_budget = RetryBudget(max_tokens=100)
+
+def _header(headers: Dict[str, str], name: str) -> Optional[str]:
+    """Case-insensitive header lookup"""
+    return next((v for k, v in headers.items() if k.lower() == name), None)
+
+class _StageClock:
+    """Busy time, wall time and queue wait of one batch pipeline stage"""
 
-class CrawlerService:
     def __init__(self):
-        self.browser_config = BrowserConfig(headless=True)
+        self.items = 0
+        self.busy = 0.0
+        self.queue_wait = 0.0
+        self.first_start: Optional[float] = None
+        self.last_end: Optional[float] = None
+
+    def record(self, started: float, ended: float, queued_at: Optional[float] = None) -> None:
+        self.items += 1
+        self.busy += ended - started
+        if queued_at is not None:
+            self.queue_wait += started - queued_at
+        self.first_start = started if self.first_start is None else min(self.first_start, started)
+        self.last_end = ended if self.last_end is None else max(self.last_end, ended)
+
+    def timing(self) -> StageTiming:
+        wall = self.last_end - self.first_start if self.items else 0.0
+        return StageTiming(
+            items=self.items,
+            busy_seconds=self.busy,
+            wall_seconds=wall,
+            avg_seconds=self.busy / self.items if self.items else 0.0,
+            queue_wait_seconds=self.queue_wait
+        )
+
+class CrawlerService:
+    def __init__(
+        self,
+        pool: Optional[BrowserPool] = None,
+        cache: Optional[ResponseCache] = None,
+        singleflight: Optional[SingleFlight] = None,
+        html_extractor: Optional[HTMLExtractor] = None,
+        executor: Optional[PostProcessExecutor] = None,
+        scheduler: Optional[HostScheduler] = None,
+        fetcher: Optional[HTTPFetcher] = None,
+        sessions: Optional[SessionService] = None,
+        llm: Optional[LLMEngine] = None,
+        fingerprints: Optional[FingerprintIndex] = None,
+        cluster: Optional[ClusterCoordinator] = None
+    ):
+        self.pool = pool or browser_pool
+        self.cache = cache or response_cache
+        self.singleflight = singleflight or inflight_crawls
+        self.html_extractor = html_extractor or get_extractor()
+        self.executor = executor or postprocess_executor
+        self.scheduler = scheduler or host_scheduler
+        self.http_fetcher = fetcher or http_fetcher
+        self.sessions = sessions or session_service
+        self.llm = llm or llm_engine
+        self.fingerprints = fingerprints or fingerprint_index
+        self.cluster = cluster or cluster_coordinator
         
     async def _create_metadata(self, result: Any, url: str) -> CrawlMetadata:
         """Create metadata from crawl result"""
+        headers = getattr(result, 'response_headers', None) or getattr(result, 'headers', None) or {}
+        headers = {str(k): str(v) for k, v in headers.items()}
+        content_type = _header(headers, 'content-type')
         return CrawlMetadata(
             crawl_time=datetime.utcnow(),
-            content_type=result.content_type if hasattr(result, 'content_type') else None,
-            status_code=result.status_code if hasattr(result, 'status_code') else 200,
-            headers=result.headers if hasattr(result, 'headers') else {},
-            final_url=url
+            content_type=content_type,
+            status_code=getattr(result, 'status_code', None) or 200,
+            headers=headers,
+            final_url=getattr(result, 'redirected_url', None) or url
         )
 
-    def _extract_from_html(self, html: str, extract_images: bool = False, extract_links: bool = False) -> Tuple[List[str], List[str]]:
-        """Extract images and links from HTML content"""
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        images = []
-        if extract_images:
-            img_tags = soup.find_all('img')
-            images = [img.get('src') for img in img_tags if img.get('src')]
-
-        links = []
-        if extract_links:
-            link_tags = soup.find_all('a')
-            links = [link.get('href') for link in link_tags if link.get('href')]
-
-        return images, links
-
-    async def _configure_session(self, crawler: AsyncWebCrawler, config: SessionConfig) -> None:
-        """Configure browser session based on session config"""
-        if config.auth_required and config.credentials:
-            # Implementation for authentication will go here
-            pass
-
-        for step in config.interaction_steps:
-            # Implementation for browser interactions will go here
-            pass
-
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    async def crawl_url(self, request: BaseCrawlRequest) -> BaseCrawlResponse:
-        """Crawl a single URL with retry logic"""
-        run_config = CrawlerRunConfig(
-            cache_mode=CacheMode.BYPASS,
-            word_count_threshold=1,
-            page_timeout=request.session_config.timeout if request.session_config else 30000,
+    def _extract_from_html(
+        self,
+        html: str,
+        extract_images: bool = False,
+        extract_links: bool = False,
+        base_url: Optional[str] = None,
+        include_attributes: bool = False
+    ) -> ExtractedResources:
+        """Extract images and links from HTML content, resolved against base_url"""
+        return self.html_extractor.extract(
+            html,
+            base_url=base_url,
+            extract_images=extract_images,
+            extract_links=extract_links,
+            include_attributes=include_attributes
         )
 
-        async with AsyncWebCrawler(config=self.browser_config) as crawler:
-            if request.session_config:
-                await self._configure_session(crawler, request.session_config)
+    def _configure_session(self, url: str, config: SessionConfig, shared_data: Dict[str, Any]) -> Optional[InteractionRun]:
+        """Queue the request's interaction steps to run on the loaded page before its HTML is read"""
+        if not config.interaction_steps:
+            return None
+        credentials = config.credentials if config.auth_required else None
+        run = InteractionRun(interaction_engine.plan(url, config.interaction_steps), credentials)
+        shared_data[INTERACTIONS_DATA_KEY] = run
+        return run
+
+    async def crawl_url(
+        self,
+        request: BaseCrawlRequest,
+        budget: Optional[RetryBudget] = None,
+        max_attempts: Optional[int] = None
+    ) -> BaseCrawlResponse:
+        """Crawl a single URL, serving from the response cache when allowed.
+
+        Retries follow request.retry_config. Callers that own a RetryBudget pass
+        it in and record their own first attempts; max_attempts overrides the
+        config, e.g. 1 when a batch defers its retries.
+        """
+        with metrics.track_crawl(host_of(str(request.url))) as labels:
+            response = await self._crawl_url(request, budget, max_attempts)
+            if response.metadata.cache_status in ("hit", "revalidated"):
+                labels["tier"] = "cache"
+            else:
+                labels["tier"] = response.metadata.fetch_tier or "browser"
+            return response
+
+    async def _crawl_url(
+        self,
+        request: BaseCrawlRequest,
+        budget: Optional[RetryBudget],
+        max_attempts: Optional[int]
+    ) -> BaseCrawlResponse:
+        if request.session_id and not await self.sessions.exists(request.session_id):
+            raise SessionNotFoundError(f"Session '{request.session_id}' not found")
+        if request.session_config and request.session_config.interaction_steps and not request.session_id:
+            # Validate the steps (and warm the site's plan) before any fetch
+            interaction_engine.plan(str(request.url), request.session_config.interaction_steps)
+        if budget is None:
+            budget = request_retry_budget
+            budget.record_attempt()
+        key = cache_key(request)
+        if request.no_cache or not settings.cache_enabled:
+            self.cache.counters["bypasses"] += 1
+            response = await self._crawl_shared(key, request, budget, max_attempts)
+            response.metadata.cache_status = "bypass"
+            return response
+
+        entry, tier = await self.cache.lookup(key)
+        if entry is not None:
+            if self.cache.is_fresh(entry, request.max_age):
+                self.cache.counters[f"{tier}_hits"] += 1
+                return self._from_cache(entry.payload, "hit")
+            self.cache.counters["stale"] += 1
+            # An anonymous conditional GET says nothing about a page fetched with a session's login
+            if (
+                entry.can_revalidate()
+                and self._anonymous(request)
+                and await self.cache.revalidate(str(request.url), entry, self.http_fetcher)
+            ):
+                return self._from_cache(entry.payload, "revalidated")
+        # A stale entry that could not be revalidated is crawled again, so it counts as a miss
+        self.cache.counters["misses"] += 1
+
+        response = await self._crawl_shared(key, request, budget, max_attempts, store=True)
+        response.metadata.cache_status = "miss"
+        return response
+
+    async def _crawl_shared(
+        self,
+        key: str,
+        request: BaseCrawlRequest,
+        budget: RetryBudget,
+        max_attempts: Optional[int] = None,
+        store: bool = False
+    ) -> BaseCrawlResponse:
+        """Run one crawl per key at a time; concurrent identical requests share it"""
+        async def crawl_once() -> BaseCrawlResponse:
+            response = await self._crawl_with_retry(request, budget, max_attempts)
+            if store and response.metadata.status_code < 400:
+                await self.cache.store(key, response.model_dump_json().encode("utf-8"), response.metadata.headers)
+            return response
+
+        response = await self.singleflight.do(key, crawl_once)
+        # Every caller gets its own copy so per-caller metadata never leaks across requests
+        return response.model_copy(deep=True)
+
+    def _from_cache(self, payload: bytes, cache_status: str) -> BaseCrawlResponse:
+        response = BaseCrawlResponse.model_validate_json(payload)
+        response.metadata.cache_status = cache_status
+        return response
+
+    async def _crawl_with_retry(
+        self,
+        request: BaseCrawlRequest,
+        budget: RetryBudget,
+        max_attempts: Optional[int] = None
+    ) -> BaseCrawlResponse:
+        """Retry transient failures with jittered backoff while the budget allows"""
+        policy = RetryPolicy(request.retry_config)
+        attempts = max_attempts or policy.max_attempts
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            attempt_started = time.monotonic()
+            try:
+                response = await self._crawl_uncached(request)
+            except Exception as e:
+                error = e if isinstance(e, CrawlError) else CrawlError(str(e) or type(e).__name__, retryable=is_retryable(e))
+                error.attempt_count = attempt
+                error.elapsed_seconds = time.monotonic() - started
+                if not error.retryable or attempt >= attempts or not budget.try_spend():
+                    if error is e:
+                        raise
+                    raise error from e
+                await asyncio.sleep(policy.delay(attempt, error.retry_after))
+                continue
+            response.metadata.attempt_count = attempt
+            response.metadata.elapsed_seconds = time.monotonic() - started
+            # The successful attempt alone, without retry backoff, for the host scheduler
+            response.metadata.fetch_seconds = time.monotonic() - attempt_started
+            return response
+
+    async def _crawl_uncached(self, request: BaseCrawlRequest) -> BaseCrawlResponse:
+        """Crawl a single URL once, over plain HTTP when the page allows it, else in the browser"""
+        escalation_reason = None
+        if self._http_tier_allowed(request):
+            host = host_of(str(request.url))
+            if request.fetch_mode == FetchMode.AUTO and self.http_fetcher.memory.prefers_browser(host):
+                escalation_reason = "host_memory"
+            else:
+                response, escalation_reason = await self._fetch_over_http(request, host)
+                if response is not None:
+                    return response
+
+        response = await self._render_in_browser(request)
+        response.metadata.fetch_tier = "browser"
+        response.metadata.escalation_reason = escalation_reason
+        return response
+
+    def _anonymous(self, request: BaseCrawlRequest) -> bool:
+        """Whether the page is fetched without a session, login or interaction steps"""
+        if request.session_id:
+            return False
+        session = request.session_config
+        return not (session and (session.auth_required or session.interaction_steps))
+
+    def _http_tier_allowed(self, request: BaseCrawlRequest) -> bool:
+        """Whether the request may skip the browser; sessions, logins and interactions always need one"""
+        if request.session_id:
+            return False
+        if request.fetch_mode == FetchMode.HTTP:
+            return True
+        if request.fetch_mode == FetchMode.BROWSER or not settings.http_tier_enabled:
+            return False
+        return self._anonymous(request)
+
+    def _raise_for_status(self, metadata: CrawlMetadata, url: str) -> None:
+        """Throttled and server-error responses are retried rather than returned"""
+        if is_retryable_status(metadata.status_code):
+            raise CrawlError(
+                f"HTTP {metadata.status_code} from {url}",
+                metadata.status_code,
+                retryable=True,
+                retry_after=parse_retry_after(_header(metadata.headers, "retry-after"))
+            )
+
+    async def _fetch_over_http(
+        self,
+        request: BaseCrawlRequest,
+        host: str
+    ) -> Tuple[Optional[BaseCrawlResponse], Optional[str]]:
+        """Try the browserless tier; returns (response, None) or (None, escalation reason)"""
+        url = str(request.url)
+        forced = request.fetch_mode == FetchMode.HTTP
+        timeout = request.session_config.timeout / 1000 if request.session_config else None
+        try:
+            page = await self.http_fetcher.fetch(url, timeout)
+        except CrawlError:
+            if forced:
+                raise
+            # Network errors say nothing about the site needing JavaScript, so don't remember them
+            self.http_fetcher.record_escalation(host, "http_error", remember=False)
+            return None, "http_error"
+
+        metadata = CrawlMetadata(
+            crawl_time=datetime.utcnow(),
+            content_type=page.content_type,
+            status_code=page.status_code,
+            headers=page.headers,
+            final_url=page.url,
+            fetch_tier="http"
+        )
+        self._raise_for_status(metadata, url)
+
+        # Bot walls often answer plain clients with 401/403 but let a real browser through
+        if not forced and page.status_code in (401, 403):
+            self.http_fetcher.record_escalation(host, "blocked_status")
+            return None, "blocked_status"
+
+        if page.is_text and not page.is_html:
+            markdown, resources = page.body, ExtractedResources(page.url)
+        elif page.is_html:
+            reason, markdown, resources, timings = await self.executor.run(
+                analyze_http_page,
+                page.body,
+                page.url,
+                request.extract_images,
+                request.extract_links,
+                request.include_attributes,
+                self.html_extractor.name,
+                settings.http_tier_min_text_chars,
+                not forced
+            )
+            for stage, seconds in timings.items():
+                metrics.observe_stage(stage, seconds)
+            if reason is not None:
+                self.http_fetcher.record_escalation(host, reason)
+                return None, reason
+        elif forced:
+            markdown, resources = "", ExtractedResources(page.url)
+        else:
+            self.http_fetcher.record_escalation(host, "content_type", remember=False)
+            return None, "content_type"
+
+        self.http_fetcher.record_served(host)
+        return self._build_response(request, markdown, resources, metadata), None
+
+    @asynccontextmanager
+    async def _browser(self, session_id: Optional[str], shared_data: Dict[str, Any]) -> AsyncIterator["AsyncWebCrawler"]:
+        """A pooled crawler, or the session's own warm browser when session_id is set"""
+        if session_id is None:
+            async with self.pool.acquire() as crawler:
+                yield crawler
+            return
+        async with self.sessions.use(session_id) as session:
+            shared_data[SESSION_DATA_KEY] = session
+            yield session.crawler
+
+    async def _render_in_browser(self, request: BaseCrawlRequest) -> BaseCrawlResponse:
+        """Render a single URL in a pooled or session browser, raising CrawlError for failed or throttled pages"""
+        from crawl4ai import CacheMode, CrawlerRunConfig
+
+        blocking_rules = build_blocking_rules(request.session_config) if request.fast_mode else None
+        marks: Dict[str, float] = {}
+        shared_data: Dict[str, Any] = {metrics.MARKS_DATA_KEY: marks}
+        if blocking_rules:
+            shared_data[SHARED_DATA_KEY] = blocking_rules
+        interactions = None
+        if request.session_config and not request.session_id:
+            interactions = self._configure_session(str(request.url), request.session_config, shared_data)
 
+        # Hold the page only for the render; post-processing runs after release
+        async with self._browser(request.session_id, shared_data) as crawler:
+            install_hooks(crawler)
+
+            run_config = CrawlerRunConfig(
+                cache_mode=CacheMode.BYPASS,
+                word_count_threshold=1,
+                page_timeout=request.session_config.timeout if request.session_config else 30000,
+                wait_until=choose_wait_until(request.session_config, request.fast_mode),
+                shared_data=shared_data,
+                verbose=False,
+            )
+            render_started = time.monotonic()
             result = await crawler.arun(
                 url=str(request.url),
                 config=run_config
             )
+            render_finished = time.monotonic()
+            render_time = render_finished - render_started
+        metrics.observe_marks(marks, render_finished)
+
+        status_code = getattr(result, 'status_code', None)
+        if not getattr(result, 'success', True):
+            message = getattr(result, 'error_message', None) or "Crawl failed"
+            raise CrawlError(message, status_code, retryable=classify_failure(message, status_code))
 
-            images, links = self._extract_from_html(
+        metadata = await self._create_metadata(result, str(request.url))
+        metadata.render_time_seconds = render_time
+        if interactions is not None:
+            metadata.interaction_timings = interactions.timings
+        if blocking_rules:
+            metadata.blocked_requests = blocking_rules["blocked_requests"]
+            metadata.bytes_saved_estimate = blocking_rules["bytes_saved_estimate"]
+        self._raise_for_status(metadata, str(request.url))
+
+        # Parsing large pages is CPU-bound, keep it off the event loop
+        with metrics.stage(metrics.HTML_EXTRACTION):
+            resources = await self.executor.run(
+                extract_html,
                 result.html,
+                str(metadata.final_url),
                 request.extract_images,
-                request.extract_links
+                request.extract_links,
+                request.include_attributes,
+                self.html_extractor.name
             )
+        return self._build_response(request, result.markdown, resources, metadata)
+
+    def _build_response(
+        self,
+        request: BaseCrawlRequest,
+        markdown: str,
+        resources: ExtractedResources,
+        metadata: CrawlMetadata
+    ) -> BaseCrawlResponse:
+        return BaseCrawlResponse(
+            url=request.url,
+            markdown=markdown,
+            images=resources.images,
+            links=resources.links,
+            image_details=resources.image_details if request.include_attributes else None,
+            link_details=resources.link_details if request.include_attributes else None,
+            metadata=metadata
+        )
 
-            metadata = await self._create_metadata(result, str(request.url))
+    async def _classify_change(self, item: URLResult, tracker: ChangeTracker) -> Optional[URLResult]:
+        """Tag a crawled page with its change status; None when it is unchanged"""
+        fingerprint = None
+        if is_success(item.metadata.status_code):
+            fingerprint = await self.executor.run(content_fingerprint, item.markdown)
+        status, similarity = tracker.classify(
+            str(item.url), item.metadata.status_code, item.metadata.headers, fingerprint
+        )
+        if status == UNCHANGED:
+            return None
+        item.change_status = status
+        item.similarity = similarity
+        if status in NO_CONTENT:
+            item.markdown = ""
+            item.images, item.links = [], []
+            item.image_details = item.link_details = None
+        return item
 
-            return BaseCrawlResponse(
-                url=request.url,
-                markdown=result.markdown,
-                images=images,
-                links=links,
-                metadata=metadata
-            )
+    async def crawl_batch_stream(
+        self,
+        request: BatchCrawlRequest,
+        progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None
+    ) -> AsyncIterator[Union[URLResult, URLError, BatchMetadata]]:
+        """Yield each URL's result as soon as it completes, then a BatchMetadata trailer.
+
+        Results are handed to the consumer through a queue bounded by the
+        concurrency limit. A URL takes a place in a window of twice that size
+        (plus the extraction queue) before it is crawled and gives it back
+        once the consumer has taken its result, so at most that many pages
+        are held in memory and crawling pauses while the consumer is busy. With an
+        extraction_config, crawled pages first pass through a second bounded
+        queue to extraction workers, so rendering continues while LLM calls
+        are in flight. Incremental batches first send conditional requests for
+        pages with stored validators and only yield new, changed or removed
+        pages; the trailer then carries a change summary. progress_callback
+        gets (completed, total) for every URL, including the unchanged ones
+        that are not yielded. In coordinator mode
+        the batch is sharded across the cluster's worker nodes instead.
+        """
+        if self.cluster.enabled:
+            async for item in self.cluster.crawl_batch_stream(request, progress_callback):
+                yield item
+            return
 
-    async def crawl_batch(self, request: BatchCrawlRequest) -> BatchCrawlResponse:
-        """Crawl multiple URLs concurrently"""
         start_time = datetime.utcnow()
-        successful_urls: List[URLResult] = []
-        failed_urls: List[URLError] = []
+        urls = unique_urls(request.urls)
+        host_cap = request.concurrent_limit or 5
+        global_limit = request.global_concurrent_limit or settings.scheduler_global_limit
+        global_semaphore = asyncio.Semaphore(global_limit)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=global_limit)
 
-        semaphore = asyncio.Semaphore(request.concurrent_limit or 5)
-        
-        async def crawl_with_semaphore(url: str) -> None:
-            async with semaphore:
-                try:
-                    single_request = BaseCrawlRequest(
-                        url=url,
-                        extract_images=True,
-                        extract_links=True,
-                        session_config=request.session_config
-                    )
-                    result = await self.crawl_url(single_request)
-                    successful_urls.append(URLResult(
+        policy = RetryPolicy(request.retry_config)
+        budget = RetryBudget()
+
+        extraction_config = request.extraction_config
+        extraction_limit = request.extraction_concurrency or settings.batch_extraction_concurrency
+        extract_queue: Optional[asyncio.Queue] = (
+            asyncio.Queue(maxsize=extraction_limit) if extraction_config else None
+        )
+        crawl_clock = _StageClock()
+        extract_clock = _StageClock()
+        window = asyncio.Semaphore(global_limit + queue.maxsize + (extraction_limit if extraction_config else 0))
+
+        tracker: Optional[ChangeTracker] = None
+        if request.incremental:
+            threshold = request.change_threshold
+            tracker = ChangeTracker(
+                self.fingerprints,
+                request.recrawl_set,
+                settings.recrawl_change_threshold if threshold is None else threshold
+            )
+            await tracker.load(urls)
+
+        async def unmodified(url: str) -> bool:
+            record = tracker.validators(url)
+            if record is None or request.no_cache:
+                return False
+            async with self.scheduler.slot(url, global_semaphore, host_cap, request.per_host_delay):
+                return await self.http_fetcher.not_modified(
+                    url, record.etag, record.last_modified, settings.recrawl_revalidate_timeout
+                )
+
+        async def crawl_one(url: str) -> Union[URLResult, URLError]:
+            single_request = BaseCrawlRequest(
+                url=url,
+                extract_images=True,
+                extract_links=True,
+                include_attributes=request.include_attributes,
+                fast_mode=request.fast_mode,
+                fetch_mode=request.fetch_mode,
+                session_id=request.session_id,
+                session_config=request.session_config,
+                retry_config=request.retry_config,
+                max_age=request.max_age,
+                # A cached copy would be fingerprinted as the current version and hide changes
+                no_cache=request.no_cache or request.incremental
+            )
+            # Deferred retries leave the slot between attempts, so waiting URLs go first
+            per_call_attempts = 1 if policy.defer_retries else None
+            budget.record_attempt()
+            first_started = time.monotonic()
+            attempt = 0
+            while True:
+                attempt += 1
+                error: Optional[Exception] = None
+                async with self.scheduler.slot(url, global_semaphore, host_cap, request.per_host_delay):
+                    try:
+                        result = await self.crawl_url(single_request, budget, per_call_attempts)
+                    except Exception as e:
+                        error = e
+                        await self.scheduler.report(
+                            url,
+                            None,
+                            status_code=getattr(e, "status_code", None),
+                            retry_after=getattr(e, "retry_after", None),
+                            error=getattr(e, "status_code", None) is None
+                        )
+                    else:
+                        if result.metadata.cache_status not in ("hit", "revalidated"):
+                            await self.scheduler.report(
+                                url,
+                                result.metadata.fetch_seconds,
+                                status_code=result.metadata.status_code,
+                                tier=result.metadata.fetch_tier or "browser"
+                            )
+
+                if error is None:
+                    if policy.defer_retries:
+                        result.metadata.attempt_count = attempt
+                        result.metadata.elapsed_seconds = time.monotonic() - first_started
+                    item: Union[URLResult, URLError] = URLResult(
                         url=url,
                         markdown=result.markdown,
                         images=result.images,
                         links=result.links,
+                        image_details=result.image_details,
+                        link_details=result.link_details,
                         metadata=result.metadata
-                    ))
+                    )
+                    break
+
+                retryable = is_retryable(error)
+                if (
+                    policy.defer_retries
+                    and retryable
+                    and attempt < policy.max_attempts
+                    and budget.try_spend()
+                ):
+                    await asyncio.sleep(policy.delay(attempt, getattr(error, "retry_after", None)))
+                    continue
+
+                item = URLError(
+                    url=url,
+                    error=str(error),
+                    attempt_count=attempt if policy.defer_retries else getattr(error, "attempt_count", 1),
+                    last_attempt=datetime.utcnow(),
+                    status_code=getattr(error, "status_code", None),
+                    retryable=retryable,
+                    elapsed_seconds=time.monotonic() - first_started
+                )
+                break
+            return item
+
+        async def crawl_with_scheduler(url: str) -> None:
+            # Released by the consumer when it takes this URL's result off the queue
+            await window.acquire()
+            started = time.monotonic()
+            item: Optional[Union[URLResult, URLError]]
+            try:
+                if tracker is not None and await unmodified(url):
+                    tracker.not_modified(url)
+                    item = None
+                else:
+                    item = await crawl_one(url)
+                    if tracker is not None and isinstance(item, URLResult):
+                        item = await self._classify_change(item, tracker)
+            except Exception as e:
+                item = URLError(url=url, error=str(e), attempt_count=1, last_attempt=datetime.utcnow())
+            crawl_clock.record(started, time.monotonic())
+            # Unchanged pages still pass through the queue so the consumer can count them
+            if (
+                extract_queue is not None
+                and isinstance(item, URLResult)
+                and item.change_status not in NO_CONTENT
+            ):
+                await extract_queue.put((item, time.monotonic()))
+            else:
+                await queue.put(item)
+
+        async def extract_worker() -> None:
+            while True:
+                item, queued_at = await extract_queue.get()
+                started = time.monotonic()
+                try:
+                    item.extracted_content = await self.llm.extract_content(item.markdown, extraction_config)
                 except Exception as e:
-                    failed_urls.append(URLError(
-                        url=url,
-                        error=str(e),
-                        attempt_count=1,
-                        last_attempt=datetime.utcnow()
-                    ))
+                    item.extraction_error = str(e) or type(e).__name__
+                extract_clock.record(started, time.monotonic(), queued_at)
+                await queue.put(item)
 
-        tasks = [crawl_with_semaphore(url) for url in request.urls]
-        await asyncio.gather(*tasks)
+        tasks = [asyncio.create_task(crawl_with_scheduler(url)) for url in urls]
+        if extract_queue is not None:
+            tasks.extend(asyncio.create_task(extract_worker()) for _ in range(min(extraction_limit, len(urls))))
+        successful_count = failed_count = 0
+        try:
+            for completed in range(1, len(urls) + 1):
+                item = await queue.get()
+                window.release()
+                if tracker is not None:
+                    await tracker.flush()
+                if progress_callback:
+                    await progress_callback(completed, len(urls))
+                if item is None:
+                    successful_count += 1
+                    continue
+                if isinstance(item, URLResult):
+                    successful_count += 1
+                else:
+                    failed_count += 1
+                yield item
+                # Drop our reference so the page can be freed once the consumer flushed it
+                del item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if tracker is not None:
+                await tracker.flush(force=True)
 
+        stages = {"crawl": crawl_clock.timing()}
+        if extraction_config:
+            stages["extract"] = extract_clock.timing()
         end_time = datetime.utcnow()
-        
+        yield BatchMetadata(
+            start_time=start_time,
+            end_time=end_time,
+            total_urls=len(urls),
+            successful_count=successful_count,
+            failed_count=failed_count,
+            duplicate_count=len(request.urls) - len(urls),
+            total_time_seconds=(end_time - start_time).total_seconds(),
+            stages=stages,
+            changes=tracker.summary if tracker is not None else None
+        )
+
+    async def crawl_batch(
+        self,
+        request: BatchCrawlRequest,
+        progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None
+    ) -> BatchCrawlResponse:
+        """Crawl multiple URLs concurrently, reporting (completed, total) after each URL"""
+        successful_urls: List[URLResult] = []
+        failed_urls: List[URLError] = []
+        metadata: Optional[BatchMetadata] = None
+
+        async for item in self.crawl_batch_stream(request, progress_callback):
+            if isinstance(item, BatchMetadata):
+                metadata = item
+                continue
+            if isinstance(item, URLResult):
+                successful_urls.append(item)
+            else:
+                failed_urls.append(item)
+
         return BatchCrawlResponse(
             successful_urls=successful_urls,
             failed_urls=failed_urls,
-            metadata=BatchMetadata(
-                start_time=start_time,
-                end_time=end_time,
-                total_urls=len(request.urls),
-                successful_count=len(successful_urls),
-                failed_count=len(failed_urls),
-                total_time_seconds=(end_time - start_time).total_seconds()
-            )
+            metadata=metadata
         )
+
+
+crawler_service = CrawlerService()
@@ -0,0 +1,178 @@
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+import asyncio
+import functools
+import logging
+import multiprocessing
+import statistics
+import time
+
+from pydantic import BaseModel
+
+from app.config import settings
+from app.models.requests import ResponseShape
+from app.services.payload import encode_model
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised when post-processing work waits longer than the queue timeout for a slot"""
+
+
+def serialize_model(model: BaseModel, shape: Optional[ResponseShape] = None) -> bytes:
+    """JSON-encode a response model, shaped if asked; module-level so it can run in a process pool"""
+    return encode_model(model, shape)
+
+
+class PostProcessExecutor:
+    """Bounded thread or process pool for CPU-bound post-processing.
+
+    At most ``max_workers + max_queue`` jobs are admitted at once; further
+    callers wait (backpressure) and give up after ``queue_timeout`` seconds.
+    """
+
+    def __init__(
+        self,
+        kind: str = settings.executor_kind,
+        max_workers: int = settings.executor_max_workers,
+        max_queue: int = settings.executor_max_queue,
+        queue_timeout: float = settings.executor_queue_timeout,
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind '{kind}', expected 'thread' or 'process'")
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._pool: Optional[Executor] = None
+        self._slots = asyncio.Semaphore(self.max_workers + self.max_queue)
+        self._admitted = 0
+        self._waiting = 0
+        self._stats: Dict[str, float] = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "total_run_seconds": 0.0,
+            "total_wait_seconds": 0.0,
+        }
+
+    def start(self) -> None:
+        if self._pool is not None:
+            return
+        if self.kind == "process":
+            # spawn keeps children free of the parent's event loop and browser state
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="postprocess")
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run fn(*args) in the pool, waiting for a slot when the queue is full"""
+        if self._pool is None:
+            self.start()
+        started = time.monotonic()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._stats["rejected"] += 1
+            raise ExecutorSaturatedError(
+                f"Post-processing queue full for {self.queue_timeout:.0f}s"
+            )
+        finally:
+            self._waiting -= 1
+        self._admitted += 1
+        self._stats["submitted"] += 1
+        self._stats["total_wait_seconds"] += time.monotonic() - started
+        run_started = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._pool, functools.partial(fn, *args))
+            self._stats["completed"] += 1
+            return result
+        except Exception:
+            self._stats["failed"] += 1
+            raise
+        finally:
+            self._stats["total_run_seconds"] += time.monotonic() - run_started
+            self._admitted -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        done = self._stats["completed"] + self._stats["failed"]
+        submitted = self._stats["submitted"]
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._admitted,
+            "queue_depth": max(0, self._admitted - self.max_workers),
+            "waiting": self._waiting,
+            "submitted": int(submitted),
+            "completed": int(self._stats["completed"]),
+            "failed": int(self._stats["failed"]),
+            "rejected": int(self._stats["rejected"]),
+            "avg_run_seconds": self._stats["total_run_seconds"] / done if done else 0.0,
+            "avg_wait_seconds": self._stats["total_wait_seconds"] / submitted if submitted else 0.0,
+        }
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up from a fixed-interval sleep"""
+
+    def __init__(self, interval: float = settings.loop_lag_interval, window: int = 1200):
+        self.interval = interval
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._max = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - expected)
+            self._samples.append(lag)
+            self._max = max(self._max, lag)
+
+    def stats(self) -> Dict[str, Any]:
+        samples = sorted(self._samples)
+        if not samples:
+            return {"samples": 0, "interval_seconds": self.interval}
+        return {
+            "samples": len(samples),
+            "interval_seconds": self.interval,
+            "mean_seconds": statistics.fmean(samples),
+            "p50_seconds": samples[len(samples) // 2],
+            "p99_seconds": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+            "window_max_seconds": samples[-1],
+            "max_seconds": self._max,
+        }
+
+
+postprocess_executor = PostProcessExecutor()
+loop_lag_monitor = LoopLagMonitor()
@@ -1,64 +1,31 @@
-from typing import Dict, List, Optional, Any
-from app.models.requests import ContentExtractionRequest, ExtractionType, LLMConfig
-from app.models.responses import ContentExtractionResponse, ExtractedContent
-from app.services.crawler import CrawlerService
+from typing import Optional
+from app.models.requests import ContentExtractionRequest
+from app.models.responses import ContentExtractionResponse
+from app.services.crawler import CrawlerService, crawler_service
+from app.services.llm import LLMEngine, llm_engine
 
 class ExtractorService:
-    def __init__(self):
-        self.crawler = CrawlerService()
-
-    async def _generate_summary(self, text: str, llm_config: Optional[LLMConfig] = None) -> str:
-        """Generate a summary of the text using specified LLM"""
-        # Implementation will use Crawl4AI's summarization capabilities
-        # For now, return a placeholder
-        return "Summary implementation pending"
-
-    async def _generate_qa_pairs(self, text: str, llm_config: Optional[LLMConfig] = None) -> List[Dict[str, str]]:
-        """Generate question-answer pairs from the text"""
-        # Implementation will use Crawl4AI's QA generation capabilities
-        # For now, return a placeholder
-        return [{"question": "Sample Q", "answer": "Sample A"}]
-
-    async def _extract_structured_data(self, text: str, schema: Dict[str, Any], llm_config: Optional[LLMConfig] = None) -> Dict[str, Any]:
-        """Extract structured data according to the provided schema"""
-        # Implementation will use Crawl4AI's structured extraction capabilities
-        # For now, return a placeholder
-        return {"field": "value"}
+    def __init__(self, crawler: Optional[CrawlerService] = None, engine: Optional[LLMEngine] = None):
+        self.crawler = crawler or crawler_service
+        self.engine = engine or llm_engine
 
     async def extract_content(self, request: ContentExtractionRequest) -> ContentExtractionResponse:
         """Extract content from URL based on specified extraction type"""
         # First, crawl the URL
         crawl_result = await self.crawler.crawl_url(request)
 
-        # Initialize extracted content
-        extracted_content = ExtractedContent(raw_text=crawl_result.markdown)
-
-        # Perform extraction based on type
-        if request.extraction_config.extraction_type == ExtractionType.SUMMARY:
-            extracted_content.summary = await self._generate_summary(
-                crawl_result.markdown,
-                request.extraction_config.llm_config
-            )
-
-        elif request.extraction_config.extraction_type == ExtractionType.QA:
-            extracted_content.qa_pairs = await self._generate_qa_pairs(
-                crawl_result.markdown,
-                request.extraction_config.llm_config
-            )
-
-        elif request.extraction_config.extraction_type == ExtractionType.SCHEMA:
-            if request.extraction_config.custom_schema:
-                extracted_content.structured_data = await self._extract_structured_data(
-                    crawl_result.markdown,
-                    request.extraction_config.custom_schema,
-                    request.extraction_config.llm_config
-                )
+        extracted_content = await self.engine.extract_content(crawl_result.markdown, request.extraction_config)
 
         return ContentExtractionResponse(
             url=request.url,
             markdown=crawl_result.markdown,
             images=crawl_result.images,
             links=crawl_result.links,
+            image_details=crawl_result.image_details,
+            link_details=crawl_result.link_details,
             metadata=crawl_result.metadata,
             extracted_content=extracted_content
         )
+
+
+extractor_service = ExtractorService()
@@ -0,0 +1,91 @@
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+import logging
+
+from app.config import settings
+from app.models.requests import SessionConfig, WaitCondition
+
+logger = logging.getLogger(__name__)
+
+# Key under CrawlerRunConfig.shared_data carrying per-run blocking rules and counters
+SHARED_DATA_KEY = "resource_blocking"
+
+# Rough transfer sizes used to estimate bytes saved by a blocked request
+TYPICAL_RESOURCE_BYTES = {
+    "image": 40_000,
+    "media": 500_000,
+    "font": 30_000,
+    "stylesheet": 20_000,
+    "script": 30_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+}
+DEFAULT_RESOURCE_BYTES = 5_000
+
+# Strictest first: waiting for network idle implies load, which implies DOMContentLoaded
+_WAIT_ORDER = [WaitCondition.NETWORK_IDLE, WaitCondition.LOAD, WaitCondition.DOM_CONTENT_LOADED]
+
+
+def choose_wait_until(session_config: Optional[SessionConfig], fast_mode: bool) -> str:
+    """Playwright wait_until for a crawl.
+
+    Fast mode and requests without a session config return at DOMContentLoaded.
+    Otherwise the strictest of the configured wait_conditions wins.
+    """
+    if fast_mode or not session_config or not session_config.wait_conditions:
+        return WaitCondition.DOM_CONTENT_LOADED.value
+    for condition in _WAIT_ORDER:
+        if condition in session_config.wait_conditions:
+            return condition.value
+    return WaitCondition.DOM_CONTENT_LOADED.value
+
+
+def build_blocking_rules(session_config: Optional[SessionConfig]) -> Dict[str, Any]:
+    """Resource types and domains to abort for a fast-mode crawl"""
+    resource_types = settings.fast_mode_blocked_resource_types
+    domains = list(settings.fast_mode_blocked_domains)
+    if session_config is not None:
+        if session_config.blocked_resource_types is not None:
+            resource_types = session_config.blocked_resource_types
+        domains.extend(session_config.blocked_domains)
+    return {
+        "resource_types": set(resource_types),
+        "domains": tuple(d.lower().lstrip(".") for d in domains if d),
+        "blocked_requests": 0,
+        "blocked_by_type": {},
+        "bytes_saved_estimate": 0,
+    }
+
+
+def _domain_blocked(url: str, domains: tuple) -> bool:
+    host = (urlsplit(url).hostname or "").lower()
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+async def resource_blocking_hook(page: Any, context: Any = None, config: Any = None, **kwargs) -> Any:
+    """crawl4ai on_page_context_created hook; a no-op unless the run enabled fast mode"""
+    shared = getattr(config, "shared_data", None) or {}
+    rules: Optional[Dict[str, Any]] = shared.get(SHARED_DATA_KEY)
+    if not rules:
+        return page
+
+    async def handle(route) -> None:
+        request = route.request
+        resource_type = request.resource_type
+        # Never abort documents, or the page itself (and its frames) would fail to load
+        if resource_type != "document" and (
+            resource_type in rules["resource_types"] or _domain_blocked(request.url, rules["domains"])
+        ):
+            rules["blocked_requests"] += 1
+            rules["blocked_by_type"][resource_type] = rules["blocked_by_type"].get(resource_type, 0) + 1
+            rules["bytes_saved_estimate"] += TYPICAL_RESOURCE_BYTES.get(resource_type, DEFAULT_RESOURCE_BYTES)
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    try:
+        await page.route("**/*", handle)
+    except Exception as e:
+        logger.warning("Could not install resource blocking: %s", e)
+    return page
+
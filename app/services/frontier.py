@@ -0,0 +1,136 @@
+from fnmatch import fnmatchcase
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+import hashlib
+import heapq
+import math
+
+from app.config import settings
+from app.services.urls import host_of, normalize_url
+
+# Links to files that are never pages worth rendering
+_SKIPPED_EXTENSIONS = (
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".ico", ".bmp", ".tif", ".tiff",
+    ".pdf", ".zip", ".gz", ".tgz", ".rar", ".7z", ".tar", ".dmg", ".exe", ".msi", ".apk",
+    ".mp3", ".mp4", ".m4a", ".avi", ".mov", ".wmv", ".webm", ".ogg", ".wav",
+    ".css", ".js", ".woff", ".woff2", ".ttf", ".eot",
+)
+
+
+def url_key(url: str) -> int:
+    """64-bit key of a normalized URL, used for dedup and frontier rows"""
+    digest = hashlib.blake2b(normalize_url(url).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit URL keys.
+
+    Sized for ``capacity`` keys at ``error_rate`` false positives; a false
+    positive means one page is skipped, never crawled twice.
+    """
+
+    def __init__(self, capacity: int = settings.site_crawl_bloom_capacity, error_rate: float = settings.site_crawl_bloom_error_rate):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: int) -> Iterable[int]:
+        # Double hashing from the two halves of a remixed key
+        digest = hashlib.blake2b(key.to_bytes(8, "big", signed=True), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def __contains__(self, key: int) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key: int) -> bool:
+        """Add key; returns False if it was (probably) present already"""
+        added = False
+        for p in self._positions(key):
+            mask = 1 << (p & 7)
+            if not self.bits[p >> 3] & mask:
+                self.bits[p >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+
+class CrawlScope:
+    """Which discovered URLs a site crawl may follow"""
+
+    def __init__(
+        self,
+        domains: List[str],
+        include_subdomains: bool = False,
+        include_paths: Optional[List[str]] = None,
+        exclude_paths: Optional[List[str]] = None,
+    ):
+        self.domains = {d.lower().strip(".") for d in domains}
+        self.include_subdomains = include_subdomains
+        self.include_paths = include_paths or []
+        self.exclude_paths = exclude_paths or []
+
+    def allows(self, url: str) -> bool:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            return False
+        host = host_of(url)
+        if host not in self.domains and not (
+            self.include_subdomains and any(host.endswith("." + d) for d in self.domains)
+        ):
+            return False
+        path = parts.path or "/"
+        if path.lower().endswith(_SKIPPED_EXTENSIONS):
+            return False
+        if self.include_paths and not any(fnmatchcase(path, p) for p in self.include_paths):
+            return False
+        return not any(fnmatchcase(path, p) for p in self.exclude_paths)
+
+
+def priority(url: str, depth: int) -> int:
+    """Lower crawls first: shallow pages, then short paths"""
+    path = urlsplit(url).path.strip("/")
+    segments = path.count("/") + 1 if path else 0
+    return depth * 1000 + min(segments, 50) * 10 + min(len(path) // 20, 9)
+
+
+class Frontier:
+    """Priority queue of URLs to crawl with Bloom-filter dedup of everything seen"""
+
+    def __init__(self, seen: Optional[BloomFilter] = None, max_size: int = settings.site_crawl_max_frontier):
+        self.seen = seen or BloomFilter()
+        self.max_size = max_size
+        self._heap: List[Tuple[int, int, str, int, Optional[str]]] = []
+        self._counter = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def mark_seen(self, url: str) -> bool:
+        """Record url without queueing it; False if it was seen before"""
+        return self.seen.add(url_key(url))
+
+    def push(self, url: str, depth: int, parent_url: Optional[str] = None, prio: Optional[int] = None) -> bool:
+        """Queue url unless it was seen before or the frontier is full"""
+        if len(self._heap) >= self.max_size:
+            self.dropped += 1
+            return False
+        if not self.mark_seen(url):
+            return False
+        self.restore(url, depth, parent_url, priority(url, depth) if prio is None else prio)
+        return True
+
+    def restore(self, url: str, depth: int, parent_url: Optional[str], prio: int) -> None:
+        """Queue url from a checkpoint, bypassing dedup"""
+        self._counter += 1
+        heapq.heappush(self._heap, (prio, self._counter, url, depth, parent_url))
+
+    def pop(self) -> Tuple[str, int, Optional[str]]:
+        _, _, url, depth, parent_url = heapq.heappop(self._heap)
+        return url, depth, parent_url
@@ -0,0 +1,244 @@
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+from app.config import settings
+
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - lxml ships with crawl4ai but stay optional
+    etree = None
+
+_SKIPPED_SCHEMES = ("javascript:", "data:")
+
+
+class ExtractedResources:
+    """Images and links found in one page, resolved, deduplicated, in document order"""
+
+    def __init__(self, base_url: Optional[str], include_attributes: bool = False):
+        self.base_url = None
+        self._scheme = self._origin = ""
+        self._set_base_url(base_url)
+        self.include_attributes = include_attributes
+        self.images: List[str] = []
+        self.links: List[str] = []
+        self.image_details: List[Dict[str, str]] = []
+        self.link_details: List[Dict[str, str]] = []
+        # Raw attribute values skip re-resolving repeats; resolved URLs catch aliases
+        self._raw_images = set()
+        self._raw_links = set()
+        self._seen_images = set()
+        self._seen_links = set()
+
+    def _set_base_url(self, base_url: Optional[str]) -> None:
+        self.base_url = base_url
+        if base_url:
+            parts = urlsplit(base_url)
+            self._scheme = parts.scheme
+            self._origin = f"{parts.scheme}://{parts.netloc}" if parts.netloc else ""
+
+    def _resolve(self, value: Optional[str]) -> Optional[str]:
+        if not value:
+            return None
+        value = value.strip()
+        if not value or value.lower().startswith(_SKIPPED_SCHEMES):
+            return None
+        if not self.base_url or value.startswith(("http://", "https://")):
+            return value
+        # Fast paths for the common shapes; urljoin handles dot-segments and the rest
+        if value.startswith("//"):
+            return f"{self._scheme}:{value}"
+        if value.startswith("/") and self._origin and "/." not in value:
+            return self._origin + value
+        return urljoin(self.base_url, value)
+
+    def set_base(self, href: Optional[str]) -> None:
+        """Apply a <base href>, which only counts before any resource was seen"""
+        if href and not self.images and not self.links:
+            href = href.strip()
+            self._set_base_url(urljoin(self.base_url, href) if self.base_url else href)
+
+    def add_image(self, attrs: Dict[str, Optional[str]]) -> None:
+        raw = attrs.get("src")
+        if not raw or raw in self._raw_images:
+            return
+        self._raw_images.add(raw)
+        src = self._resolve(raw)
+        if not src or src in self._seen_images:
+            return
+        self._seen_images.add(src)
+        self.images.append(src)
+        if self.include_attributes:
+            detail = {"src": src}
+            for name in ("srcset", "alt"):
+                if attrs.get(name):
+                    detail[name] = attrs[name]
+            self.image_details.append(detail)
+
+    def add_link(self, attrs: Dict[str, Optional[str]]) -> None:
+        raw = attrs.get("href")
+        if not raw or raw in self._raw_links:
+            return
+        self._raw_links.add(raw)
+        href = self._resolve(raw)
+        if not href or href in self._seen_links:
+            return
+        self._seen_links.add(href)
+        self.links.append(href)
+        if self.include_attributes:
+            detail = {"href": href}
+            for name in ("rel", "title"):
+                if attrs.get(name):
+                    detail[name] = attrs[name]
+            self.link_details.append(detail)
+
+
+class HTMLExtractor:
+    """Collects <img src> and <a href> from HTML. Subclasses pick the parser."""
+
+    name = "base"
+
+    def extract(
+        self,
+        html: str,
+        base_url: Optional[str] = None,
+        extract_images: bool = False,
+        extract_links: bool = False,
+        include_attributes: bool = False,
+    ) -> ExtractedResources:
+        resources = ExtractedResources(base_url, include_attributes)
+        if html and (extract_images or extract_links):
+            self._collect(html, resources, extract_images, extract_links)
+        return resources
+
+    def _collect(self, html: str, resources: ExtractedResources, images: bool, links: bool) -> None:
+        raise NotImplementedError
+
+
+class _LxmlTarget:
+    """lxml parser target: receives start-tag events without building a tree"""
+
+    def __init__(self, resources: ExtractedResources, images: bool, links: bool):
+        self.resources = resources
+        self.images = images
+        self.links = links
+
+    def start(self, tag, attrib) -> None:
+        if tag == "img":
+            if self.images:
+                self.resources.add_image(attrib)
+        elif tag == "a":
+            if self.links:
+                self.resources.add_link(attrib)
+        elif tag == "base":
+            self.resources.set_base(attrib.get("href"))
+
+    def end(self, tag) -> None:
+        pass
+
+    def data(self, data) -> None:
+        pass
+
+    def close(self) -> None:
+        return None
+
+
+class LxmlExtractor(HTMLExtractor):
+    """Single-pass SAX-style extraction on libxml2's HTML parser"""
+
+    name = "lxml"
+
+    def _collect(self, html: str, resources: ExtractedResources, images: bool, links: bool) -> None:
+        parser = etree.HTMLParser(target=_LxmlTarget(resources, images, links), recover=True)
+        parser.feed(html)
+        parser.close()
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, resources: ExtractedResources, images: bool, links: bool):
+        super().__init__(convert_charrefs=True)
+        self.resources = resources
+        self.images = images
+        self.links = links
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag == "img":
+            if self.images:
+                self.resources.add_image(dict(attrs))
+        elif tag == "a":
+            if self.links:
+                self.resources.add_link(dict(attrs))
+        elif tag == "base":
+            self.resources.set_base(dict(attrs).get("href"))
+
+    handle_startendtag = handle_starttag
+
+
+class StdlibExtractor(HTMLExtractor):
+    """Single-pass extraction on the standard library's streaming HTMLParser"""
+
+    name = "htmlparser"
+
+    def _collect(self, html: str, resources: ExtractedResources, images: bool, links: bool) -> None:
+        parser = _StdlibParser(resources, images, links)
+        parser.feed(html)
+        parser.close()
+
+
+class BeautifulSoupExtractor(HTMLExtractor):
+    """The original full-tree implementation, kept for comparison benchmarks"""
+
+    name = "bs4"
+
+    def _collect(self, html: str, resources: ExtractedResources, images: bool, links: bool) -> None:
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, "html.parser")
+        base = soup.find("base")
+        if base is not None:
+            resources.set_base(base.get("href"))
+        if images:
+            for img in soup.find_all("img"):
+                resources.add_image(img.attrs)
+        if links:
+            for link in soup.find_all("a"):
+                attrs = dict(link.attrs)
+                # bs4 splits multi-valued attributes such as rel into lists
+                if isinstance(attrs.get("rel"), list):
+                    attrs["rel"] = " ".join(attrs["rel"])
+                resources.add_link(attrs)
+
+
+EXTRACTORS = {
+    LxmlExtractor.name: LxmlExtractor,
+    StdlibExtractor.name: StdlibExtractor,
+    BeautifulSoupExtractor.name: BeautifulSoupExtractor,
+}
+
+
+def get_extractor(name: Optional[str] = None) -> HTMLExtractor:
+    """Build the configured extractor, falling back to the stdlib parser without lxml"""
+    name = name or settings.html_extractor
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown HTML extractor '{name}', expected one of {sorted(EXTRACTORS)}")
+    if name == LxmlExtractor.name and etree is None:
+        name = StdlibExtractor.name
+    return EXTRACTORS[name]()
+
+
+def extract_html(
+    html: str,
+    base_url: Optional[str] = None,
+    extract_images: bool = False,
+    extract_links: bool = False,
+    include_attributes: bool = False,
+    backend: Optional[str] = None,
+) -> ExtractedResources:
+    """Module-level entry point so extraction can be shipped to a process pool"""
+    return get_extractor(backend).extract(
+        html,
+        base_url=base_url,
+        extract_images=extract_images,
+        extract_links=extract_links,
+        include_attributes=include_attributes,
+    )
@@ -0,0 +1,329 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import re
+import time
+
+import aiohttp
+
+from app.config import settings
+from app.services.html_extract import ExtractedResources, extract_html
+from app.services.retry import CrawlError, is_retryable
+
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - lxml ships with crawl4ai but stay optional
+    etree = None
+
+# Content types served as-is without a browser (sitemaps, feeds, robots.txt, APIs)
+_TEXT_CONTENT_TYPES = ("text/plain", "text/xml", "application/xml", "application/json", "application/rss+xml", "application/atom+xml")
+
+# Empty mount points left by client-side frameworks (React, Vue, Next, Gatsby, Svelte, Angular)
+_EMPTY_MOUNT = re.compile(
+    r"<(div|main|section)\b[^>]*\bid\s*=\s*[\"']?(root|app|__next|___gatsby|svelte|main-app)[\"']?[^>]*>\s*</\1>"
+    r"|<app-root\b[^>]*>\s*</app-root>",
+    re.IGNORECASE,
+)
+
+_SKIPPED_TEXT_TAGS = {"script", "style", "template", "noscript", "svg", "head", "title"}
+
+
+class FetchedPage:
+    """A page fetched over plain HTTP"""
+
+    def __init__(self, url: str, status_code: int, headers: Dict[str, str], body: str, content_type: Optional[str]):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.content_type = content_type
+
+    @property
+    def is_html(self) -> bool:
+        return not self.content_type or "html" in self.content_type
+
+    @property
+    def is_text(self) -> bool:
+        return bool(self.content_type) and (
+            self.content_type.startswith(_TEXT_CONTENT_TYPES) or self.content_type.endswith("+xml")
+        )
+
+
+class _TextProbe:
+    """lxml parser target counting visible text and what <noscript> says"""
+
+    def __init__(self):
+        self.depth_skipped = 0
+        self.in_noscript = 0
+        self.text_chars = 0
+        self.noscript_text = []
+
+    def start(self, tag, attrib) -> None:
+        if tag in _SKIPPED_TEXT_TAGS:
+            self.depth_skipped += 1
+        if tag == "noscript":
+            self.in_noscript += 1
+
+    def end(self, tag) -> None:
+        if tag in _SKIPPED_TEXT_TAGS:
+            self.depth_skipped = max(0, self.depth_skipped - 1)
+        if tag == "noscript":
+            self.in_noscript = max(0, self.in_noscript - 1)
+
+    def data(self, data) -> None:
+        if self.in_noscript:
+            self.noscript_text.append(data)
+        elif not self.depth_skipped:
+            self.text_chars += len(data.strip())
+
+    def close(self) -> None:
+        return None
+
+
+def _probe_text(html: str) -> _TextProbe:
+    probe = _TextProbe()
+    if etree is not None:
+        parser = etree.HTMLParser(target=probe, recover=True)
+        parser.feed(html)
+        parser.close()
+    else:
+        from html.parser import HTMLParser
+
+        class _Parser(HTMLParser):
+            def handle_starttag(self, tag, attrs):
+                probe.start(tag, dict(attrs))
+
+            def handle_endtag(self, tag):
+                probe.end(tag)
+
+            def handle_data(self, data):
+                probe.data(data)
+
+        parser = _Parser(convert_charrefs=True)
+        parser.feed(html)
+        parser.close()
+    return probe
+
+
+def detect_js_shell(html: str, min_text_chars: int = settings.http_tier_min_text_chars) -> Optional[str]:
+    """Why a statically fetched page looks like it needs JavaScript to render, or None"""
+    probe = _probe_text(html)
+    if probe.text_chars < min_text_chars:
+        if _EMPTY_MOUNT.search(html):
+            return "spa_root"
+        if "javascript" in " ".join(probe.noscript_text).lower():
+            return "noscript"
+        return "empty_body"
+    if _EMPTY_MOUNT.search(html) and probe.text_chars < 4 * min_text_chars:
+        return "spa_root"
+    return None
+
+
+def html_to_markdown(html: str, base_url: str) -> str:
+    """Markdown for a static page, using the same generator crawl4ai runs after a render"""
+    from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
+
+    result = DefaultMarkdownGenerator().generate_markdown(input_html=html, base_url=base_url, citations=False)
+    return result.raw_markdown
+
+
+def analyze_http_page(
+    html: str,
+    base_url: str,
+    extract_images: bool = False,
+    extract_links: bool = False,
+    include_attributes: bool = False,
+    backend: Optional[str] = None,
+    min_text_chars: int = settings.http_tier_min_text_chars,
+    detect: bool = True,
+) -> Tuple[Optional[str], str, Optional[ExtractedResources], Dict[str, float]]:
+    """Shell detection, markdown and resource extraction in one executor hop.
+
+    Returns (escalation_reason, markdown, resources, stage seconds); markdown
+    and resources are skipped when the page needs a browser anyway. Timings
+    are returned rather than recorded since this may run in another process.
+    """
+    started = time.monotonic()
+    reason = detect_js_shell(html, min_text_chars) if detect else None
+    if reason is not None:
+        return reason, "", None, {}
+    resources = extract_html(html, base_url, extract_images, extract_links, include_attributes, backend)
+    extracted = time.monotonic()
+    markdown = html_to_markdown(html, base_url)
+    return None, markdown, resources, {"html_extraction": extracted - started, "markdown": time.monotonic() - extracted}
+
+
+class HostTierMemory:
+    """Remembers per host whether static fetches keep turning out to be JS shells.
+
+    A host is sent straight to the browser once at least ``min_escalations``
+    fetches escalated and they outnumber static successes. Entries expire after
+    ``ttl`` seconds so sites that change get probed again.
+    """
+
+    def __init__(self, ttl: float = settings.http_tier_memory_ttl, min_escalations: int = 2, max_hosts: int = 10000):
+        self.ttl = ttl
+        self.min_escalations = min_escalations
+        self.max_hosts = max_hosts
+        self._hosts: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+
+    def _entry(self, host: str) -> Optional[Dict[str, float]]:
+        entry = self._hosts.get(host)
+        if entry is not None and time.monotonic() - entry["since"] > self.ttl:
+            del self._hosts[host]
+            return None
+        return entry
+
+    def record(self, host: str, escalated: bool) -> None:
+        entry = self._entry(host)
+        if entry is None:
+            entry = {"since": time.monotonic(), "static": 0, "escalated": 0}
+            self._hosts[host] = entry
+            while len(self._hosts) > self.max_hosts:
+                self._hosts.popitem(last=False)
+        self._hosts.move_to_end(host)
+        entry["escalated" if escalated else "static"] += 1
+
+    def prefers_browser(self, host: str) -> bool:
+        entry = self._entry(host)
+        return entry is not None and entry["escalated"] >= self.min_escalations and entry["escalated"] > entry["static"]
+
+    def stats(self) -> Dict[str, Any]:
+        browser_hosts = [host for host in list(self._hosts) if self.prefers_browser(host)]
+        return {"tracked_hosts": len(self._hosts), "browser_hosts": browser_hosts[:100]}
+
+
+class HTTPFetcher:
+    """Pooled keep-alive aiohttp client for the browserless fetch tier"""
+
+    def __init__(
+        self,
+        timeout: float = settings.http_tier_timeout,
+        max_bytes: int = settings.http_tier_max_bytes,
+        max_connections: int = settings.http_tier_max_connections,
+        user_agent: str = settings.http_tier_user_agent,
+    ):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_connections = max_connections
+        self.user_agent = user_agent
+        self.memory = HostTierMemory()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._stats: Dict[str, Any] = {
+            "requests": 0,
+            "served": 0,
+            "errors": 0,
+            "bytes": 0,
+            "total_seconds": 0.0,
+            "escalations": {},
+        }
+
+    def _client(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=max(1, self.max_connections // 4),
+                ttl_dns_cache=300,
+                keepalive_timeout=30,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={
+                    "User-Agent": self.user_agent,
+                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                    "Accept-Language": "en-US,en;q=0.9",
+                },
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch(self, url: str, timeout: Optional[float] = None) -> FetchedPage:
+        """GET url, raising CrawlError on network failures or oversized bodies"""
+        self._stats["requests"] += 1
+        started = time.monotonic()
+        try:
+            async with self._client().get(
+                url,
+                timeout=aiohttp.ClientTimeout(total=timeout or self.timeout),
+                allow_redirects=True,
+                max_redirects=10,
+            ) as response:
+                chunks = []
+                size = 0
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise CrawlError(f"Response from {url} exceeds {self.max_bytes} bytes")
+                    chunks.append(chunk)
+                # get_encoding() can't sniff a streamed body, so pages without a charset are read as UTF-8
+                encoding = response.charset or "utf-8"
+                body = b"".join(chunks).decode(encoding, errors="replace") if chunks else ""
+                headers = {str(k): str(v) for k, v in response.headers.items()}
+                content_type = (response.content_type or "").lower() or None
+                self._stats["bytes"] += size
+                return FetchedPage(str(response.url), response.status, headers, body, content_type)
+        except CrawlError:
+            self._stats["errors"] += 1
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeError, LookupError) as e:
+            self._stats["errors"] += 1
+            raise CrawlError(f"HTTP fetch of {url} failed: {str(e) or type(e).__name__}", retryable=is_retryable(e)) from e
+        finally:
+            self._stats["total_seconds"] += time.monotonic() - started
+
+    async def not_modified(
+        self,
+        url: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """Conditional GET with stored validators; True only if the origin answered 304"""
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        self._stats["requests"] += 1
+        try:
+            async with self._client().get(
+                url,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=timeout or self.timeout),
+                allow_redirects=True,
+                max_redirects=10,
+            ) as response:
+                # A 200 body is dropped unread; the page is crawled normally afterwards
+                return response.status == 304
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self._stats["errors"] += 1
+            return False
+
+    def record_served(self, host: str) -> None:
+        self._stats["served"] += 1
+        self.memory.record(host, escalated=False)
+
+    def record_escalation(self, host: str, reason: str, remember: bool = True) -> None:
+        escalations = self._stats["escalations"]
+        escalations[reason] = escalations.get(reason, 0) + 1
+        if remember:
+            self.memory.record(host, escalated=True)
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self._stats["requests"]
+        return {
+            "requests": requests,
+            "served": self._stats["served"],
+            "errors": self._stats["errors"],
+            "bytes": self._stats["bytes"],
+            "avg_fetch_seconds": self._stats["total_seconds"] / requests if requests else 0.0,
+            "escalations": dict(self._stats["escalations"]),
+            "memory": self.memory.stats(),
+        }
+
+
+http_fetcher = HTTPFetcher()
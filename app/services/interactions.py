@@ -0,0 +1,399 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+import hashlib
+import json
+import re
+import time
+
+from app.config import settings
+from app.models.requests import BrowserAction, Credentials, InteractionStep, StepCondition
+from app.models.responses import InteractionTiming
+from app.services import metrics
+from app.services.urls import host_of
+
+# Key under CrawlerRunConfig.shared_data holding the InteractionRun for a crawl's page
+INTERACTIONS_DATA_KEY = "interactions"
+
+_SCRIPTABLE = (BrowserAction.CLICK, BrowserAction.TYPE, BrowserAction.SCROLL)
+
+# Playwright selector syntax that document.querySelector cannot evaluate
+_ENGINE_SELECTOR = re.compile(
+    r"^(text|xpath|css|id|role|data-testid|internal:[\w-]+)=|^//|>>"
+    r"|:(has-text|text|text-is|text-matches|nth-match|left-of|right-of|above|below|near)\(|:visible"
+)
+
+# Runs a group of click/type/scroll steps in one round-trip. It is synchronous on
+# purpose: a click that navigates cannot tear the page down halfway through the group.
+_GROUP_SCRIPT = """
+(ops) => {
+    const timings = [];
+    for (let i = 0; i < ops.length; i++) {
+        const op = ops[i];
+        const started = performance.now();
+        let el = null;
+        if (op.selector !== null) {
+            try {
+                el = document.querySelector(op.selector);
+            } catch (e) {
+                return {done: i, timings, error: String(e)};
+            }
+            if (el === null) return {done: i, timings, error: "no element matches " + op.selector};
+        }
+        if (op.action === "click") {
+            el.click();
+        } else if (op.action === "type") {
+            if (!("value" in el)) return {done: i, timings, error: op.selector + " is not a form field"};
+            el.focus();
+            // Use the native setter so frameworks tracking the value see the change
+            const native = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(el), "value");
+            if (native && native.set) native.set.call(el, op.value); else el.value = op.value;
+            el.dispatchEvent(new Event("input", {bubbles: true}));
+            el.dispatchEvent(new Event("change", {bubbles: true}));
+        } else if (el !== null) {
+            el.scrollIntoView({block: "center"});
+        } else if (op.dy === null) {
+            window.scrollTo(0, document.documentElement.scrollHeight);
+        } else {
+            window.scrollBy(0, op.dy);
+        }
+        timings.push(performance.now() - started);
+    }
+    return {done: ops.length, timings, error: null};
+}
+"""
+
+_SNAPSHOT = "() => [document.documentElement.scrollHeight, document.getElementsByTagName('*').length]"
+
+_CHANGED = (
+    "([height, nodes]) => document.documentElement.scrollHeight !== height"
+    " || document.getElementsByTagName('*').length !== nodes"
+)
+
+_SUBMIT = (
+    "el => { const form = el.form || el.closest('form') || el;"
+    " form.requestSubmit ? form.requestSubmit() : form.submit(); }"
+)
+
+
+class InteractionError(Exception):
+    """Raised for an invalid step list or a step that fails in the page"""
+
+
+def _playwright_timeout() -> type:
+    """Playwright's TimeoutError, imported only once a step has failed"""
+    from playwright.async_api import TimeoutError
+
+    return TimeoutError
+
+
+def render_value(value: Optional[str], credentials: Optional[Credentials]) -> Optional[str]:
+    """Fill {username}/{password}/{token} placeholders so secrets stay in credentials"""
+    if value is None or credentials is None:
+        return value
+    for name in ("username", "password", "token"):
+        secret = getattr(credentials, name)
+        if secret is not None:
+            value = value.replace("{" + name + "}", secret)
+    return value
+
+
+def _validate(index: int, step: InteractionStep) -> None:
+    def fail(reason: str) -> InteractionError:
+        return InteractionError(f"Interaction step {index} ({step.action.value}) {reason}")
+
+    if step.action in (BrowserAction.CLICK, BrowserAction.TYPE, BrowserAction.SUBMIT) and not step.selector:
+        raise fail("needs a selector")
+    if step.action == BrowserAction.TYPE and step.value is None:
+        raise fail("needs a value")
+    if step.action == BrowserAction.SCROLL and step.value is not None and not step.selector:
+        try:
+            int(step.value)
+        except ValueError:
+            raise fail("value must be a pixel offset") from None
+    if step.repeat > 1 and step.action not in (BrowserAction.CLICK, BrowserAction.SCROLL):
+        raise fail("can only repeat click and scroll steps")
+    if step.wait_for == StepCondition.URL and not step.wait_target:
+        raise fail("needs wait_target, the URL glob to wait for")
+    if step.wait_for == StepCondition.SELECTOR and not (step.wait_target or step.selector):
+        raise fail("needs wait_target, the selector to wait for")
+
+
+def _scriptable(step: InteractionStep) -> bool:
+    """Whether a step can run inside the group script instead of a Playwright call"""
+    return (
+        step.action in _SCRIPTABLE
+        and step.wait_for is None
+        and step.repeat == 1
+        and (step.selector is None or not _ENGINE_SELECTOR.search(step.selector))
+    )
+
+
+class Segment:
+    """Steps that run together: a scripted group of two or more, or one Playwright step"""
+
+    __slots__ = ("start", "steps", "scripted")
+
+    def __init__(self, start: int, steps: List[InteractionStep], scripted: bool):
+        self.start = start
+        self.steps = steps
+        self.scripted = scripted
+
+
+class StepPlan:
+    """A validated step list split into segments"""
+
+    def __init__(self, segments: List[Segment]):
+        self.segments = segments
+
+    @property
+    def steps(self) -> int:
+        return sum(len(segment.steps) for segment in self.segments)
+
+
+def compile_plan(steps: Sequence[InteractionStep]) -> StepPlan:
+    """Validate steps and group runs of plain click/type/scroll steps into scripts"""
+    segments: List[Segment] = []
+    run: List[InteractionStep] = []
+
+    def close_run(end: int) -> None:
+        if len(run) > 1:
+            segments.append(Segment(end - len(run), list(run), True))
+        else:
+            segments.extend(Segment(end - len(run) + i, [step], False) for i, step in enumerate(run))
+        run.clear()
+
+    for index, step in enumerate(steps):
+        _validate(index, step)
+        if _scriptable(step):
+            run.append(step)
+            continue
+        close_run(index)
+        segments.append(Segment(index, [step], False))
+    close_run(len(steps))
+    return StepPlan(segments)
+
+
+class InteractionRun:
+    """A plan bound to one page: the credentials it fills in and the timings it records"""
+
+    def __init__(self, plan: StepPlan, credentials: Optional[Credentials] = None):
+        self.plan = plan
+        self.credentials = credentials
+        self.timings: List[InteractionTiming] = []
+        # URL before the latest action, for url_change waits in a later wait step
+        self.last_url: Optional[str] = None
+
+
+class InteractionEngine:
+    """Runs interaction steps without fixed sleeps.
+
+    Waits end on a condition (a selector, a load state, a URL or a change in
+    the page), with the step timeout only as an upper bound. Runs of plain
+    click/type/scroll steps execute as one in-page script. Compiled plans are
+    cached per host; when a site's group script cannot find its elements the
+    plan falls back to Playwright calls for that group and keeps doing so.
+    """
+
+    def __init__(
+        self,
+        cache_size: int = settings.interaction_plan_cache_size,
+        settle_ms: int = settings.interaction_settle_ms,
+    ):
+        self.cache_size = max(0, cache_size)
+        self.settle_ms = settle_ms
+        self._plans: "OrderedDict[str, StepPlan]" = OrderedDict()
+        self._stats: Dict[str, int] = {
+            "runs": 0,
+            "plan_hits": 0,
+            "plan_misses": 0,
+            "scripted_steps": 0,
+            "browser_steps": 0,
+            "script_fallbacks": 0,
+        }
+
+    def plan(self, url: str, steps: Sequence[InteractionStep]) -> StepPlan:
+        """Validated plan for a site's steps, compiled once per host and step list"""
+        encoded = json.dumps([step.model_dump(mode="json") for step in steps], sort_keys=True)
+        key = f"{host_of(url)}:{hashlib.sha256(encoded.encode('utf-8')).hexdigest()}"
+        plan = self._plans.get(key)
+        if plan is not None:
+            self._plans.move_to_end(key)
+            self._stats["plan_hits"] += 1
+            return plan
+        self._stats["plan_misses"] += 1
+        plan = compile_plan(steps)
+        if self.cache_size:
+            self._plans[key] = plan
+            while len(self._plans) > self.cache_size:
+                self._plans.popitem(last=False)
+        return plan
+
+    async def run(self, page: Any, run: InteractionRun) -> List[InteractionTiming]:
+        """Execute a plan on an open page, returning per-step timings"""
+        self._stats["runs"] += 1
+        with metrics.stage(metrics.INTERACTION):
+            for segment in run.plan.segments:
+                done = 0
+                if segment.scripted:
+                    done = await self._run_script(page, segment, run)
+                    if done == len(segment.steps):
+                        continue
+                    # An element is missing (rendered later, or in a frame); Playwright waits for it
+                    segment.scripted = False
+                    self._stats["script_fallbacks"] += 1
+                for offset in range(done, len(segment.steps)):
+                    await self._run_step(page, segment.start + offset, segment.steps[offset], run)
+        return run.timings
+
+    async def run_steps(
+        self, page: Any, steps: Sequence[InteractionStep], credentials: Optional[Credentials] = None
+    ) -> List[InteractionTiming]:
+        """Execute steps on a page using the plan cached for its site"""
+        return await self.run(page, InteractionRun(self.plan(page.url, steps), credentials))
+
+    async def _run_script(self, page: Any, segment: Segment, run: InteractionRun) -> int:
+        ops = [
+            {
+                "action": step.action.value,
+                "selector": step.selector,
+                "value": render_value(step.value, run.credentials),
+                # A scroll with a selector scrolls that element into view and ignores the value
+                "dy": (
+                    int(step.value)
+                    if step.action == BrowserAction.SCROLL and step.selector is None and step.value is not None
+                    else None
+                ),
+            }
+            for step in segment.steps
+        ]
+        run.last_url = page.url
+        started = time.monotonic()
+        try:
+            result = await page.evaluate(_GROUP_SCRIPT, ops)
+        except Exception as e:
+            if "context was destroyed" not in str(e) and "navigat" not in str(e).lower():
+                raise InteractionError(f"Interaction steps {segment.start}-{segment.start + len(ops) - 1} failed: {e}") from e
+            # The group runs synchronously, so every step ran before the page went away
+            result = {"done": len(ops), "timings": [], "error": None}
+        elapsed = time.monotonic() - started
+        done, timings = result["done"], result["timings"]
+        for offset in range(done):
+            seconds = timings[offset] / 1000 if offset < len(timings) else elapsed / len(ops)
+            run.timings.append(
+                InteractionTiming(
+                    index=segment.start + offset,
+                    action=segment.steps[offset].action.value,
+                    mode="script",
+                    seconds=round(seconds, 4),
+                )
+            )
+        self._stats["scripted_steps"] += done
+        return done
+
+    async def _run_step(self, page: Any, index: int, step: InteractionStep, run: InteractionRun) -> None:
+        condition = _condition(step)
+        started = time.monotonic()
+        repeats = None
+        try:
+            if step.action == BrowserAction.WAIT:
+                snapshot = await page.evaluate(_SNAPSHOT) if condition == StepCondition.CONTENT_CHANGE else None
+                await self._wait(page, step, condition, step.timeout, run.last_url, snapshot)
+            elif step.repeat > 1:
+                run.last_url = page.url
+                repeats = await self._repeat(page, step, condition, run)
+            else:
+                run.last_url = page.url
+                snapshot = await page.evaluate(_SNAPSHOT) if condition == StepCondition.CONTENT_CHANGE else None
+                await self._act(page, step, run)
+                if condition is not None:
+                    await self._wait(page, step, condition, step.timeout, run.last_url, snapshot)
+        except _playwright_timeout() as e:
+            raise InteractionError(
+                f"Interaction step {index} ({step.action.value}) timed out after {step.timeout} ms: {e}"
+            ) from e
+        except InteractionError:
+            raise
+        except Exception as e:
+            raise InteractionError(f"Interaction step {index} ({step.action.value}) failed: {e}") from e
+        self._stats["browser_steps"] += 1
+        run.timings.append(
+            InteractionTiming(
+                index=index,
+                action=step.action.value,
+                mode="browser",
+                seconds=round(time.monotonic() - started, 4),
+                repeats=repeats,
+                waited_for=condition.value if condition is not None else None,
+            )
+        )
+
+    async def _act(self, page: Any, step: InteractionStep, run: InteractionRun) -> None:
+        value = render_value(step.value, run.credentials)
+        if step.action == BrowserAction.CLICK:
+            await page.click(step.selector, timeout=step.timeout)
+        elif step.action == BrowserAction.TYPE:
+            await page.fill(step.selector, value, timeout=step.timeout)
+        elif step.action == BrowserAction.SUBMIT:
+            await page.eval_on_selector(step.selector, _SUBMIT)
+        elif step.selector:
+            await page.locator(step.selector).first.scroll_into_view_if_needed(timeout=step.timeout)
+        elif value is not None:
+            await page.evaluate("(y) => window.scrollBy(0, y)", int(value))
+        else:
+            await page.evaluate("() => window.scrollTo(0, document.documentElement.scrollHeight)")
+
+    async def _wait(
+        self,
+        page: Any,
+        step: InteractionStep,
+        condition: StepCondition,
+        timeout: Optional[int],
+        before_url: Optional[str],
+        snapshot: Optional[List[int]] = None,
+    ) -> None:
+        if condition == StepCondition.SELECTOR:
+            await page.wait_for_selector(step.wait_target or step.selector, timeout=timeout)
+        elif condition == StepCondition.URL:
+            await page.wait_for_url(step.wait_target, wait_until="domcontentloaded", timeout=timeout)
+        elif condition == StepCondition.URL_CHANGE:
+            await page.wait_for_url(lambda url: url != before_url, wait_until="commit", timeout=timeout)
+        elif condition == StepCondition.CONTENT_CHANGE:
+            await page.wait_for_function(_CHANGED, arg=snapshot, timeout=timeout)
+        else:
+            await page.wait_for_load_state(condition.value, timeout=timeout)
+
+    async def _repeat(self, page: Any, step: InteractionStep, condition: StepCondition, run: InteractionRun) -> int:
+        """Click or scroll until the page stops changing, the button disappears or repeat runs out"""
+        bound = min(step.timeout or self.settle_ms, self.settle_ms)
+        done = 0
+        for _ in range(step.repeat):
+            if step.action == BrowserAction.CLICK and not await page.locator(step.selector).first.is_visible():
+                break
+            before_url = page.url
+            snapshot = await page.evaluate(_SNAPSHOT)
+            await self._act(page, step, run)
+            done += 1
+            try:
+                await self._wait(page, step, condition, bound, before_url, snapshot)
+            except _playwright_timeout():
+                break
+        return done
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cached_plans": len(self._plans), "max_cached_plans": self.cache_size, **self._stats}
+
+
+def _condition(step: InteractionStep) -> Optional[StepCondition]:
+    """What a step waits for; wait steps and repeats always wait on something"""
+    if step.wait_for is not None:
+        return step.wait_for
+    if step.action == BrowserAction.WAIT:
+        return StepCondition.SELECTOR if step.selector else StepCondition.NETWORK_IDLE
+    if step.repeat > 1:
+        return StepCondition.CONTENT_CHANGE
+    if step.action == BrowserAction.SUBMIT:
+        return StepCondition.LOAD
+    return None
+
+
+interaction_engine = InteractionEngine()
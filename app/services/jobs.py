@@ -0,0 +1,441 @@
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+
+from app.config import settings
+from app.models.requests import BatchCrawlRequest, SiteCrawlRequest
+from app.models.responses import BatchMetadata, JobStatus
+from app.services import metrics
+from app.services.admission import admission_controller, BACKGROUND
+from app.services.crawler import CrawlerService, crawler_service
+from app.services.sinks import ResultSink
+from app.services.site_crawl import SiteCrawler, SiteCrawlStore
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Job kinds and the request model each one is stored as
+BATCH = "batch"
+SITE = "site"
+_REQUEST_MODELS = {BATCH: BatchCrawlRequest, SITE: SiteCrawlRequest}
+
+JobRequest = Union[BatchCrawlRequest, SiteCrawlRequest]
+
+
+class JobStore:
+    """SQLite-backed batch job queue shared by every worker process on the host.
+
+    All methods are blocking; async callers go through ``asyncio.to_thread``.
+    """
+
+    def __init__(self, path: str = settings.job_db_path, result_ttl: int = settings.job_result_ttl):
+        self.path = path
+        self.result_ttl = result_ttl
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def _init_db(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    result TEXT,
+                    message TEXT,
+                    completed_count INTEGER NOT NULL DEFAULT 0,
+                    total_count INTEGER NOT NULL DEFAULT 0,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    worker_id TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    heartbeat_at TEXT,
+                    expires_at TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            # Finished batch results, one row per URL, so they can be paged without loading the whole batch
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_results (
+                    job_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    url TEXT NOT NULL,
+                    ok INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (job_id, seq)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_job_results_url ON job_results (job_id, url)")
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "kind" not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN kind TEXT NOT NULL DEFAULT '{BATCH}'")
+
+    def _to_status(self, row: sqlite3.Row) -> JobStatus:
+        total = row["total_count"]
+        completed = row["completed_count"]
+        if row["status"] == COMPLETED:
+            progress = 100.0
+        else:
+            progress = round(100.0 * completed / total, 2) if total else 0.0
+        return JobStatus(
+            job_id=row["job_id"],
+            status=row["status"],
+            progress=progress,
+            message=row["message"],
+            completed_count=completed,
+            total_count=total,
+            created_at=datetime.fromisoformat(row["created_at"]),
+            updated_at=datetime.fromisoformat(row["updated_at"]),
+            result=json.loads(row["result"]) if row["result"] else None,
+        )
+
+    def enqueue(self, request: JobRequest) -> JobStatus:
+        now = datetime.utcnow().isoformat()
+        job_id = str(uuid.uuid4())
+        if isinstance(request, SiteCrawlRequest):
+            kind, total = SITE, request.max_pages
+        else:
+            kind, total = BATCH, len(request.urls)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, status, request, message, total_count, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, PENDING, request.model_dump_json(), "Job queued", total, now, now),
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_status(row)
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE job_id = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (job_id, datetime.utcnow().isoformat()),
+            ).fetchone()
+        return self._to_status(row) if row else None
+
+    def claim_next(self, worker_id: str) -> Optional[tuple]:
+        """Atomically move the oldest pending job to running; returns (job_id, request)"""
+        now = datetime.utcnow().isoformat()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT job_id, kind, request FROM jobs WHERE status = ? AND cancel_requested = 0 "
+                    "ORDER BY created_at LIMIT 1",
+                    (PENDING,),
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, worker_id = ?, message = ?, updated_at = ?, heartbeat_at = ? "
+                        "WHERE job_id = ?",
+                        (RUNNING, worker_id, "Job running", now, now, row["job_id"]),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if not row:
+            return None
+        return row["job_id"], _REQUEST_MODELS[row["kind"]].model_validate_json(row["request"])
+
+    def update_progress(self, job_id: str, completed: int, total: int) -> bool:
+        """Record progress and heartbeat; returns True if cancellation was requested"""
+        now = datetime.utcnow().isoformat()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET completed_count = ?, total_count = ?, message = ?, updated_at = ?, heartbeat_at = ? "
+                "WHERE job_id = ? AND status = ?",
+                (completed, total, f"Crawled {completed}/{total} URLs", now, now, job_id, RUNNING),
+            )
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def heartbeat(self, job_id: str) -> bool:
+        """Refresh the running job's heartbeat; returns True if cancellation was requested"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND status = ?",
+                (datetime.utcnow().isoformat(), job_id, RUNNING),
+            )
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        message: str,
+        result: Optional[Dict[str, Any]] = None,
+        items: Optional[List[Tuple[str, bool, str]]] = None,
+    ) -> None:
+        """Mark a job done; items are (url, ok, result JSON) rows listed by results()"""
+        now = datetime.utcnow()
+        expires_at = (now + timedelta(seconds=self.result_ttl)).isoformat() if self.result_ttl else None
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if items:
+                    conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+                    conn.executemany(
+                        "INSERT INTO job_results (job_id, seq, url, ok, payload) VALUES (?, ?, ?, ?, ?)",
+                        ((job_id, seq, url, int(ok), payload) for seq, (url, ok, payload) in enumerate(items)),
+                    )
+                conn.execute(
+                    "UPDATE jobs SET status = ?, message = ?, result = ?, updated_at = ?, expires_at = ? "
+                    "WHERE job_id = ?",
+                    (status, message, json.dumps(result) if result is not None else None,
+                     now.isoformat(), expires_at, job_id),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def results(self, job_id: str, offset: int, limit: int, ok: Optional[bool] = None) -> Tuple[int, List[sqlite3.Row]]:
+        """A page of stored per-URL results as (total, rows of url, ok and payload JSON)"""
+        where, params = "job_id = ?", [job_id]
+        if ok is not None:
+            where += " AND ok = ?"
+            params.append(int(ok))
+        with closing(self._connect()) as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM job_results WHERE {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT url, ok, payload FROM job_results WHERE {where} ORDER BY seq LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return total, rows
+
+    def result_for(self, job_id: str, url: str) -> Optional[sqlite3.Row]:
+        """The stored result of one URL of a batch"""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT url, ok, payload FROM job_results WHERE job_id = ? AND url = ? ORDER BY seq LIMIT 1",
+                (job_id, url),
+            ).fetchone()
+
+    def cancel(self, job_id: str) -> Optional[JobStatus]:
+        """Cancel a pending job immediately or flag a running one for its worker"""
+        now = datetime.utcnow()
+        expires_at = (now + timedelta(seconds=self.result_ttl)).isoformat() if self.result_ttl else None
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, message = ?, cancel_requested = 1, updated_at = ?, expires_at = ? "
+                "WHERE job_id = ? AND status = ?",
+                (CANCELLED, "Job cancelled", now.isoformat(), expires_at, job_id, PENDING),
+            )
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, message = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                ("Cancellation requested", now.isoformat(), job_id, RUNNING),
+            )
+        return self.get(job_id)
+
+    def requeue_stale(self, stale_after: float) -> int:
+        """Return running jobs whose worker stopped heartbeating to the queue"""
+        cutoff = (datetime.utcnow() - timedelta(seconds=stale_after)).isoformat()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = NULL, message = ? "
+                "WHERE status = ? AND heartbeat_at < ?",
+                (PENDING, "Job requeued after worker loss", RUNNING, cutoff),
+            )
+        return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        now = datetime.utcnow().isoformat()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "DELETE FROM job_results WHERE job_id IN "
+                "(SELECT job_id FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?)",
+                (now,),
+            )
+            cursor = conn.execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        return cursor.rowcount
+
+
+class JobWorker:
+    """Background tasks that drain the job queue inside one API worker process"""
+
+    def __init__(
+        self,
+        store: JobStore,
+        crawler_service: CrawlerService,
+        site_crawler: Optional[SiteCrawler] = None,
+        concurrency: int = settings.job_workers,
+        poll_interval: float = settings.job_poll_interval,
+        stale_after: float = settings.job_stale_after,
+        progress_interval: float = settings.job_progress_interval,
+    ):
+        self.store = store
+        self.crawler_service = crawler_service
+        self.site_crawler = site_crawler or SiteCrawler(crawler_service, SiteCrawlStore(store.path))
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.progress_interval = progress_interval
+        self.worker_id = ""
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    def start(self) -> None:
+        # Set here rather than at import, so workers forked from a preloaded master get their own id
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._maintenance()))
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _maintenance(self) -> None:
+        while not self._stopping:
+            try:
+                requeued = await asyncio.to_thread(self.store.requeue_stale, self.stale_after)
+                if requeued:
+                    logger.warning("Requeued %d stale batch jobs", requeued)
+                await asyncio.to_thread(self.store.purge_expired)
+                await asyncio.to_thread(self.site_crawler.store.purge_orphans)
+            except Exception as e:
+                logger.warning("Job maintenance failed: %s", e)
+            await asyncio.sleep(max(self.stale_after / 4, self.poll_interval))
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                claimed = await asyncio.to_thread(self.store.claim_next, self.worker_id)
+            except Exception as e:
+                logger.warning("Failed to claim batch job: %s", e)
+                claimed = None
+            if not claimed:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            job_id, request = claimed
+            await self._execute(job_id, request)
+
+    async def _execute(self, job_id: str, request: JobRequest) -> None:
+        # Progress is written at most every progress_interval seconds, plus once at the end,
+        # so a large batch does not wait on a database write for every URL
+        unwritten: Optional[Tuple[int, int]] = None
+        written_at = 0.0
+
+        async def write_progress(completed: int, total: int) -> None:
+            nonlocal unwritten, written_at
+            unwritten, written_at = None, time.monotonic()
+            if await asyncio.to_thread(self.store.update_progress, job_id, completed, total):
+                crawl.cancel()
+
+        async def on_progress(completed: int, total: int) -> None:
+            nonlocal unwritten
+            if completed >= total or time.monotonic() - written_at >= self.progress_interval:
+                await write_progress(completed, total)
+            else:
+                unwritten = (completed, total)
+
+        crawl = asyncio.create_task(self._admitted(job_id, request, on_progress))
+        watcher = asyncio.create_task(self._watch(job_id, crawl))
+        try:
+            result = await crawl
+            if unwritten is not None:
+                await asyncio.to_thread(self.store.update_progress, job_id, *unwritten)
+        except asyncio.CancelledError:
+            if self._stopping:
+                # Worker shutdown: leave the job running so it is requeued once stale
+                raise
+            await asyncio.to_thread(self.store.finish, job_id, CANCELLED, "Job cancelled")
+            return
+        except Exception as e:
+            logger.exception("Batch job %s failed", job_id)
+            await asyncio.to_thread(self.store.finish, job_id, FAILED, str(e))
+            return
+        finally:
+            watcher.cancel()
+
+        items = None
+        with metrics.stage(metrics.SERIALIZATION):
+            if isinstance(request, SiteCrawlRequest):
+                message = f"Crawled {result.pages_crawled} pages ({result.stop_reason})"
+                payload = result.model_dump(mode="json")
+            elif request.sink is not None:
+                metadata, manifest = result
+                message = f"Wrote {manifest.records} results to {len(manifest.files)} files"
+                # Results live in the sink; the status only points at its manifest
+                payload = {"metadata": metadata.model_dump(mode="json") if metadata else None, "sink": manifest.model_dump(mode="json")}
+            else:
+                message = f"Successfully crawled {len(result.successful_urls)} URLs"
+                # The status keeps only the batch metadata; per-URL results are paged from job_results
+                payload = {"metadata": result.metadata.model_dump(mode="json")}
+                items = [(str(item.url), True, item.model_dump_json()) for item in result.successful_urls]
+                items.extend((str(item.url), False, item.model_dump_json()) for item in result.failed_urls)
+        await asyncio.to_thread(self.store.finish, job_id, COMPLETED, message, payload, items)
+
+    async def _admitted(self, job_id: str, request: JobRequest, on_progress: Callable[[int, int], Awaitable[None]]) -> Any:
+        """Run a job once admission control grants it units, at its granted concurrency"""
+        site = isinstance(request, SiteCrawlRequest)
+        metrics.current_endpoint.set(f"job:{SITE if site else BATCH}")
+        units = admission_controller.batch_units(
+            request.max_pages if site else len(request.urls), request.global_concurrent_limit
+        )
+        # Waiting here still heartbeats, so a job queued behind interactive traffic is not requeued as stale
+        async with await admission_controller.acquire(units, BACKGROUND):
+            request.global_concurrent_limit = units
+            if site:
+                # Site crawls checkpoint every page, so a requeued job resumes where it stopped
+                return await self.site_crawler.run(job_id, request, on_progress)
+            if request.sink is not None:
+                return await self._crawl_to_sink(job_id, request, on_progress)
+            return await self.crawler_service.crawl_batch(request, on_progress)
+
+    async def _crawl_to_sink(self, job_id: str, request: BatchCrawlRequest, on_progress: Callable[[int, int], Awaitable[None]]) -> Tuple[Optional[BatchMetadata], Any]:
+        """Stream a batch into its sink, holding one write buffer instead of every result"""
+        sink = ResultSink(job_id, request.sink)
+        metadata = None
+        try:
+            async for item in self.crawler_service.crawl_batch_stream(request, on_progress):
+                if isinstance(item, BatchMetadata):
+                    metadata = item
+                    continue
+                await sink.write(item)
+            return metadata, await sink.close(metadata)
+        except BaseException:
+            # A requeued or retried job starts its parts over
+            await sink.abort()
+            raise
+
+    async def _watch(self, job_id: str, crawl: asyncio.Task) -> None:
+        """Heartbeat while a job runs and cancel it when a client asks to"""
+        interval = max(self.poll_interval, min(self.stale_after / 4, 10.0))
+        while not crawl.done():
+            await asyncio.sleep(interval)
+            if await asyncio.to_thread(self.store.heartbeat, job_id):
+                crawl.cancel()
+
+
+job_store = JobStore()
+job_worker = JobWorker(job_store, crawler_service)
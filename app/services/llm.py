@@ -0,0 +1,383 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import re
+
+from pydantic import ValidationError
+
+from app.config import settings
+from app.models.requests import ExtractionConfig, ExtractionType, LLMConfig
+from app.models.responses import ExtractedContent, QAPair
+from app.services.cache import ResponseCache
+from app.services import metrics
+from app.services.executor import PostProcessExecutor, postprocess_executor
+from app.services.llm_providers import (
+    COMBINE, PROMPT_VERSION, LLMCall, LLMProvider, LLMResponseError, RateLimiter, get_provider
+)
+from app.services.singleflight import SingleFlight
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken ships with crawl4ai but stay optional
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Room left in every call for instructions, the schema and document markers
+PROMPT_OVERHEAD_TOKENS = 200
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None or settings.llm_tokenizer != "tiktoken":
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # The BPE file is downloaded on first use; offline hosts fall back to the estimate
+        logger.warning("tiktoken unavailable, estimating tokens from length: %s", e)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _split_oversized(block: str, max_tokens: int) -> List[str]:
+    """Split one block that alone exceeds the budget: by lines, then sentences, then characters"""
+    for pattern in (r"\n", r"(?<=[.!?])\s+"):
+        parts = [p for p in re.split(pattern, block) if p.strip()]
+        if len(parts) > 1:
+            return _pack(parts, max_tokens, "\n" if pattern == r"\n" else " ")
+    step = max(1, max_tokens * 4)
+    return [block[i:i + step] for i in range(0, len(block), step)]
+
+
+def _pack(blocks: List[str], max_tokens: int, joiner: str) -> List[str]:
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for block in blocks:
+        tokens = count_tokens(block)
+        if tokens > max_tokens:
+            if current:
+                chunks.append(joiner.join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_oversized(block, max_tokens))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(joiner.join(current))
+            current, current_tokens = [], 0
+        current.append(block)
+        current_tokens += tokens
+    if current:
+        chunks.append(joiner.join(current))
+    return chunks
+
+
+def chunk_markdown(text: str, max_tokens: int) -> List[str]:
+    """Greedily pack paragraphs into chunks of at most max_tokens, never splitting one that fits"""
+    text = text.strip()
+    if not text:
+        return []
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    blocks = [b.strip() for b in re.split(r"\n\s*\n", text) if b.strip()]
+    return _pack(blocks, max(1, max_tokens), "\n\n")
+
+
+def _checked(task: str, result: Any) -> Any:
+    """A provider result in the shape its task promises; raises LLMResponseError otherwise"""
+    if task in (ExtractionType.SUMMARY.value, COMBINE):
+        if not isinstance(result, str):
+            raise LLMResponseError(f"Expected a summary string, got {type(result).__name__}")
+        return result
+    if task == ExtractionType.QA.value:
+        if not isinstance(result, list):
+            raise LLMResponseError(f"Expected a list of Q&A pairs, got {type(result).__name__}")
+        try:
+            return [QAPair.model_validate(pair).model_dump() for pair in result]
+        except ValidationError as e:
+            raise LLMResponseError(f"Malformed Q&A pair: {e.errors()[0]['msg']}") from e
+    if not isinstance(result, dict):
+        raise LLMResponseError(f"Expected an object for the schema, got {type(result).__name__}")
+    return result
+
+
+def _merge_structured(results: List[Any]) -> Dict[str, Any]:
+    """First non-empty value wins per field; lists from later chunks are appended"""
+    merged: Dict[str, Any] = {}
+    for result in results:
+        if not isinstance(result, dict):
+            continue
+        for name, value in result.items():
+            current = merged.get(name)
+            if isinstance(current, list) and isinstance(value, list):
+                merged[name] = current + [v for v in value if v not in current]
+            elif current in (None, "", [], {}):
+                merged[name] = value
+    return merged
+
+
+def _merge_qa(results: List[Any]) -> List[Dict[str, str]]:
+    seen = set()
+    merged = []
+    for pairs in results:
+        for pair in pairs or []:
+            if not isinstance(pair, dict):
+                continue
+            question = str(pair.get("question", "")).strip().lower()
+            if question and question not in seen:
+                seen.add(question)
+                merged.append({"question": str(pair.get("question")), "answer": str(pair.get("answer", ""))})
+    return merged
+
+
+class _PendingBatch:
+    def __init__(self, provider: LLMProvider, task: str, schema: Optional[Dict[str, Any]], config: LLMConfig):
+        self.provider = provider
+        self.task = task
+        self.schema = schema
+        self.config = config
+        self.documents: List[str] = []
+        self.futures: List[asyncio.Future] = []
+        self.tokens = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class LLMEngine:
+    """Chunked, batched, rate-limited and memoized LLM extraction.
+
+    Pages over ``LLMConfig.max_input_tokens`` are split into chunks that are
+    extracted concurrently and merged (summaries with one more "combine"
+    call). Pages that fit in one call wait up to ``batch_window`` seconds to
+    share a request with other small pages of the same task and model.
+    Results are memoized by content hash, task, schema hash and model.
+    """
+
+    def __init__(
+        self,
+        memo: Optional[ResponseCache] = None,
+        executor: Optional[PostProcessExecutor] = None,
+        batch_window: float = settings.llm_batch_window,
+        batch_max_documents: int = settings.llm_batch_max_documents,
+        requests_per_minute: int = settings.llm_requests_per_minute,
+        max_concurrency: int = settings.llm_max_concurrency,
+    ):
+        self.memo = memo or ResponseCache(
+            memory_max_bytes=settings.llm_cache_memory_max_bytes,
+            disk_path=settings.llm_cache_path,
+            disk_max_bytes=settings.llm_cache_disk_max_bytes,
+            default_ttl=settings.llm_cache_ttl,
+        )
+        self.executor = executor or postprocess_executor
+        self.batch_window = batch_window
+        self.batch_max_documents = max(1, batch_max_documents)
+        self.requests_per_minute = requests_per_minute
+        self.max_concurrency = max_concurrency
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._batches: Dict[Tuple, _PendingBatch] = {}
+        self._flushes: set = set()
+        self._inflight = SingleFlight()
+        self._stats: Dict[str, int] = {
+            "extractions": 0,
+            "memo_hits": 0,
+            "calls": 0,
+            "batched_calls": 0,
+            "documents": 0,
+            "chunks": 0,
+            "input_tokens": 0,
+            "errors": 0,
+        }
+
+    def _limiter(self, provider: str) -> RateLimiter:
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            limiter = self._limiters[provider] = RateLimiter(self.requests_per_minute, self.max_concurrency)
+        return limiter
+
+    @staticmethod
+    def memo_key(text: str, task: str, schema: Optional[Dict[str, Any]], config: LLMConfig) -> str:
+        schema_hash = (
+            hashlib.sha256(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest() if schema else None
+        )
+        options = {
+            "content": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            "task": task,
+            "schema": schema_hash,
+            "model": f"{config.provider}/{config.model}",
+            "prompt": PROMPT_VERSION,
+        }
+        return "llm:" + hashlib.sha256(json.dumps(options, sort_keys=True).encode("utf-8")).hexdigest()
+
+    async def _call(self, provider: LLMProvider, call: LLMCall) -> List[Any]:
+        async with self._limiter(provider.name):
+            self._stats["calls"] += 1
+            self._stats["documents"] += len(call.documents)
+            self._stats["input_tokens"] += sum(count_tokens(d) for d in call.documents)
+            try:
+                return await provider.complete(call)
+            except Exception:
+                self._stats["errors"] += 1
+                raise
+
+    def _flush(self, key: Tuple) -> None:
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.create_task(self._run_batch(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _run_batch(self, batch: _PendingBatch) -> None:
+        if len(batch.documents) > 1:
+            self._stats["batched_calls"] += 1
+        try:
+            results = await self._call(
+                batch.provider, LLMCall(batch.task, batch.documents, batch.config, batch.schema)
+            )
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(batch.futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _batched(
+        self,
+        provider: LLMProvider,
+        task: str,
+        text: str,
+        tokens: int,
+        schema: Optional[Dict[str, Any]],
+        config: LLMConfig,
+    ) -> Any:
+        """Queue a small document to share the next call with others of the same kind"""
+        key = (provider.name, config.model, config.temperature, config.max_tokens, task, json.dumps(schema, sort_keys=True))
+        budget = config.max_input_tokens - PROMPT_OVERHEAD_TOKENS
+        batch = self._batches.get(key)
+        if batch is not None and batch.tokens + tokens > budget:
+            self._flush(key)
+            batch = None
+        if batch is None:
+            batch = self._batches[key] = _PendingBatch(provider, task, schema, config)
+            batch.timer = asyncio.get_running_loop().call_later(self.batch_window, self._flush, key)
+        future = asyncio.get_running_loop().create_future()
+        batch.documents.append(text)
+        batch.futures.append(future)
+        batch.tokens += tokens
+        if len(batch.documents) >= self.batch_max_documents:
+            self._flush(key)
+        return await future
+
+    async def _single(
+        self, provider: LLMProvider, task: str, text: str, schema: Optional[Dict[str, Any]], config: LLMConfig
+    ) -> Any:
+        return (await self._call(provider, LLMCall(task, [text], config, schema)))[0]
+
+    async def _combine(self, provider: LLMProvider, parts: List[str], config: LLMConfig, depth: int = 0) -> str:
+        """Reduce partial summaries until they fit one call"""
+        joined = "\n\n".join(p for p in parts if p)
+        budget = config.max_input_tokens - PROMPT_OVERHEAD_TOKENS
+        if count_tokens(joined) > budget and depth < 3:
+            chunks = await self.executor.run(chunk_markdown, joined, budget)
+            parts = await asyncio.gather(*(self._single(provider, COMBINE, c, None, config) for c in chunks))
+            return await self._combine(provider, [_checked(COMBINE, p) for p in parts], config, depth + 1)
+        return _checked(COMBINE, await self._single(provider, COMBINE, joined, None, config))
+
+    async def _extract_uncached(
+        self, provider: LLMProvider, task: str, text: str, schema: Optional[Dict[str, Any]], config: LLMConfig
+    ) -> Any:
+        budget = config.max_input_tokens - PROMPT_OVERHEAD_TOKENS
+        # Tokenizing a long page is CPU-bound, keep it off the event loop
+        chunks = await self.executor.run(chunk_markdown, text, budget)
+        self._stats["chunks"] += len(chunks)
+        if len(chunks) == 1:
+            if provider.supports_batching and self.batch_window > 0 and self.batch_max_documents > 1:
+                result = await self._batched(provider, task, chunks[0], count_tokens(chunks[0]), schema, config)
+            else:
+                result = await self._single(provider, task, chunks[0], schema, config)
+            return _checked(task, result)
+
+        results = await asyncio.gather(*(self._single(provider, task, c, schema, config) for c in chunks))
+        results = [_checked(task, result) for result in results]
+        if task == ExtractionType.SUMMARY.value:
+            return await self._combine(provider, results, config)
+        if task == ExtractionType.QA.value:
+            return _merge_qa(list(results))
+        return _merge_structured(list(results))
+
+    async def extract(
+        self,
+        text: str,
+        task: ExtractionType,
+        schema: Optional[Dict[str, Any]] = None,
+        config: Optional[LLMConfig] = None,
+    ) -> Any:
+        """Summary (str), Q&A pairs (list) or structured data (dict) for one page"""
+        config = config or LLMConfig()
+        task_name = task.value
+        self._stats["extractions"] += 1
+        if not text.strip():
+            return {"summary": "", "qa": [], "schema": {}}[task_name]
+
+        key = self.memo_key(text, task_name, schema, config)
+        entry, tier = await self.memo.lookup(key)
+        if entry is not None and self.memo.is_fresh(entry, None):
+            try:
+                result = _checked(task_name, json.loads(entry.payload))
+            except (ValueError, LLMResponseError):
+                # Written before answers were validated; extract again
+                pass
+            else:
+                self._stats["memo_hits"] += 1
+                self.memo.counters[f"{tier}_hits"] += 1
+                return result
+        elif entry is not None:
+            self.memo.counters["stale"] += 1
+        self.memo.counters["misses"] += 1
+
+        async def run() -> Any:
+            # Only validated results reach the memo; a malformed answer raises instead of being cached
+            result = await self._extract_uncached(get_provider(config.provider), task_name, text, schema, config)
+            await self.memo.store(key, json.dumps(result).encode("utf-8"))
+            return result
+
+        # Identical concurrent requests share one extraction
+        return await self._inflight.do(key, run)
+
+    async def extract_content(self, text: str, extraction_config: ExtractionConfig) -> ExtractedContent:
+        """Run the configured extraction on a page's markdown"""
+        content = ExtractedContent(raw_text=text)
+        extraction_type = extraction_config.extraction_type
+        llm_config = extraction_config.llm_config
+        with metrics.stage(metrics.LLM_EXTRACTION):
+            if extraction_type == ExtractionType.SUMMARY:
+                content.summary = await self.extract(text, extraction_type, config=llm_config)
+            elif extraction_type == ExtractionType.QA:
+                content.qa_pairs = await self.extract(text, extraction_type, config=llm_config)
+            elif extraction_type == ExtractionType.SCHEMA and extraction_config.custom_schema:
+                content.structured_data = await self.extract(
+                    text, extraction_type, schema=extraction_config.custom_schema, config=llm_config
+                )
+        return content
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "pending_batches": len(self._batches),
+            "rate_limit_wait_seconds": {name: l.waited_seconds for name, l in self._limiters.items()},
+        }
+
+
+llm_engine = LLMEngine()
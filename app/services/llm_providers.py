@@ -0,0 +1,202 @@
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+import asyncio
+import json
+import re
+import time
+
+from app.config import settings
+from app.models.requests import ExtractionType, LLMConfig
+
+# Bump when prompts change so memoized results from older prompts are not reused
+PROMPT_VERSION = 1
+
+# "combine" merges partial summaries of one long page into a single summary
+COMBINE = "combine"
+
+_INSTRUCTIONS = {
+    ExtractionType.SUMMARY.value: "Summarize each document in a few sentences. Each result is a string.",
+    ExtractionType.QA.value: (
+        "Write question and answer pairs covering the key facts of each document. "
+        'Each result is a list of {"question": ..., "answer": ...} objects.'
+    ),
+    ExtractionType.SCHEMA.value: (
+        "Extract data from each document following this JSON schema. Each result is an object "
+        "matching the schema; use null for fields the document does not mention.\nSchema: {schema}"
+    ),
+    COMBINE: "Each document holds partial summaries of one page. Merge them into one summary string per document.",
+}
+
+_SYSTEM_PROMPT = "You extract information from web pages. Answer with JSON only."
+
+
+class LLMResponseError(Exception):
+    """Raised when a provider answer cannot be parsed into one result per document"""
+
+
+class LLMCall:
+    """One provider request: a task applied to one or more documents"""
+
+    def __init__(self, task: str, documents: List[str], config: LLMConfig, schema: Optional[Dict[str, Any]] = None):
+        self.task = task
+        self.documents = documents
+        self.config = config
+        self.schema = schema
+
+    def messages(self) -> List[Dict[str, str]]:
+        instructions = _INSTRUCTIONS[self.task].replace("{schema}", json.dumps(self.schema or {}))
+        documents = "\n".join(
+            f'<document id="{i}">\n{text}\n</document>' for i, text in enumerate(self.documents)
+        )
+        return [
+            {"role": "system", "content": _SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": (
+                    f"{instructions}\n"
+                    f'Return {{"results": [...]}} with exactly {len(self.documents)} result(s), '
+                    f"in document order.\n\n{documents}"
+                ),
+            },
+        ]
+
+
+def parse_results(content: str, expected: int) -> List[Any]:
+    """Pull the results list out of a model answer, tolerating code fences"""
+    text = content.strip()
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1)
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise LLMResponseError(f"Model answer is not JSON: {e}") from e
+    results = data.get("results") if isinstance(data, dict) else data
+    if not isinstance(results, list) or len(results) != expected:
+        raise LLMResponseError(f"Expected {expected} results, got {type(results).__name__}")
+    return results
+
+
+class LLMProvider:
+    """Turns an LLMCall into one result per document"""
+
+    name = "base"
+    # Whether several small documents may share one request
+    supports_batching = False
+
+    async def complete(self, call: LLMCall) -> List[Any]:
+        raise NotImplementedError
+
+
+class LiteLLMProvider(LLMProvider):
+    """Any provider litellm speaks to (openai, anthropic, gemini, ollama, ...), as crawl4ai itself uses"""
+
+    supports_batching = True
+
+    def __init__(self, name: str, timeout: float = settings.llm_timeout):
+        self.name = name
+        self.timeout = timeout
+
+    async def complete(self, call: LLMCall) -> List[Any]:
+        import litellm
+
+        response = await litellm.acompletion(
+            model=f"{self.name}/{call.config.model}",
+            messages=call.messages(),
+            temperature=call.config.temperature,
+            max_tokens=call.config.max_tokens * len(call.documents),
+            timeout=self.timeout,
+            drop_params=True,
+        )
+        return parse_results(response.choices[0].message.content or "", len(call.documents))
+
+
+class MockProvider(LLMProvider):
+    """Deterministic local stand-in for tests and benchmarks; keeps the last ``record_calls`` calls"""
+
+    name = "mock"
+    supports_batching = True
+
+    def __init__(self, latency: float = 0.0, record_calls: int = 0):
+        self.latency = latency
+        self.calls: Deque[LLMCall] = deque(maxlen=record_calls)
+
+    @staticmethod
+    def _sentences(text: str, limit: int) -> str:
+        sentences = re.split(r"(?<=[.!?])\s+", " ".join(text.split()))
+        return " ".join(sentences[:limit])
+
+    def _answer(self, call: LLMCall, text: str) -> Any:
+        max_chars = call.config.max_tokens * 4
+        if call.task in (ExtractionType.SUMMARY.value, COMBINE):
+            return self._sentences(text, 2)[:max_chars]
+        if call.task == ExtractionType.QA.value:
+            heading = next((line.lstrip("# ").strip() for line in text.splitlines() if line.startswith("#")), "this page")
+            return [{"question": f"What does {heading} say?", "answer": self._sentences(text, 1)[:max_chars]}]
+        fields = (call.schema or {}).get("properties", call.schema or {})
+        return {name: None for name in fields}
+
+    async def complete(self, call: LLMCall) -> List[Any]:
+        self.calls.append(call)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._answer(call, text) for text in call.documents]
+
+
+class RateLimiter:
+    """Per-provider token bucket on requests per minute plus a concurrency cap"""
+
+    def __init__(self, requests_per_minute: int, max_concurrency: int):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1.0, float(requests_per_minute))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waited_seconds = 0.0
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _take(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+
+    async def __aenter__(self) -> "RateLimiter":
+        await self._slots.acquire()
+        try:
+            if self.rate > 0:
+                await self._take()
+        except BaseException:
+            self._slots.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._slots.release()
+
+
+_providers: Dict[str, LLMProvider] = {}
+
+
+def register_provider(provider: LLMProvider) -> None:
+    """Serve LLMConfig.provider == provider.name with this instance, e.g. a MockProvider in tests"""
+    _providers[provider.name] = provider
+
+
+def get_provider(name: str) -> LLMProvider:
+    """Shared provider instance by LLMConfig.provider name"""
+    provider = _providers.get(name)
+    if provider is None:
+        provider = _providers[name] = LiteLLMProvider(name)
+    return provider
+
+
+if settings.llm_mock_provider:
+    register_provider(MockProvider())
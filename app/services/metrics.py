@@ -0,0 +1,255 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+import asyncio
+import logging
+import os
+import time
+
+from app.config import settings
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil is in requirements but stay optional
+    psutil = None
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+    )
+except ImportError:  # pragma: no cover - metrics become no-ops without prometheus_client
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    Histogram = None
+
+logger = logging.getLogger(__name__)
+
+# Stages a crawl is broken into; every stage histogram uses these names
+ADMISSION_WAIT = "admission_wait"
+QUEUE_WAIT = "queue_wait"
+BROWSER_ACQUIRE = "browser_acquire"
+NAVIGATION = "navigation"
+RENDER_WAIT = "render_wait"
+INTERACTION = "interaction"
+HTML_EXTRACTION = "html_extraction"
+MARKDOWN = "markdown"
+LLM_EXTRACTION = "llm_extraction"
+SERIALIZATION = "serialization"
+
+# Key under CrawlerRunConfig.shared_data where page hooks leave timestamps for one render
+MARKS_DATA_KEY = "stage_marks"
+
+# What the current task works for: a job kind, or the ASGI scope of a request whose route is read once routed
+current_endpoint: ContextVar[Union[str, Dict[str, Any]]] = ContextVar("current_endpoint", default="internal")
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+enabled = settings.metrics_enabled and Histogram is not None
+
+if enabled:
+    STAGE_SECONDS = Histogram(
+        "crawl4ai_stage_seconds", "Time spent in each crawl stage", ["stage", "endpoint"], buckets=_BUCKETS
+    )
+    CRAWL_SECONDS = Histogram(
+        "crawl4ai_crawl_seconds", "End-to-end time of one URL crawl", ["endpoint", "host", "tier"], buckets=_BUCKETS
+    )
+    CRAWLS = Counter("crawl4ai_crawls", "URL crawls by outcome", ["endpoint", "tier", "outcome"])
+    HTTP_SECONDS = Histogram(
+        "crawl4ai_http_request_seconds", "API request latency", ["method", "route", "status"], buckets=_BUCKETS
+    )
+    INFLIGHT = Gauge("crawl4ai_inflight_crawls", "URL crawls in progress", ["endpoint"], multiprocess_mode="livesum")
+    WAITERS = Gauge(
+        "crawl4ai_semaphore_waiters", "Tasks waiting for a slot", ["resource"], multiprocess_mode="livesum"
+    )
+    BROWSERS = Gauge("crawl4ai_browsers", "Running browsers", ["kind"], multiprocess_mode="livesum")
+    LAUNCHES = Counter("crawl4ai_browser_launches", "Browsers started", ["kind"])
+    REJECTIONS = Counter("crawl4ai_admission_rejections", "Requests shed by admission control", ["reason", "priority"])
+    ADMITTED_UNITS = Gauge(
+        "crawl4ai_admission_units_in_use", "Admission units held by running requests", multiprocess_mode="livesum"
+    )
+    RSS = Gauge("crawl4ai_worker_rss_bytes", "Resident memory of each API worker", multiprocess_mode="liveall")
+    STARTUP_SECONDS = Gauge(
+        "crawl4ai_worker_startup_seconds", "How long each worker took per start-up phase", ["phase"],
+        multiprocess_mode="liveall"
+    )
+
+_hosts: set = set()
+
+
+def _host_label(host: str) -> str:
+    """Cap per-host series; hosts beyond the first metrics_max_hosts share one label"""
+    if host in _hosts:
+        return host
+    if len(_hosts) < settings.metrics_max_hosts:
+        _hosts.add(host)
+        return host
+    return "other"
+
+
+def endpoint_label() -> str:
+    """Route template of the current request (e.g. /crawl/batch/{job_id}) or the job kind"""
+    value = current_endpoint.get()
+    if isinstance(value, str):
+        return value
+    return getattr(value.get("route"), "path", None) or "unmatched"
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    if enabled:
+        STAGE_SECONDS.labels(stage, endpoint_label()).observe(seconds)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the enclosed block as one stage, whether or not it raises"""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.monotonic() - started)
+
+
+def count_launch(kind: str) -> None:
+    if enabled:
+        LAUNCHES.labels(kind).inc()
+
+
+def count_rejection(reason: str, priority: str) -> None:
+    if enabled:
+        REJECTIONS.labels(reason, priority).inc()
+
+
+def observe_marks(marks: Dict[str, float], finished: float) -> None:
+    """Turn the timestamps left by the page hooks into navigation, render and markdown stages"""
+    goto, arrived, html = marks.get("before_goto"), marks.get("after_goto"), marks.get("before_return_html")
+    if goto is not None and arrived is not None:
+        observe_stage(NAVIGATION, arrived - goto)
+    if arrived is not None and html is not None:
+        observe_stage(RENDER_WAIT, html - arrived)
+    if html is not None:
+        observe_stage(MARKDOWN, finished - html)
+
+
+@contextmanager
+def track_crawl(host: str) -> Iterator[Dict[str, str]]:
+    """Count one crawl as in flight and record its latency; callers fill in the tier"""
+    labels = {"tier": "unknown", "outcome": "ok"}
+    if not enabled:
+        yield labels
+        return
+    endpoint = endpoint_label()
+    inflight = INFLIGHT.labels(endpoint)
+    inflight.inc()
+    started = time.monotonic()
+    try:
+        yield labels
+    except BaseException:
+        labels["outcome"] = "error"
+        raise
+    finally:
+        inflight.dec()
+        CRAWL_SECONDS.labels(endpoint, _host_label(host), labels["tier"]).observe(time.monotonic() - started)
+        CRAWLS.labels(endpoint, labels["tier"], labels["outcome"]).inc()
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request by its route template"""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not enabled:
+            await self.app(scope, receive, send)
+            return
+        # The router stores the matched route in this same scope before the endpoint runs
+        token = current_endpoint.set(scope)
+        status = {"code": 500}
+        started = time.monotonic()
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = endpoint_label()
+            current_endpoint.reset(token)
+            HTTP_SECONDS.labels(scope["method"], route, str(status["code"])).observe(time.monotonic() - started)
+
+
+def observe_startup(phases: Dict[str, Optional[float]]) -> None:
+    if not enabled:
+        return
+    for phase, seconds in phases.items():
+        if seconds is not None:
+            STARTUP_SECONDS.labels(phase).set(seconds)
+
+
+class MetricsSampler:
+    """Refreshes this worker's gauges: browsers, waiters and RSS"""
+
+    def __init__(self, interval: float = settings.metrics_sample_interval):
+        self.interval = interval
+        self.sources: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self) -> None:
+        if not enabled:
+            return
+        pool = self.sources.get("pool")
+        sessions = self.sources.get("sessions")
+        executor = self.sources.get("executor")
+        scheduler = self.sources.get("scheduler")
+        admission = self.sources.get("admission")
+        if pool is not None:
+            stats = pool.stats()
+            BROWSERS.labels("pool").set(stats["browsers"])
+            WAITERS.labels("browser_pool").set(stats["waiting"])
+        if sessions is not None:
+            BROWSERS.labels("session").set(sessions.stats()["live"])
+        if executor is not None:
+            WAITERS.labels("executor").set(executor.stats()["waiting"])
+        if scheduler is not None:
+            WAITERS.labels("host_scheduler").set(scheduler.waiting)
+        if admission is not None:
+            WAITERS.labels("admission").set(admission.queued)
+            ADMITTED_UNITS.set(admission.in_use)
+        if psutil is not None:
+            RSS.set(psutil.Process().memory_info().rss)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning("Metrics sampling failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self, **sources: Any) -> None:
+        """Start sampling the given pool, sessions, executor, scheduler and admission controller"""
+        self.sources = sources
+        if enabled and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+def render() -> Tuple[bytes, str]:
+    """Exposition of every worker's metrics; merged from PROMETHEUS_MULTIPROC_DIR under gunicorn"""
+    if not enabled:
+        return b"", CONTENT_TYPE_LATEST
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+metrics_sampler = MetricsSampler()
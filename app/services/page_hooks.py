@@ -0,0 +1,51 @@
+from typing import Any
+import time
+
+from app.services.fast_mode import resource_blocking_hook
+from app.services.interactions import INTERACTIONS_DATA_KEY, interaction_engine
+from app.services.metrics import MARKS_DATA_KEY
+
+# Key under CrawlerRunConfig.shared_data holding the BrowserSession a run belongs to
+SESSION_DATA_KEY = "browser_session"
+
+
+async def on_page_context_created(page: Any, context: Any = None, config: Any = None, **kwargs) -> Any:
+    """The single on_page_context_created hook; crawl4ai keeps one callable per hook name"""
+    shared = getattr(config, "shared_data", None) or {}
+    session = shared.get(SESSION_DATA_KEY)
+    if session is not None and context is not None:
+        # Remember the live context so its storage state can be snapshotted later
+        session.context = context
+    return await resource_blocking_hook(page, context=context, config=config, **kwargs)
+
+
+def _mark(name: str):
+    """Hook that timestamps a render step into the run's stage marks"""
+
+    async def hook(page: Any, context: Any = None, config: Any = None, **kwargs) -> Any:
+        marks = (getattr(config, "shared_data", None) or {}).get(MARKS_DATA_KEY)
+        if marks is not None:
+            marks[name] = time.monotonic()
+        return page
+
+    return hook
+
+
+async def before_retrieve_html(page: Any, context: Any = None, config: Any = None, **kwargs) -> Any:
+    """Run the request's interaction steps on the loaded page, before its HTML is read"""
+    run = (getattr(config, "shared_data", None) or {}).get(INTERACTIONS_DATA_KEY)
+    if run is not None:
+        await interaction_engine.run(page, run)
+    return page
+
+
+def install_hooks(crawler: Any) -> None:
+    """Register the page hooks once per crawler"""
+    if getattr(crawler, "_page_hooks_installed", False):
+        return
+    strategy = crawler.crawler_strategy
+    strategy.set_hook("on_page_context_created", on_page_context_created)
+    for name in ("before_goto", "after_goto", "before_return_html"):
+        strategy.set_hook(name, _mark(name))
+    strategy.set_hook("before_retrieve_html", before_retrieve_html)
+    crawler._page_hooks_installed = True
@@ -0,0 +1,102 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import json
+
+from pydantic import BaseModel
+
+from app.models.requests import ResponseShape
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the stdlib encoder
+    orjson = None
+
+# List fields cut by each limit, with the detail list that mirrors them
+_LIST_LIMITS = (("max_links", ("links", "link_details")), ("max_images", ("images", "image_details")))
+
+
+def dumps(data: Any) -> bytes:
+    """Compact JSON for plain dicts and lists"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads(raw: str) -> Any:
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def is_full(shape: Optional[ResponseShape]) -> bool:
+    """True when the shape asks for the whole, untruncated result"""
+    return shape is None or (
+        shape.fields is None
+        and shape.max_markdown_chars is None
+        and shape.max_links is None
+        and shape.max_images is None
+    )
+
+
+def selected_fields(shape: ResponseShape) -> Optional[Set[str]]:
+    if shape.fields is None:
+        return None
+    return {"url", *shape.fields.split(",")}
+
+
+def shape_dict(data: Dict[str, Any], shape: ResponseShape) -> Dict[str, Any]:
+    """Apply field selection and truncation to one JSON-ready result"""
+    fields = selected_fields(shape)
+    if fields is not None:
+        data = {key: value for key, value in data.items() if key in fields}
+    truncated: Dict[str, int] = dict(data.get("truncated") or {})
+    limit = shape.max_markdown_chars
+    markdown = data.get("markdown")
+    if limit is not None and isinstance(markdown, str) and len(markdown) > limit:
+        truncated["markdown"] = len(markdown)
+        data["markdown"] = markdown[:limit]
+    for option, keys in _LIST_LIMITS:
+        limit = getattr(shape, option)
+        if limit is None:
+            continue
+        for key in keys:
+            values = data.get(key)
+            if isinstance(values, list) and len(values) > limit:
+                truncated[key] = len(values)
+                data[key] = values[:limit]
+    if truncated:
+        data["truncated"] = truncated
+    return data
+
+
+def encode_model(model: BaseModel, shape: Optional[ResponseShape] = None) -> bytes:
+    """JSON for a result model.
+
+    The full result goes through pydantic's own encoder. A shaped result is
+    dumped with only the selected fields and encoded with orjson.
+    """
+    if is_full(shape):
+        return model.model_dump_json().encode("utf-8")
+    fields = selected_fields(shape)
+    return dumps(shape_dict(model.model_dump(mode="json", include=fields), shape))
+
+
+def encode_json(raw: str, shape: Optional[ResponseShape] = None) -> bytes:
+    """Re-shape a stored JSON result; stored bytes are passed through untouched when nothing is cut"""
+    if is_full(shape):
+        return raw.encode("utf-8")
+    return dumps(shape_dict(loads(raw), shape))
+
+
+def join_json(items: Iterable[bytes]) -> bytes:
+    """A JSON array from already encoded elements, without parsing them again"""
+    return b"[" + b",".join(items) + b"]"
+
+
+def encode_results_page(header: Dict[str, Any], rows: List[Tuple[bool, str]], shape: Optional[ResponseShape] = None) -> bytes:
+    """A BatchResultsPage spliced together from stored (ok, result JSON) rows"""
+    succeeded = [encode_json(payload, shape) for ok, payload in rows if ok]
+    failed = [payload.encode("utf-8") for ok, payload in rows if not ok]
+    return (
+        dumps(header)[:-1]
+        + b',"successful_urls":' + join_json(succeeded)
+        + b',"failed_urls":' + join_json(failed)
+        + b"}"
+    )
@@ -0,0 +1,301 @@
+from contextlib import closing
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from app.config import settings
+from app.models.responses import ChangeSummary
+from app.services.urls import normalize_url
+
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+REMOVED = "removed"
+# Gone without ever having been indexed
+MISSING = "missing"
+# Answered with an error or block page; the stored baseline is kept
+UNAVAILABLE = "unavailable"
+# Statuses whose page carries no content to return or extract
+NO_CONTENT = (REMOVED, MISSING, UNAVAILABLE)
+
+# Statuses meaning the page is gone rather than temporarily failing
+GONE_STATUSES = (404, 410)
+
+
+def is_success(status_code: int) -> bool:
+    """Only 2xx pages are fingerprinted; anything else would poison the baseline"""
+    return 200 <= status_code < 300
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_MASK64 = (1 << 64) - 1
+
+
+def _to_signed(value: int) -> int:
+    """SQLite integers are signed 64-bit"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value & _MASK64
+
+
+# Each byte value spread into 8 counters of 32 bits, so summing table entries counts set bits per position
+_LANE_BITS = 32
+_LANE_MASK = (1 << _LANE_BITS) - 1
+_SPREAD = [sum(((b >> i) & 1) << (i * _LANE_BITS) for i in range(8)) for b in range(256)]
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """64-bit simhash over word shingles; near-identical pages differ in few bits"""
+    words = _WORD.findall(text.lower())
+    if not words:
+        return 0
+    if len(words) < shingle:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + shingle]) for i in range(len(words) - shingle + 1)]
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles)
+    half = len(shingles) / 2
+    value = 0
+    for byte in range(8):
+        counts = sum(map(_SPREAD.__getitem__, digests[byte::8]))
+        for bit in range(8):
+            if (counts >> (bit * _LANE_BITS)) & _LANE_MASK > half:
+                value |= 1 << (byte * 8 + bit)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin((a ^ b) & _MASK64).count("1")
+
+
+def content_fingerprint(markdown: str) -> Tuple[bytes, int]:
+    """(exact hash of whitespace-normalized content, simhash); module-level for the executor"""
+    normalized = " ".join(markdown.split())
+    return hashlib.sha256(normalized.encode("utf-8")).digest()[:16], simhash(normalized)
+
+
+class FingerprintRecord:
+    __slots__ = ("content_hash", "simhash", "etag", "last_modified", "crawled_at", "status_code")
+
+    def __init__(
+        self,
+        content_hash: bytes,
+        simhash: int,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        crawled_at: float,
+        status_code: Optional[int] = None,
+    ):
+        self.content_hash = content_hash
+        self.simhash = simhash
+        self.etag = etag
+        self.last_modified = last_modified
+        self.crawled_at = crawled_at
+        self.status_code = status_code
+
+    def can_revalidate(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+class FingerprintIndex:
+    """Per-URL fingerprints for incremental recrawls, compact enough for millions of URLs.
+
+    Rows are keyed by a 16-byte hash of (namespace, normalized URL) in a
+    WITHOUT ROWID table, so no URL strings are stored. Methods are blocking;
+    async callers go through ``asyncio.to_thread``.
+    """
+
+    def __init__(self, path: str = settings.recrawl_index_path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    url_key BLOB PRIMARY KEY,
+                    content_hash BLOB NOT NULL,
+                    simhash INTEGER NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    crawled_at REAL NOT NULL,
+                    status_code INTEGER
+                ) WITHOUT ROWID
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def url_key(namespace: str, url: str) -> bytes:
+        return hashlib.sha256(f"{namespace}\0{normalize_url(url)}".encode("utf-8")).digest()[:16]
+
+    def get_many(self, namespace: str, urls: Iterable[str]) -> Dict[str, FingerprintRecord]:
+        """Records for the given URLs, looked up in chunks under SQLite's variable limit"""
+        keys = {self.url_key(namespace, url): url for url in urls}
+        found: Dict[str, FingerprintRecord] = {}
+        key_list = list(keys)
+        with closing(self._connect()) as conn:
+            for start in range(0, len(key_list), 500):
+                chunk = key_list[start:start + 500]
+                rows = conn.execute(
+                    "SELECT url_key, content_hash, simhash, etag, last_modified, crawled_at, status_code "
+                    f"FROM fingerprints WHERE url_key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for row in rows:
+                    found[keys[bytes(row[0])]] = FingerprintRecord(
+                        bytes(row[1]), _to_unsigned(row[2]), row[3], row[4], row[5], row[6]
+                    )
+        return found
+
+    def apply(
+        self,
+        namespace: str,
+        puts: List[Tuple[str, FingerprintRecord]],
+        touches: List[str],
+        deletes: List[str],
+        crawled_at: float,
+    ) -> None:
+        """Write one batch of updates in a single transaction"""
+        if not (puts or touches or deletes):
+            return
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR REPLACE INTO fingerprints "
+                "(url_key, content_hash, simhash, etag, last_modified, crawled_at, status_code) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        self.url_key(namespace, url),
+                        r.content_hash,
+                        _to_signed(r.simhash),
+                        r.etag,
+                        r.last_modified,
+                        r.crawled_at,
+                        r.status_code,
+                    )
+                    for url, r in puts
+                ],
+            )
+            conn.executemany(
+                "UPDATE fingerprints SET crawled_at = ? WHERE url_key = ?",
+                [(crawled_at, self.url_key(namespace, url)) for url in touches],
+            )
+            conn.executemany(
+                "DELETE FROM fingerprints WHERE url_key = ?",
+                [(self.url_key(namespace, url),) for url in deletes],
+            )
+            conn.execute("COMMIT")
+
+    def stats(self) -> Dict[str, Any]:
+        with closing(self._connect()) as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {"entries": entries, "bytes": size}
+
+
+class ChangeTracker:
+    """Classifies the pages of one incremental batch against the fingerprint index.
+
+    Records are loaded up front in one query; updates are buffered and written
+    in transactions by ``flush``. Pages within ``threshold`` simhash bits of
+    the stored fingerprint count as unchanged and keep the stored fingerprint
+    as baseline, so slow drift still adds up to a change eventually.
+    """
+
+    def __init__(self, index: FingerprintIndex, namespace: str, threshold: int, flush_every: int = 200):
+        self.index = index
+        self.namespace = namespace
+        self.threshold = threshold
+        self.flush_every = flush_every
+        self.records: Dict[str, FingerprintRecord] = {}
+        self.summary = ChangeSummary()
+        self._puts: List[Tuple[str, FingerprintRecord]] = []
+        self._touches: List[str] = []
+        self._deletes: List[str] = []
+
+    async def load(self, urls: List[str]) -> None:
+        self.records = await asyncio.to_thread(self.index.get_many, self.namespace, urls)
+
+    def validators(self, url: str) -> Optional[FingerprintRecord]:
+        """Stored record when the page can be revalidated with a conditional request"""
+        record = self.records.get(url)
+        return record if record is not None and record.can_revalidate() else None
+
+    def not_modified(self, url: str) -> None:
+        self.summary.not_modified += 1
+        self._touches.append(url)
+
+    def classify(
+        self,
+        url: str,
+        status_code: int,
+        headers: Dict[str, str],
+        fingerprint: Optional[Tuple[bytes, int]],
+    ) -> Tuple[Optional[str], Optional[float]]:
+        """(change status, similarity to the stored version); fingerprint is None for non-2xx pages"""
+        previous = self.records.get(url)
+        if status_code in GONE_STATUSES:
+            if previous is None:
+                self.summary.missing += 1
+                return MISSING, None
+            self.summary.removed += 1
+            self._deletes.append(url)
+            return REMOVED, None
+        if not is_success(status_code) or fingerprint is None:
+            self.summary.unavailable += 1
+            return UNAVAILABLE, None
+
+        lowered = {k.lower(): v for k, v in headers.items()}
+        content_hash, fingerprint_simhash = fingerprint
+        record = FingerprintRecord(
+            content_hash,
+            fingerprint_simhash,
+            lowered.get("etag"),
+            lowered.get("last-modified"),
+            time.time(),
+            status_code,
+        )
+        if previous is None:
+            self.summary.new += 1
+            self._puts.append((url, record))
+            return NEW, None
+
+        distance = 0 if content_hash == previous.content_hash else hamming(fingerprint_simhash, previous.simhash)
+        similarity = 1 - distance / 64
+        if distance <= self.threshold:
+            self.summary.unchanged += 1
+            record.content_hash, record.simhash = previous.content_hash, previous.simhash
+            self._puts.append((url, record))
+            return UNCHANGED, similarity
+        self.summary.changed += 1
+        self._puts.append((url, record))
+        return CHANGED, similarity
+
+    def pending(self) -> int:
+        return len(self._puts) + len(self._touches) + len(self._deletes)
+
+    async def flush(self, force: bool = False) -> None:
+        if not force and self.pending() < self.flush_every:
+            return
+        # Swap the buffers on the loop thread so nothing appended meanwhile is lost
+        puts, self._puts = self._puts, []
+        touches, self._touches = self._touches, []
+        deletes, self._deletes = self._deletes, []
+        await asyncio.to_thread(self.index.apply, self.namespace, puts, touches, deletes, time.time())
+
+
+fingerprint_index = FingerprintIndex()
@@ -0,0 +1,147 @@
+from typing import Optional
+import asyncio
+import random
+
+from app.config import settings
+from app.models.requests import RetryConfig
+
+# Substrings of browser/network errors that will not succeed on a retry
+_FATAL_MARKERS = (
+    "err_name_not_resolved",
+    "err_name_resolution_failed",
+    "getaddrinfo",
+    "name or service not known",
+    "err_invalid_url",
+    "invalid url",
+    "err_unknown_url_scheme",
+    "err_cert_",
+    "err_ssl_",
+    "err_blocked_by_client",
+    "err_too_many_redirects",
+    "err_file_not_found",
+)
+
+# Substrings of transient failures worth another attempt
+_RETRYABLE_MARKERS = (
+    "timeout",
+    "timed out",
+    "err_timed_out",
+    "err_connection_reset",
+    "err_connection_closed",
+    "err_connection_refused",
+    "err_connection_aborted",
+    "err_empty_response",
+    "err_network_changed",
+    "err_http2_protocol_error",
+    "target closed",
+    "browser has been closed",
+)
+
+
+class CrawlError(Exception):
+    """A failed crawl attempt, classified for the retry policy"""
+
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        retryable: bool = False,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.attempt_count = 1
+        self.elapsed_seconds: Optional[float] = None
+
+
+def is_retryable_status(status_code: Optional[int]) -> bool:
+    """408/425/429 and 5xx are transient; every other 4xx is the client's problem"""
+    if status_code is None:
+        return False
+    return status_code in (408, 425, 429) or 500 <= status_code < 600
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Classify an exception from a crawl attempt"""
+    if isinstance(exc, CrawlError):
+        return exc.retryable
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(exc, (ValueError, TypeError)):
+        return False
+    message = str(exc).lower()
+    if any(marker in message for marker in _FATAL_MARKERS):
+        return False
+    return any(marker in message for marker in _RETRYABLE_MARKERS)
+
+
+def classify_failure(message: str, status_code: Optional[int] = None) -> bool:
+    """Whether a failed crawl result (not an exception) is worth retrying"""
+    lowered = (message or "").lower()
+    if any(marker in lowered for marker in _FATAL_MARKERS):
+        return False
+    if is_retryable_status(status_code):
+        return True
+    if status_code is not None and 400 <= status_code < 500:
+        return False
+    return any(marker in lowered for marker in _RETRYABLE_MARKERS)
+
+
+class RetryPolicy:
+    """Backoff schedule derived from a request's RetryConfig, with full jitter"""
+
+    def __init__(self, config: Optional[RetryConfig] = None):
+        config = config or RetryConfig()
+        self.max_attempts = max(1, config.max_attempts)
+        self.min_delay = max(0.0, config.min_delay)
+        self.max_delay = max(self.min_delay, config.max_delay)
+        self.exponential = config.exponential
+        self.defer_retries = config.defer_retries
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait after the given (1-based) failed attempt"""
+        if self.exponential:
+            ceiling = min(self.max_delay, self.min_delay * (2 ** (attempt - 1)))
+        else:
+            ceiling = self.min_delay
+        delay = random.uniform(self.min_delay, max(self.min_delay, ceiling))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class RetryBudget:
+    """Caps retries to a fraction of first attempts, so one failing host cannot
+    turn a batch into a wall of backoff sleeps.
+
+    Every first attempt deposits ``ratio`` tokens and every retry withdraws one;
+    ``min_retries`` tokens are available up front. Long-lived budgets set
+    ``max_tokens`` so quiet periods cannot bank unlimited retries.
+    """
+
+    def __init__(
+        self,
+        ratio: float = settings.retry_budget_ratio,
+        min_retries: int = settings.retry_budget_min,
+        max_tokens: Optional[float] = None,
+    ):
+        self.ratio = ratio
+        self.tokens = float(min_retries)
+        self.max_tokens = max_tokens
+        self.retries = 0
+        self.exhausted = 0
+
+    def record_attempt(self) -> None:
+        self.tokens += self.ratio
+        if self.max_tokens is not None:
+            self.tokens = min(self.tokens, self.max_tokens)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.retries += 1
+            return True
+        self.exhausted += 1
+        return False
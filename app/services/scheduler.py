@@ -0,0 +1,191 @@
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Optional
+import asyncio
+import time
+
+from app.config import settings
+from app.services import metrics
+from app.services.urls import host_of
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class HostState:
+    def __init__(self, limit: float, min_delay: float):
+        self.limit = limit
+        self.min_delay = min_delay
+        self.active = 0
+        self.next_allowed_at = 0.0
+        # Per fetch tier, since a plain GET and a browser render of one host differ by an order of magnitude
+        self.latency_ewma: Dict[str, float] = {}
+        self.latency_floor: Dict[str, float] = {}
+        self.successes = 0
+        self.throttles = 0
+        self.errors = 0
+        self.condition = asyncio.Condition()
+
+
+class HostScheduler:
+    """Per-host politeness with AIMD concurrency limits, shared by every batch in the process.
+
+    Each host starts at ``initial_host_limit`` concurrent requests. A healthy
+    response adds ``1 / limit`` (about +1 per round trip), while a 429, 5xx,
+    error or a latency spike above ``latency_factor`` times the best observed
+    latency of the same fetch tier halves it. ``Retry-After`` pushes the host's next start time out.
+    """
+
+    def __init__(
+        self,
+        initial_host_limit: int = settings.scheduler_initial_host_limit,
+        max_host_limit: int = settings.scheduler_max_host_limit,
+        min_host_delay: float = settings.scheduler_min_host_delay,
+        latency_factor: float = settings.scheduler_latency_factor,
+        max_tracked_hosts: int = 10000,
+    ):
+        self.initial_host_limit = max(1, initial_host_limit)
+        self.max_host_limit = max(self.initial_host_limit, max_host_limit)
+        self.min_host_delay = min_host_delay
+        self.latency_factor = latency_factor
+        self.max_tracked_hosts = max_tracked_hosts
+        self._hosts: Dict[str, HostState] = {}
+        # Requests waiting for a host slot, its politeness delay or the caller's global limit
+        self.waiting = 0
+
+    def _host(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            if len(self._hosts) >= self.max_tracked_hosts:
+                self._prune()
+            state = HostState(self.initial_host_limit, self.min_host_delay)
+            self._hosts[host] = state
+        return state
+
+    def _prune(self) -> None:
+        """Forget idle hosts that are not backing off; waiters imply active > 0"""
+        now = time.monotonic()
+        for host in [h for h, s in self._hosts.items() if s.active == 0 and s.next_allowed_at <= now]:
+            del self._hosts[host]
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        url: str,
+        global_semaphore: Optional[asyncio.Semaphore] = None,
+        host_cap: Optional[int] = None,
+        min_delay: Optional[float] = None,
+    ) -> AsyncIterator[HostState]:
+        """Hold one request slot for url's host, then a slot of the caller's global limit"""
+        state = self._host(host_of(url))
+        cap = host_cap or self.max_host_limit
+        delay_between = state.min_delay if min_delay is None else max(min_delay, state.min_delay)
+
+        queued_at = time.monotonic()
+        self.waiting += 1
+        queued = True
+        try:
+            async with state.condition:
+                await state.condition.wait_for(lambda: state.active < max(1, min(int(state.limit), cap)))
+                state.active += 1
+                now = time.monotonic()
+                start_at = max(now, state.next_allowed_at)
+                state.next_allowed_at = start_at + delay_between
+        except BaseException:
+            self.waiting -= 1
+            raise
+
+        acquired_global = False
+        try:
+            if start_at > now:
+                await asyncio.sleep(start_at - now)
+            if global_semaphore is not None:
+                await global_semaphore.acquire()
+                acquired_global = True
+            self.waiting -= 1
+            queued = False
+            metrics.observe_stage(metrics.QUEUE_WAIT, time.monotonic() - queued_at)
+            yield state
+        finally:
+            if queued:
+                self.waiting -= 1
+            if acquired_global:
+                global_semaphore.release()
+            async with state.condition:
+                state.active -= 1
+                state.condition.notify_all()
+
+    async def report(
+        self,
+        url: str,
+        latency: Optional[float],
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        error: bool = False,
+        tier: str = "browser",
+    ) -> None:
+        """Feed one observed response back into the host's AIMD limit.
+
+        ``latency`` is the fetch's own time, without queueing or retry backoff;
+        None when unknown, e.g. for a failed fetch.
+        """
+        state = self._host(host_of(url))
+        throttled = error or status_code == 429 or (status_code is not None and status_code >= 500)
+
+        slow = False
+        if not throttled and latency is not None:
+            previous = state.latency_ewma.get(tier)
+            ewma = state.latency_ewma[tier] = latency if previous is None else 0.8 * previous + 0.2 * latency
+            floor = state.latency_floor[tier] = min(state.latency_floor.get(tier, ewma), ewma)
+            slow = ewma > self.latency_factor * floor
+
+        async with state.condition:
+            if throttled or slow:
+                state.limit = max(1.0, state.limit / 2)
+                if error:
+                    state.errors += 1
+                else:
+                    state.throttles += 1
+            else:
+                state.limit = min(float(self.max_host_limit), state.limit + 1 / state.limit)
+                state.successes += 1
+            if retry_after:
+                state.next_allowed_at = max(state.next_allowed_at, time.monotonic() + retry_after)
+            state.condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "hosts": {
+                host: {
+                    "limit": round(state.limit, 2),
+                    "active": state.active,
+                    "latency_ewma_seconds": dict(state.latency_ewma),
+                    "backoff_seconds": max(0.0, state.next_allowed_at - now),
+                    "successes": state.successes,
+                    "throttles": state.throttles,
+                    "errors": state.errors,
+                }
+                for host, state in self._hosts.items()
+            },
+            "waiting": self.waiting,
+            "initial_host_limit": self.initial_host_limit,
+            "max_host_limit": self.max_host_limit,
+        }
+
+
+host_scheduler = HostScheduler()
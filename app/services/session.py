@@ -1,66 +1,558 @@
-from typing import Optional, Dict
-from app.models.requests import SessionConfig, BrowserAction, InteractionStep
-from crawl4ai import AsyncWebCrawler
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, TYPE_CHECKING
 import asyncio
+import base64
+import json
+import logging
+import os
+import re
+import time
+import uuid
+
+from app.config import settings
+from app.models.requests import SessionConfig, CreateSessionRequest
+from app.models.responses import InteractionTiming, SessionInfo
+from app.services import metrics
+from app.services.fast_mode import choose_wait_until
+from app.services.interactions import interaction_engine
+from app.services.page_hooks import SESSION_DATA_KEY, install_hooks
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil ships with crawl4ai but stay optional
+    psutil = None
+
+if TYPE_CHECKING:
+    from crawl4ai import AsyncWebCrawler
+
+logger = logging.getLogger(__name__)
+
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class SessionNotFoundError(Exception):
+    """Raised for a session id that is neither live in this worker nor persisted"""
+
+
+class SessionLimitError(Exception):
+    """Raised when every live session is busy and none can be evicted to make room"""
+
+
+class SessionLoginError(Exception):
+    """Raised when the login page or one of its interaction steps fails"""
+
+
+class BrowserSession:
+    """A named login: its storage state plus, while warm, a dedicated browser"""
+
+    def __init__(
+        self,
+        session_id: str,
+        login_url: str,
+        idle_ttl: float,
+        headers: Optional[Dict[str, str]] = None,
+        storage_state: Optional[Dict[str, Any]] = None,
+        created_at: Optional[datetime] = None,
+        last_used_at: Optional[datetime] = None,
+    ):
+        self.session_id = session_id
+        self.login_url = login_url
+        self.idle_ttl = idle_ttl
+        self.headers = headers or {}
+        self.storage_state = storage_state
+        self.created_at = created_at or datetime.utcnow()
+        self.last_used_at = last_used_at or self.created_at
+        self.last_used = time.monotonic()
+        self.crawler: Optional[AsyncWebCrawler] = None
+        # Latest Playwright context seen by the page hook, used for snapshots
+        self.context: Any = None
+        self.active = 0
+        # Set while the browser starts outside the service lock; waiters share it
+        self.launching: Optional[asyncio.Task] = None
+        # Replaced or logged out; the browser closes once in-flight crawls finish
+        self.retired = False
+        self.crawl_count = 0
+        self.dirty = False
+        self.memory_estimate_mb: Optional[float] = None
+        self.login_timings: Optional[List[InteractionTiming]] = None
+
+    @property
+    def live(self) -> bool:
+        return self.crawler is not None
+
+    def touch(self) -> None:
+        self.last_used = time.monotonic()
+        self.last_used_at = datetime.utcnow()
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "login_url": self.login_url,
+            "idle_ttl": self.idle_ttl,
+            "headers": self.headers,
+            "storage_state": self.storage_state,
+            "created_at": self.created_at.isoformat(),
+            "last_used_at": self.last_used_at.isoformat(),
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "BrowserSession":
+        return cls(
+            session_id=record["session_id"],
+            login_url=record["login_url"],
+            idle_ttl=record["idle_ttl"],
+            headers=record.get("headers"),
+            storage_state=record.get("storage_state"),
+            created_at=datetime.fromisoformat(record["created_at"]),
+            last_used_at=datetime.fromisoformat(record["last_used_at"]),
+        )
+
+    def info(self) -> SessionInfo:
+        return SessionInfo(
+            session_id=self.session_id,
+            login_url=self.login_url,
+            created_at=self.created_at,
+            last_used_at=self.last_used_at,
+            live=self.live,
+            active_crawls=self.active,
+            crawl_count=self.crawl_count,
+            memory_estimate_mb=self.memory_estimate_mb,
+            login_timings=self.login_timings,
+        )
+
+
+def _auth_headers(config: SessionConfig) -> Dict[str, str]:
+    """Authorization header for token or basic credentials; form logins use interaction steps"""
+    credentials = config.credentials
+    if not config.auth_required or credentials is None:
+        return {}
+    if credentials.token:
+        return {"Authorization": f"Bearer {credentials.token}"}
+    if credentials.username and credentials.password and not config.interaction_steps:
+        encoded = base64.b64encode(f"{credentials.username}:{credentials.password}".encode("utf-8")).decode("ascii")
+        return {"Authorization": f"Basic {encoded}"}
+    return {}
+
 
 class SessionService:
-    def __init__(self):
-        self._sessions: Dict[str, Dict] = {}
-
-    async def _handle_click(self, crawler: AsyncWebCrawler, step: InteractionStep) -> None:
-        """Handle click action"""
-        if step.selector:
-            # Implementation using Playwright's click action
-            pass
-
-    async def _handle_scroll(self, crawler: AsyncWebCrawler, step: InteractionStep) -> None:
-        """Handle scroll action"""
-        if step.value:
-            # Implementation using Playwright's scroll action
-            pass
-
-    async def _handle_type(self, crawler: AsyncWebCrawler, step: InteractionStep) -> None:
-        """Handle type action"""
-        if step.selector and step.value:
-            # Implementation using Playwright's type action
-            pass
-
-    async def _handle_submit(self, crawler: AsyncWebCrawler, step: InteractionStep) -> None:
-        """Handle form submission"""
-        if step.selector:
-            # Implementation using Playwright's form submission
-            pass
-
-    async def _handle_wait(self, crawler: AsyncWebCrawler, step: InteractionStep) -> None:
-        """Handle wait action"""
-        if step.timeout:
-            await asyncio.sleep(step.timeout / 1000)  # Convert ms to seconds
-
-    async def execute_interaction(self, crawler: AsyncWebCrawler, step: InteractionStep) -> None:
-        """Execute a single browser interaction step"""
-        action_handlers = {
-            BrowserAction.CLICK: self._handle_click,
-            BrowserAction.SCROLL: self._handle_scroll,
-            BrowserAction.TYPE: self._handle_type,
-            BrowserAction.SUBMIT: self._handle_submit,
-            BrowserAction.WAIT: self._handle_wait,
+    """Named, reusable logins.
+
+    Each live session owns one browser, seeded with the session's storage
+    state (cookies, localStorage), so its cookies never mix with pooled
+    crawls. Idle sessions are closed after their TTL, least recently used
+    first when ``max_live`` or the memory budget is reached, and snapshots
+    are written to ``store_dir`` so any worker can revive a session after a
+    restart without logging in again.
+    """
+
+    def __init__(
+        self,
+        store_dir: Optional[str] = settings.session_store_dir,
+        max_live: int = settings.session_max_live,
+        idle_ttl: float = settings.session_idle_ttl,
+        state_ttl: float = settings.session_state_ttl,
+        memory_budget_mb: Optional[int] = settings.session_memory_budget_mb,
+        sweep_interval: float = settings.session_sweep_interval,
+    ):
+        self.store_dir = store_dir
+        self.max_live = max(1, max_live)
+        self.idle_ttl = idle_ttl
+        self.state_ttl = state_ttl
+        self.memory_budget_mb = memory_budget_mb
+        self.sweep_interval = sweep_interval
+        self._sessions: Dict[str, BrowserSession] = {}
+        self._retiring: Set[BrowserSession] = set()
+        self._lock = asyncio.Lock()
+        self._sweep_task: Optional[asyncio.Task] = None
+        self._stats: Dict[str, int] = {
+            "created": 0,
+            "restored": 0,
+            "evicted": 0,
+            "expired": 0,
+            "crawls": 0,
         }
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+
+    async def setup_session(self, page: Any, config: SessionConfig) -> List[InteractionTiming]:
+        """Run a session's login steps on an open page"""
+        credentials = config.credentials if config.auth_required else None
+        return await interaction_engine.run_steps(page, config.interaction_steps, credentials)
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.store_dir, f"{session_id}.json")
+
+    def _save_record(self, record: Dict[str, Any]) -> None:
+        if not self.store_dir:
+            return
+        path = self._path(record["session_id"])
+        tmp = f"{path}.{os.getpid()}.tmp"
+        # Snapshots carry cookies and auth headers, keep them private to the service user
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp, path)
+
+    def _load_record(self, session_id: str) -> Optional[Dict[str, Any]]:
+        if not self.store_dir:
+            return None
+        try:
+            with open(self._path(session_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Unreadable session snapshot %s: %s", session_id, e)
+            return None
+
+    def _delete_record(self, session_id: str) -> bool:
+        if not self.store_dir:
+            return False
+        try:
+            os.remove(self._path(session_id))
+            return True
+        except FileNotFoundError:
+            return False
 
-        handler = action_handlers.get(step.action)
-        if handler:
-            await handler(crawler, step)
+    def _stored_ids(self) -> List[str]:
+        if not self.store_dir:
+            return []
+        return [name[:-5] for name in os.listdir(self.store_dir) if name.endswith(".json")]
 
-    async def setup_session(self, crawler: AsyncWebCrawler, config: SessionConfig) -> None:
-        """Set up a browser session with the specified configuration"""
-        if config.auth_required and config.credentials:
-            # Handle authentication
-            pass
+    def _purge_stored(self) -> int:
+        """Delete snapshots no worker has used within state_ttl"""
+        if not self.store_dir:
+            return 0
+        cutoff = time.time() - self.state_ttl
+        purged = 0
+        for session_id in self._stored_ids():
+            if session_id in self._sessions:
+                continue
+            try:
+                if os.path.getmtime(self._path(session_id)) < cutoff:
+                    os.remove(self._path(session_id))
+                    purged += 1
+            except FileNotFoundError:
+                continue
+        return purged
 
-        # Execute interaction steps in sequence
-        for step in config.interaction_steps:
-            await self.execute_interaction(crawler, step)
+    def _children_rss_mb(self) -> Optional[float]:
+        if psutil is None:
+            return None
+        total = 0
+        for child in psutil.Process().children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return total / (1024 * 1024)
 
-    def cleanup_session(self, session_id: str) -> None:
-        """Clean up session resources"""
+    def _seed_storage_state(self, session: BrowserSession) -> None:
+        """Make contexts the browser opens from now on start from the latest snapshot"""
+        if session.crawler is None:
+            return
+        session.crawler.browser_config.storage_state = session.storage_state
+        manager = getattr(session.crawler.crawler_strategy, "browser_manager", None)
+        if manager is not None and getattr(manager, "config", None) is not None:
+            manager.config.storage_state = session.storage_state
+
+    async def _launch(self, session: BrowserSession) -> None:
+        from crawl4ai import AsyncWebCrawler, BrowserConfig
+
+        before = self._children_rss_mb()
+        browser_config = BrowserConfig(
+            headless=True,
+            verbose=False,
+            storage_state=session.storage_state,
+            headers=dict(session.headers),
+        )
+        crawler = AsyncWebCrawler(config=browser_config)
+        await crawler.start()
+        metrics.count_launch("session")
+        install_hooks(crawler)
+        session.crawler = crawler
+        after = self._children_rss_mb()
+        if before is not None and after is not None:
+            session.memory_estimate_mb = max(0.0, after - before)
+
+    def _start_launch(self, session: BrowserSession) -> "asyncio.Task":
+        """Start the session's browser without holding the lock; caller holds it and has made room"""
+        async def launch() -> None:
+            try:
+                await self._launch(session)
+                if session.retired:
+                    # Logged out or replaced while the browser was starting
+                    await self._shutdown(session, persist=False)
+            finally:
+                session.launching = None
+
+        session.launching = asyncio.create_task(launch())
+        return session.launching
+
+    async def _retire(self, session: BrowserSession) -> None:
+        """Close a replaced or logged-out session's browser now, or when its last crawl finishes"""
+        session.retired = True
+        if session.active:
+            self._retiring.add(session)
+        else:
+            await self._shutdown(session, persist=False)
+
+    async def _snapshot(self, session: BrowserSession) -> None:
+        """Capture the live context's cookies and localStorage and persist them"""
+        if session.context is not None:
+            try:
+                session.storage_state = await session.context.storage_state()
+                self._seed_storage_state(session)
+            except Exception as e:
+                # The context may already be closed; keep the previous snapshot
+                logger.debug("Storage state snapshot for %s failed: %s", session.session_id, e)
+        session.dirty = False
+        try:
+            await asyncio.to_thread(self._save_record, session.to_record())
+        except OSError as e:
+            logger.warning("Could not persist session %s: %s", session.session_id, e)
+
+    async def _shutdown(self, session: BrowserSession, persist: bool = True) -> None:
+        """Close a session's browser, keeping its storage state for a later revival"""
+        if persist:
+            await self._snapshot(session)
+        crawler, session.crawler, session.context = session.crawler, None, None
+        if crawler is not None:
+            try:
+                await crawler.close()
+            except Exception as e:
+                logger.warning("Error closing session browser %s: %s", session.session_id, e)
+
+    def _over_budget(self, live: List[BrowserSession]) -> bool:
+        if len(live) >= self.max_live:
+            return True
+        if not self.memory_budget_mb:
+            return False
+        return sum(s.memory_estimate_mb or 0.0 for s in live) >= self.memory_budget_mb
+
+    async def _make_room(self) -> None:
+        """Close least recently used idle sessions until another browser fits; caller holds the lock"""
+        live = [s for s in self._sessions.values() if s.live or s.launching is not None]
+        while self._over_budget(live):
+            idle = [s for s in live if s.active == 0 and s.launching is None]
+            if not idle:
+                raise SessionLimitError(f"All {len(live)} live sessions are busy")
+            victim = min(idle, key=lambda s: s.last_used)
+            await self._shutdown(victim)
+            live.remove(victim)
+            self._stats["evicted"] += 1
+
+    async def _login(self, session: BrowserSession, config: SessionConfig) -> None:
+        from crawl4ai import CacheMode, CrawlerRunConfig
+
+        login_id = f"login-{session.session_id}"
+        run_config = CrawlerRunConfig(
+            session_id=login_id,
+            cache_mode=CacheMode.BYPASS,
+            page_timeout=config.timeout,
+            wait_until=choose_wait_until(config, False),
+            shared_data={SESSION_DATA_KEY: session},
+            verbose=False,
+        )
+        result = await session.crawler.arun(url=session.login_url, config=run_config)
+        if not getattr(result, "success", True):
+            raise SessionLoginError(getattr(result, "error_message", None) or f"Could not load {session.login_url}")
+
+        strategy = session.crawler.crawler_strategy
+        context, page, _ = strategy.browser_manager.sessions[login_id]
+        try:
+            session.login_timings = await self.setup_session(page, config)
+            session.context = context
+            session.storage_state = await context.storage_state()
+            self._seed_storage_state(session)
+        finally:
+            # Later crawls open their own pages in contexts seeded from the snapshot
+            await strategy.kill_session(login_id)
+            session.context = None
+
+    async def create_session(self, request: CreateSessionRequest) -> BrowserSession:
+        """Log in once and keep the browser warm; an existing id is logged in again"""
+        session_id = request.session_id or uuid.uuid4().hex
+        # Reject a bad step list before a browser is launched for it
+        interaction_engine.plan(str(request.login_url), request.session_config.interaction_steps)
+        session = BrowserSession(
+            session_id=session_id,
+            login_url=str(request.login_url),
+            idle_ttl=request.idle_ttl or self.idle_ttl,
+            headers=_auth_headers(request.session_config),
+        )
+        async with self._lock:
+            previous = self._sessions.pop(session_id, None)
+            if previous is not None:
+                await self._retire(previous)
+            await self._make_room()
+            self._sessions[session_id] = session
+            launch = self._start_launch(session)
+        try:
+            await asyncio.shield(launch)
+        except Exception:
+            if self._sessions.get(session_id) is session:
+                del self._sessions[session_id]
+            raise
+
+        try:
+            await self._login(session, request.session_config)
+        except Exception as e:
+            await self.close_session(session_id)
+            if isinstance(e, SessionLoginError):
+                raise
+            raise SessionLoginError(f"Login for session '{session_id}' failed: {e}") from e
+
+        await self._snapshot(session)
+        self._stats["created"] += 1
+        return session
+
+    async def exists(self, session_id: str) -> bool:
         if session_id in self._sessions:
-            del self._sessions[session_id]
+            return True
+        if not _SESSION_ID.match(session_id):
+            return False
+        return await asyncio.to_thread(self._load_record, session_id) is not None
+
+    async def _get_live(self, session_id: str) -> BrowserSession:
+        session = self._sessions.get(session_id)
+        if session is not None and session.live:
+            return session
+        if not _SESSION_ID.match(session_id):
+            raise SessionNotFoundError(f"Session '{session_id}' not found")
+
+        revived = False
+        async with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                record = await asyncio.to_thread(self._load_record, session_id)
+                if record is None:
+                    raise SessionNotFoundError(f"Session '{session_id}' not found")
+                session = BrowserSession.from_record(record)
+                self._sessions[session_id] = session
+            if not session.live and session.launching is None:
+                await self._make_room()
+                self._start_launch(session)
+                revived = True
+            launch = session.launching
+        if launch is not None:
+            await asyncio.shield(launch)
+        if not session.live:
+            # Logged out while its browser was starting
+            raise SessionNotFoundError(f"Session '{session_id}' not found")
+        if revived:
+            self._stats["restored"] += 1
+        return session
+
+    @asynccontextmanager
+    async def use(self, session_id: str) -> AsyncIterator[BrowserSession]:
+        """Borrow a session's warm browser for one crawl, reviving it from disk if needed"""
+        session = await self._get_live(session_id)
+        session.active += 1
+        session.touch()
+        try:
+            yield session
+        finally:
+            session.active -= 1
+            session.crawl_count += 1
+            session.dirty = True
+            session.touch()
+            self._stats["crawls"] += 1
+            if session.retired and session.active == 0:
+                self._retiring.discard(session)
+                await self._shutdown(session, persist=False)
+
+    async def close_session(self, session_id: str) -> bool:
+        """Log out: forget the stored state and close the browser once in-flight crawls finish"""
+        async with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            await self._retire(session)
+        deleted = _SESSION_ID.match(session_id) is not None and await asyncio.to_thread(self._delete_record, session_id)
+        return session is not None or deleted
+
+    async def get_info(self, session_id: str) -> SessionInfo:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            return session.info()
+        record = await asyncio.to_thread(self._load_record, session_id) if _SESSION_ID.match(session_id) else None
+        if record is None:
+            raise SessionNotFoundError(f"Session '{session_id}' not found")
+        return BrowserSession.from_record(record).info()
+
+    async def list_sessions(self) -> List[SessionInfo]:
+        infos = [s.info() for s in self._sessions.values()]
+        for session_id in await asyncio.to_thread(self._stored_ids):
+            if session_id not in self._sessions:
+                record = await asyncio.to_thread(self._load_record, session_id)
+                if record is not None:
+                    infos.append(BrowserSession.from_record(record).info())
+        return infos
+
+    async def sweep(self) -> None:
+        """Close idle browsers, refresh snapshots of used sessions and expire old ones"""
+        now = time.monotonic()
+        for session in list(self._sessions.values()):
+            if session.active:
+                continue
+            idle = now - session.last_used
+            if session.live and idle > session.idle_ttl:
+                async with self._lock:
+                    if session.active == 0 and session.live:
+                        await self._shutdown(session)
+                        self._stats["evicted"] += 1
+            elif session.live and session.dirty:
+                await self._snapshot(session)
+            elif not session.live and idle > self.state_ttl:
+                self._sessions.pop(session.session_id, None)
+                self._stats["expired"] += 1
+        self._stats["expired"] += await asyncio.to_thread(self._purge_stored)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.warning("Session sweep failed: %s", e)
+
+    def start(self) -> None:
+        if self._sweep_task is None and self.sweep_interval > 0:
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def close(self) -> None:
+        """Persist and close every live session; snapshots stay on disk for the next start"""
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
+        for session in list(self._sessions.values()) + list(self._retiring):
+            if session.launching is not None:
+                try:
+                    await asyncio.shield(session.launching)
+                except Exception:
+                    continue
+            if session.live:
+                await self._shutdown(session, persist=not session.retired)
+        self._sessions.clear()
+        self._retiring.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        live = [s for s in self._sessions.values() if s.live]
+        return {
+            "known": len(self._sessions),
+            "live": len(live),
+            "max_live": self.max_live,
+            "retiring": len(self._retiring),
+            "active_crawls": sum(s.active for s in live),
+            "memory_estimate_mb": sum(s.memory_estimate_mb or 0.0 for s in live),
+            "memory_budget_mb": self.memory_budget_mb,
+            **self._stats,
+        }
+
+
+session_service = SessionService()
@@ -0,0 +1,349 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+import asyncio
+import gzip
+import logging
+import os
+import tempfile
+
+from app.config import settings
+from app.models.requests import SinkConfig
+from app.models.responses import BatchMetadata, SinkFile, SinkManifest, URLError, URLResult
+from app.services.payload import dumps
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstd files need zstandard
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:  # pragma: no cover - Parquet files need pyarrow
+    pyarrow = None
+    parquet = None
+
+try:
+    import boto3
+except ImportError:  # pragma: no cover - s3:// sinks need boto3
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+_JSONL_SUFFIXES = {"zstd": ".jsonl.zst", "gzip": ".jsonl.gz", "none": ".jsonl"}
+
+
+class SinkError(Exception):
+    """Raised for a sink this server cannot write"""
+
+
+def resolve_compression(config: SinkConfig) -> str:
+    if config.compression is not None:
+        return config.compression
+    return "zstd" if config.format == "parquet" or zstandard is not None else "gzip"
+
+
+def check_sink(config: SinkConfig) -> None:
+    """Reject a sink before its job is queued rather than when the job runs"""
+    if config.format == "parquet" and pyarrow is None:
+        raise SinkError("Parquet output needs pyarrow, which is not installed on this server")
+    if config.format == "jsonl" and resolve_compression(config) == "zstd" and zstandard is None:
+        raise SinkError("zstd compression needs zstandard, which is not installed on this server")
+    if settings.sink_uri.startswith("s3://") and boto3 is None:
+        raise SinkError("The configured s3:// sink needs boto3, which is not installed on this server")
+
+
+class LocalStore:
+    """Sink files under a local directory; also the stand-in for object storage in tests"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        # Parts are written next to their destination so finishing one is a rename
+        self.spool_dir = os.path.join(self.root, ".incoming")
+
+    def uri(self, key: str) -> str:
+        return "file://" + os.path.join(self.root, key)
+
+    def put(self, path: str, key: str) -> str:
+        destination = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(path, destination)
+        return self.uri(key)
+
+    def put_bytes(self, data: bytes, key: str) -> str:
+        destination = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        with open(destination + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(destination + ".tmp", destination)
+        return self.uri(key)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(os.path.join(self.root, key))
+        except FileNotFoundError:
+            pass
+
+
+class S3Store:
+    """Sink files in an S3-compatible bucket under an optional key prefix"""
+
+    def __init__(self, bucket: str, prefix: str, endpoint_url: Optional[str], region: Optional[str]):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.spool_dir = settings.sink_spool_dir or tempfile.gettempdir()
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def uri(self, key: str) -> str:
+        return f"s3://{self.bucket}/{self._key(key)}"
+
+    def put(self, path: str, key: str) -> str:
+        # upload_file switches to multipart uploads for large parts
+        try:
+            self.client.upload_file(path, self.bucket, self._key(key))
+        finally:
+            os.remove(path)
+        return self.uri(key)
+
+    def put_bytes(self, data: bytes, key: str) -> str:
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data, ContentType="application/json")
+        return self.uri(key)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+Store = Union[LocalStore, S3Store]
+
+
+def open_store(uri: str) -> Store:
+    if uri.startswith("s3://"):
+        if boto3 is None:
+            raise SinkError("The configured s3:// sink needs boto3, which is not installed on this server")
+        bucket, _, prefix = uri[len("s3://"):].partition("/")
+        return S3Store(bucket, prefix.strip("/"), settings.sink_s3_endpoint_url, settings.sink_s3_region)
+    return LocalStore(uri[len("file://"):] if uri.startswith("file://") else uri)
+
+
+class _JSONLFile:
+    """One JSONL part, compressed as a single gzip member or zstd frame"""
+
+    def __init__(self, path: str, compression: str):
+        self._raw = open(path, "wb")
+        if compression == "gzip":
+            self._out = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=6, mtime=0)
+        elif compression == "zstd":
+            self._out = zstandard.ZstdCompressor(level=3).stream_writer(self._raw, closefd=False)
+        else:
+            self._out = self._raw
+
+    def write(self, records: List[bytes]) -> None:
+        self._out.write(b"".join(records))
+
+    def size(self) -> int:
+        return self._raw.tell()
+
+    def close(self) -> None:
+        if self._out is not self._raw:
+            self._out.close()
+        self._raw.close()
+
+
+def _parquet_schema() -> Any:
+    return pyarrow.schema([
+        ("url", pyarrow.string()),
+        ("ok", pyarrow.bool_()),
+        ("status_code", pyarrow.int32()),
+        ("markdown", pyarrow.string()),
+        ("links", pyarrow.list_(pyarrow.string())),
+        ("images", pyarrow.list_(pyarrow.string())),
+        ("metadata", pyarrow.string()),
+        ("extracted_content", pyarrow.string()),
+        ("error", pyarrow.string()),
+    ])
+
+
+class _ParquetFile:
+    """One Parquet part; every flush becomes a row group"""
+
+    def __init__(self, path: str, compression: str):
+        self._path = path
+        self._schema = _parquet_schema()
+        self._writer = parquet.ParquetWriter(path, self._schema, compression=compression)
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        self._writer.write_table(pyarrow.Table.from_pylist(records, schema=self._schema))
+
+    def size(self) -> int:
+        return os.path.getsize(self._path)
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def jsonl_record(item: Union[URLResult, URLError]) -> bytes:
+    """The same envelope as a line of the NDJSON batch stream"""
+    kind = b"result" if isinstance(item, URLResult) else b"error"
+    return b'{"type":"' + kind + b'","data":' + item.model_dump_json().encode("utf-8") + b"}\n"
+
+
+def parquet_record(item: Union[URLResult, URLError]) -> Dict[str, Any]:
+    if isinstance(item, URLResult):
+        return {
+            "url": str(item.url),
+            "ok": True,
+            "status_code": item.metadata.status_code,
+            "markdown": item.markdown,
+            "links": item.links,
+            "images": item.images,
+            "metadata": item.model_dump_json(include={"metadata", "change_status", "similarity", "extraction_error"}),
+            "extracted_content": item.extracted_content.model_dump_json() if item.extracted_content else None,
+            "error": None,
+        }
+    return {
+        "url": str(item.url),
+        "ok": False,
+        "status_code": item.status_code,
+        "markdown": None,
+        "links": None,
+        "images": None,
+        "metadata": item.model_dump_json(exclude={"url", "error", "status_code"}),
+        "extracted_content": None,
+        "error": item.error,
+    }
+
+
+def _record_size(record: Dict[str, Any]) -> int:
+    """Rough in-memory size of a Parquet row, for deciding when to flush"""
+    return sum(len(value) for value in (record["markdown"], record["metadata"], record["error"]) if value) + 64 * len(record["links"] or ())
+
+
+class ResultSink:
+    """Buffered writer of one job's results into rolling part files.
+
+    Results are encoded as they arrive and buffered until ``sink_buffer_bytes``;
+    each flush is one bulk write in a worker thread. A part that grows past
+    ``max_file_mb`` is closed and handed to the store, so memory holds at most
+    one buffer no matter how large the batch is.
+    """
+
+    def __init__(self, job_id: str, config: SinkConfig, store: Optional[Store] = None):
+        check_sink(config)
+        self.job_id = job_id
+        self.format = config.format
+        self.compression = resolve_compression(config)
+        self.max_file_bytes = min(config.max_file_mb or settings.sink_max_file_mb, settings.sink_max_file_mb) * 1024 * 1024
+        self.store = store or open_store(settings.sink_uri)
+        self.files: List[SinkFile] = []
+        self.succeeded = 0
+        self.failed = 0
+        self._keys: List[str] = []
+        self._buffer: List[Any] = []
+        self._buffered = 0
+        self._file: Optional[Union[_JSONLFile, _ParquetFile]] = None
+        self._path: Optional[str] = None
+        self._part_records = 0
+
+    def _part_key(self) -> str:
+        suffix = ".parquet" if self.format == "parquet" else _JSONL_SUFFIXES[self.compression]
+        return f"{self.job_id}/part-{len(self.files):05d}{suffix}"
+
+    async def write(self, item: Union[URLResult, URLError]) -> None:
+        if isinstance(item, URLResult):
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        if self.format == "parquet":
+            record = parquet_record(item)
+            self._buffered += _record_size(record)
+        else:
+            record = jsonl_record(item)
+            self._buffered += len(record)
+        self._buffer.append(record)
+        if self._buffered >= settings.sink_buffer_bytes:
+            await self._flush()
+
+    def _write_records(self, records: List[Any]) -> int:
+        if self._file is None:
+            os.makedirs(self.store.spool_dir, exist_ok=True)
+            fd, self._path = tempfile.mkstemp(prefix=f"{self.job_id}-", dir=self.store.spool_dir)
+            os.close(fd)
+            opener = _ParquetFile if self.format == "parquet" else _JSONLFile
+            self._file = opener(self._path, self.compression)
+            self._part_records = 0
+        self._file.write(records)
+        self._part_records += len(records)
+        return self._file.size()
+
+    async def _flush(self) -> None:
+        if not self._buffer:
+            return
+        records, self._buffer, self._buffered = self._buffer, [], 0
+        size = await asyncio.to_thread(self._write_records, records)
+        if size >= self.max_file_bytes:
+            await self._roll()
+
+    def _commit_part(self, key: str) -> Tuple[str, int]:
+        self._file.close()
+        size = os.path.getsize(self._path)
+        return self.store.put(self._path, key), size
+
+    async def _roll(self) -> None:
+        """Close the open part and hand it to the store"""
+        if self._file is None:
+            return
+        key = self._part_key()
+        uri, size = await asyncio.to_thread(self._commit_part, key)
+        self.files.append(SinkFile(uri=uri, records=self._part_records, bytes=size))
+        self._keys.append(key)
+        self._file = None
+        self._path = None
+
+    async def close(self, metadata: Optional[BatchMetadata]) -> SinkManifest:
+        """Write out the last part and the manifest that lists every part"""
+        await self._flush()
+        await self._roll()
+        key = f"{self.job_id}/{MANIFEST_NAME}"
+        manifest = SinkManifest(
+            manifest_uri=self.store.uri(key),
+            format=self.format,
+            compression=self.compression,
+            records=self.succeeded + self.failed,
+            succeeded=self.succeeded,
+            failed=self.failed,
+            files=self.files,
+        )
+        document = {
+            "job_id": self.job_id,
+            "created_at": datetime.utcnow().isoformat(),
+            **manifest.model_dump(mode="json"),
+            "metadata": metadata.model_dump(mode="json") if metadata else None,
+        }
+        await asyncio.to_thread(self.store.put_bytes, dumps(document), key)
+        return manifest
+
+    def _discard(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+            self._file = None
+        for key in self._keys:
+            try:
+                self.store.delete(key)
+            except Exception:
+                logger.warning("Could not delete sink part %s", self.store.uri(key), exc_info=True)
+
+    async def abort(self) -> None:
+        """Drop the open part and every part already stored, e.g. for a failed or cancelled job"""
+        self._buffer = []
+        await asyncio.to_thread(self._discard)
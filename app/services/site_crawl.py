@@ -0,0 +1,381 @@
+from contextlib import closing
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+import asyncio
+import html
+import logging
+import re
+import sqlite3
+import time
+
+from app.config import settings
+from app.models.requests import BaseCrawlRequest, SiteCrawlRequest
+from app.models.responses import SiteCrawlSummary, SitePage, URLError, URLResult
+from app.services.crawler import CrawlerService
+from app.services.frontier import BloomFilter, CrawlScope, Frontier, priority, url_key
+from app.services.http_fetch import HTTPFetcher, http_fetcher
+from app.services.retry import CrawlError, RetryBudget
+from app.services.urls import host_of
+
+logger = logging.getLogger(__name__)
+
+_LOC = re.compile(r"<loc>\s*(.*?)\s*</loc>", re.IGNORECASE | re.DOTALL)
+_ROBOTS_SITEMAP = re.compile(r"^\s*sitemap\s*:\s*(\S+)", re.IGNORECASE | re.MULTILINE)
+
+# Nested sitemap documents fetched per crawl, on top of the URL cap
+_MAX_SITEMAP_DOCUMENTS = 50
+
+FrontierRow = Tuple[int, str, int, int, Optional[str]]
+
+
+class SiteCrawlStore:
+    """Frontier, crawled pages and counters of site crawl jobs, in the job database.
+
+    Every finished page is written in one transaction together with the links
+    it queued, so the stored frontier is always a consistent checkpoint: a
+    restarted job reloads it and re-crawls only pages that were in flight.
+    Methods are blocking; async callers go through ``asyncio.to_thread``.
+    """
+
+    def __init__(self, path: str = settings.job_db_path):
+        self.path = path
+        with closing(self._connect()) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS site_frontier (
+                    job_id TEXT NOT NULL,
+                    url_key INTEGER NOT NULL,
+                    url TEXT NOT NULL,
+                    depth INTEGER NOT NULL,
+                    priority INTEGER NOT NULL,
+                    parent_url TEXT,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (job_id, url_key)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS site_pages (
+                    job_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    depth INTEGER NOT NULL,
+                    parent_url TEXT,
+                    ok INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (job_id, seq)
+                )
+                """
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS site_state (job_id TEXT PRIMARY KEY, summary TEXT NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def load(self, job_id: str) -> Optional[Tuple[SiteCrawlSummary, List[FrontierRow], List[int]]]:
+        """(summary, queued rows, keys of every URL seen) of a started job, or None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT summary FROM site_state WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            queued = conn.execute(
+                "SELECT url_key, url, depth, priority, parent_url FROM site_frontier WHERE job_id = ? AND done = 0",
+                (job_id,),
+            ).fetchall()
+            seen = [r[0] for r in conn.execute("SELECT url_key FROM site_frontier WHERE job_id = ?", (job_id,))]
+        return SiteCrawlSummary.model_validate_json(row[0]), queued, seen
+
+    def _save(self, conn: sqlite3.Connection, job_id: str, summary: SiteCrawlSummary, rows: List[FrontierRow]) -> None:
+        conn.executemany(
+            "INSERT OR IGNORE INTO site_frontier (job_id, url_key, url, depth, priority, parent_url) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(job_id, *r) for r in rows],
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO site_state (job_id, summary) VALUES (?, ?)",
+            (job_id, summary.model_dump_json()),
+        )
+
+    def seed(self, job_id: str, summary: SiteCrawlSummary, rows: List[FrontierRow]) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._save(conn, job_id, summary, rows)
+            conn.execute("COMMIT")
+
+    def record_page(
+        self,
+        job_id: str,
+        url: str,
+        depth: int,
+        parent_url: Optional[str],
+        item: Union[URLResult, URLError],
+        summary: SiteCrawlSummary,
+        rows: List[FrontierRow],
+    ) -> None:
+        """Store a crawled page, mark it done and queue its links in one transaction"""
+        seq = summary.pages_crawled + summary.pages_failed
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO site_pages (job_id, seq, depth, parent_url, ok, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, seq, depth, parent_url, int(isinstance(item, URLResult)), item.model_dump_json()),
+            )
+            conn.execute(
+                "UPDATE site_frontier SET done = 1 WHERE job_id = ? AND url_key = ?", (job_id, url_key(url))
+            )
+            self._save(conn, job_id, summary, rows)
+            conn.execute("COMMIT")
+
+    def finish(self, job_id: str) -> None:
+        """Drop the frontier of a finished job; pages stay until the job expires"""
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM site_frontier WHERE job_id = ?", (job_id,))
+
+    def pages(self, job_id: str, offset: int, limit: int) -> Tuple[int, List[SitePage]]:
+        with closing(self._connect()) as conn:
+            total = conn.execute("SELECT COUNT(*) FROM site_pages WHERE job_id = ?", (job_id,)).fetchone()[0]
+            rows = conn.execute(
+                "SELECT depth, parent_url, ok, payload FROM site_pages WHERE job_id = ? ORDER BY seq LIMIT ? OFFSET ?",
+                (job_id, limit, offset),
+            ).fetchall()
+        pages = []
+        for depth, parent_url, ok, payload in rows:
+            item = URLResult.model_validate_json(payload) if ok else URLError.model_validate_json(payload)
+            pages.append(SitePage(
+                url=item.url,
+                depth=depth,
+                parent_url=parent_url,
+                result=item if ok else None,
+                error=None if ok else item,
+            ))
+        return total, pages
+
+    def purge_orphans(self) -> int:
+        """Delete state of jobs that expired from the job table"""
+        removed = 0
+        with closing(self._connect()) as conn:
+            for table in ("site_frontier", "site_pages", "site_state"):
+                cursor = conn.execute(f"DELETE FROM {table} WHERE job_id NOT IN (SELECT job_id FROM jobs)")
+                removed += cursor.rowcount
+        return removed
+
+
+async def discover_sitemap_urls(
+    fetcher: HTTPFetcher,
+    origins: List[str],
+    max_urls: int = settings.site_crawl_sitemap_max_urls,
+) -> List[str]:
+    """Page URLs listed in the sitemaps of origins, found via robots.txt or /sitemap.xml"""
+    pending: List[str] = []
+    for origin in origins:
+        try:
+            robots = await fetcher.fetch(f"{origin}/robots.txt")
+            listed = _ROBOTS_SITEMAP.findall(robots.body) if robots.status_code == 200 else []
+        except CrawlError:
+            listed = []
+        pending.extend(listed or [f"{origin}/sitemap.xml"])
+
+    urls: List[str] = []
+    fetched = set()
+    while pending and len(fetched) < _MAX_SITEMAP_DOCUMENTS and len(urls) < max_urls:
+        sitemap_url = pending.pop(0)
+        if sitemap_url in fetched:
+            continue
+        fetched.add(sitemap_url)
+        try:
+            page = await fetcher.fetch(sitemap_url)
+        except CrawlError as e:
+            logger.debug("Sitemap %s failed: %s", sitemap_url, e)
+            continue
+        if page.status_code != 200:
+            continue
+        locs = [html.unescape(loc) for loc in _LOC.findall(page.body)]
+        if "<sitemapindex" in page.body[:2048].lower():
+            pending.extend(locs)
+        else:
+            urls.extend(locs[:max_urls - len(urls)])
+    return urls
+
+
+class SiteCrawler:
+    """Runs site crawl jobs: seeds a frontier, follows in-scope links, checkpoints each page"""
+
+    def __init__(
+        self,
+        crawler_service: CrawlerService,
+        store: Optional[SiteCrawlStore] = None,
+        fetcher: Optional[HTTPFetcher] = None,
+    ):
+        self.crawler_service = crawler_service
+        self.store = store or SiteCrawlStore()
+        self.http_fetcher = fetcher or http_fetcher
+
+    def _scope(self, request: SiteCrawlRequest) -> CrawlScope:
+        domains = request.allowed_domains or [host_of(str(url)) for url in request.seed_urls]
+        return CrawlScope(domains, request.include_subdomains, request.include_paths, request.exclude_paths)
+
+    def _new_frontier(self, request: SiteCrawlRequest) -> Frontier:
+        # The filter only needs room for what one job can discover, up to the configured ceiling
+        capacity = min(settings.site_crawl_bloom_capacity, max(10000, request.max_pages * 100))
+        return Frontier(BloomFilter(capacity))
+
+    async def _seed(
+        self, job_id: str, request: SiteCrawlRequest, scope: CrawlScope, frontier: Frontier
+    ) -> SiteCrawlSummary:
+        summary = SiteCrawlSummary()
+        rows: List[FrontierRow] = []
+        seeds = [str(url) for url in request.seed_urls]
+        for url in seeds:
+            if frontier.push(url, 0):
+                rows.append((url_key(url), url, 0, priority(url, 0), None))
+        if request.use_sitemap:
+            origins = []
+            for url in seeds:
+                parts = urlsplit(url)
+                origin = f"{parts.scheme}://{parts.netloc}"
+                if origin not in origins:
+                    origins.append(origin)
+            for url in await discover_sitemap_urls(self.http_fetcher, origins):
+                if scope.allows(url) and frontier.push(url, 0):
+                    rows.append((url_key(url), url, 0, priority(url, 0), None))
+                    summary.sitemap_urls += 1
+        summary.urls_discovered = len(rows)
+        await asyncio.to_thread(self.store.seed, job_id, summary, rows)
+        return summary
+
+    async def _resume(self, request: SiteCrawlRequest, state: Tuple) -> Tuple[SiteCrawlSummary, Frontier]:
+        summary, queued, seen = state
+        frontier = self._new_frontier(request)
+        for key in seen:
+            frontier.seen.add(key)
+        for _, url, depth, prio, parent_url in queued:
+            frontier.restore(url, depth, parent_url, prio)
+        summary.resumed_count += 1
+        logger.info("Resuming site crawl with %d queued URLs", len(queued))
+        return summary, frontier
+
+    async def _crawl_page(
+        self,
+        request: SiteCrawlRequest,
+        url: str,
+        budget: RetryBudget,
+        global_semaphore: asyncio.Semaphore,
+    ) -> Union[URLResult, URLError]:
+        page_request = BaseCrawlRequest(
+            url=url,
+            extract_images=True,
+            extract_links=True,
+            include_attributes=request.include_attributes,
+            fast_mode=request.fast_mode,
+            fetch_mode=request.fetch_mode,
+            session_id=request.session_id,
+            session_config=request.session_config,
+            retry_config=request.retry_config,
+            max_age=request.max_age,
+            no_cache=request.no_cache
+        )
+        scheduler = self.crawler_service.scheduler
+        budget.record_attempt()
+        started = time.monotonic()
+        async with scheduler.slot(url, global_semaphore, request.concurrent_limit, request.per_host_delay):
+            try:
+                result = await self.crawler_service.crawl_url(page_request, budget)
+            except Exception as e:
+                await scheduler.report(
+                    url,
+                    None,
+                    status_code=getattr(e, "status_code", None),
+                    retry_after=getattr(e, "retry_after", None),
+                    error=getattr(e, "status_code", None) is None
+                )
+                return URLError(
+                    url=url,
+                    error=str(e),
+                    attempt_count=getattr(e, "attempt_count", 1),
+                    last_attempt=datetime.utcnow(),
+                    status_code=getattr(e, "status_code", None),
+                    retryable=getattr(e, "retryable", False),
+                    elapsed_seconds=time.monotonic() - started
+                )
+            if result.metadata.cache_status not in ("hit", "revalidated"):
+                await scheduler.report(
+                    url,
+                    result.metadata.fetch_seconds,
+                    status_code=result.metadata.status_code,
+                    tier=result.metadata.fetch_tier or "browser"
+                )
+        return URLResult(
+            url=url,
+            markdown=result.markdown,
+            images=result.images,
+            links=result.links,
+            image_details=result.image_details,
+            link_details=result.link_details,
+            metadata=result.metadata
+        )
+
+    async def run(
+        self,
+        job_id: str,
+        request: SiteCrawlRequest,
+        progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None
+    ) -> SiteCrawlSummary:
+        """Crawl until the frontier is empty or max_pages pages were attempted"""
+        scope = self._scope(request)
+        state = await asyncio.to_thread(self.store.load, job_id)
+        if state is None:
+            frontier = self._new_frontier(request)
+            summary = await self._seed(job_id, request, scope, frontier)
+        else:
+            summary, frontier = await self._resume(request, state)
+
+        global_limit = request.global_concurrent_limit or settings.scheduler_global_limit
+        global_semaphore = asyncio.Semaphore(global_limit)
+        budget = RetryBudget()
+        inflight: Dict[asyncio.Task, Tuple[str, int, Optional[str]]] = {}
+        attempted = summary.pages_crawled + summary.pages_failed
+
+        try:
+            while True:
+                while frontier and len(inflight) < global_limit and attempted + len(inflight) < request.max_pages:
+                    url, depth, parent_url = frontier.pop()
+                    task = asyncio.create_task(self._crawl_page(request, url, budget, global_semaphore))
+                    inflight[task] = (url, depth, parent_url)
+                if not inflight:
+                    break
+                done, _ = await asyncio.wait(inflight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url, depth, parent_url = inflight.pop(task)
+                    item = task.result()
+                    rows: List[FrontierRow] = []
+                    if isinstance(item, URLResult):
+                        summary.pages_crawled += 1
+                        if depth < request.max_depth and item.metadata.status_code < 400:
+                            for link in item.links:
+                                if scope.allows(link) and frontier.push(link, depth + 1, url):
+                                    rows.append((url_key(link), link, depth + 1, priority(link, depth + 1), url))
+                    else:
+                        summary.pages_failed += 1
+                    summary.urls_discovered += len(rows)
+                    summary.max_depth_reached = max(summary.max_depth_reached, depth)
+                    await asyncio.to_thread(
+                        self.store.record_page, job_id, url, depth, parent_url, item, summary, rows
+                    )
+                    attempted += 1
+                    if progress_callback:
+                        await progress_callback(attempted, request.max_pages)
+        finally:
+            for task in inflight:
+                task.cancel()
+            await asyncio.gather(*inflight, return_exceptions=True)
+
+        summary.urls_remaining = len(frontier)
+        summary.stop_reason = "max_pages" if frontier else "exhausted"
+        await asyncio.to_thread(self.store.finish, job_id)
+        return summary
@@ -0,0 +1,118 @@
+from typing import Any, Dict, Optional
+import asyncio
+import importlib
+import logging
+import os
+import time
+
+from app.config import settings
+from app.services import metrics
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil is in requirements but stay optional
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# Imported on first use by the services; preloading moves them ahead of the first request
+HEAVY_MODULES = ("crawl4ai", "crawl4ai.markdown_generation_strategy", "playwright.async_api")
+
+
+def preload_modules() -> float:
+    """Import the heavy optional dependencies now; returns the seconds it took"""
+    started = time.perf_counter()
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning("Could not preload %s: %s", name, e)
+    return time.perf_counter() - started
+
+
+class StartupMonitor:
+    """Times how a worker becomes ready: app imports, heavy imports and browser warm-up.
+
+    The app starts serving as soon as the lifespan has started the shared
+    services; warm-up runs after that in the background and /ready answers
+    503 until it has finished.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.import_started = time.perf_counter()
+        self.import_seconds: Optional[float] = None
+        self.module_import_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.warmup_browsers = 0
+        self.warmup_error: Optional[str] = None
+        self.time_to_ready_seconds: Optional[float] = None
+        self.ready = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def preloaded(self) -> bool:
+        """True in a worker forked from a master that had already imported the app"""
+        return os.getpid() != self.pid
+
+    def imports_done(self) -> None:
+        if self.import_seconds is None:
+            self.import_seconds = time.perf_counter() - self.import_started
+
+    def _process_age(self) -> float:
+        if psutil is not None:
+            return time.time() - psutil.Process().create_time()
+        return time.perf_counter() - self.import_started
+
+    def start(self, pool: Any) -> None:
+        """Warm up in the background: heavy imports, then browsers in the given pool"""
+        self.ready = False
+        self._task = asyncio.create_task(self._warm_up(pool))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _warm_up(self, pool: Any) -> None:
+        started = time.perf_counter()
+        try:
+            # In a thread, so /ready and the health check answer while crawl4ai imports
+            self.module_import_seconds = await asyncio.to_thread(preload_modules)
+            self.warmup_browsers = await pool.warm_up(settings.warmup_browsers, settings.warmup_render)
+        except Exception as e:
+            # The pool launches browsers on first use instead
+            self.warmup_error = (str(e) or type(e).__name__).splitlines()[0]
+            logger.warning("Browser warm-up failed: %s", self.warmup_error)
+        self.warmup_seconds = time.perf_counter() - started
+        self.time_to_ready_seconds = self._process_age()
+        self.ready = True
+        metrics.observe_startup({
+            "app_import": None if self.preloaded else self.import_seconds,
+            "module_import": self.module_import_seconds,
+            "warmup": self.warmup_seconds,
+            "ready": self.time_to_ready_seconds,
+        })
+        logger.info(
+            "Worker %d ready in %.2fs (app import %.2fs%s, heavy imports %.2fs, warm-up of %d browsers %.2fs)",
+            os.getpid(), self.time_to_ready_seconds, self.import_seconds or 0.0,
+            " in the preloading master" if self.preloaded else "", self.module_import_seconds or 0.0,
+            self.warmup_browsers, self.warmup_seconds,
+        )
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "pid": os.getpid(),
+            "preloaded": self.preloaded,
+            "import_seconds": self.import_seconds,
+            "module_import_seconds": self.module_import_seconds,
+            "warmup_browsers": self.warmup_browsers,
+            "warmup_seconds": self.warmup_seconds,
+            "warmup_error": self.warmup_error,
+            "time_to_ready_seconds": self.time_to_ready_seconds,
+        }
+
+
+startup_monitor = StartupMonitor()
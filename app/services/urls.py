@@ -0,0 +1,45 @@
+from typing import Any, Iterable, List
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL for cache keys and dedup.
+
+    Lowercases scheme and host, drops default ports and fragments, sorts the
+    query string and gives an empty path a trailing slash.
+    """
+    parts = urlsplit(str(url).strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    netloc = host
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    if parts.username:
+        auth = parts.username + (f":{parts.password}" if parts.password else "")
+        netloc = f"{auth}@{netloc}"
+    path = parts.path or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def unique_urls(urls: Iterable[Any]) -> List[str]:
+    """Drop URLs that normalize to one already seen, keeping first-seen order"""
+    seen = set()
+    unique = []
+    for url in urls:
+        normalized = normalize_url(str(url))
+        if normalized not in seen:
+            seen.add(normalized)
+            unique.append(str(url))
+    return unique
+
+
+def host_of(url: str) -> str:
+    """Lowercased host (with non-default port) used for per-host bookkeeping"""
+    parts = urlsplit(str(url))
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(parts.scheme.lower()):
+        return f"{host}:{parts.port}"
+    return host
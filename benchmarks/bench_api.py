@@ -0,0 +1,364 @@
+"""Load-test the crawl API against the local fixture site.
+
+Usage:
+    python -m benchmarks.bench_api [--mode crawl|batch] [--concurrency N] [--requests N]
+                                   [--mix static=70,spa=10,huge=10,slow=5,error=5]
+                                   [--base-url URL --pid PID] [--output FILE]
+
+The fixture site (``benchmarks.fixture_site``) is served from this process. By
+default the API is started as a uvicorn subprocess on a free port so peak RSS
+(API process plus browser children) can be sampled; pass ``--base-url`` to load
+an already running server instead, with ``--pid`` if its memory should be
+tracked. ``crawl`` mode posts one URL per request to /crawl, ``batch`` mode
+posts ``--batch-size`` URLs per request to /crawl/batch/stream. Results,
+tagged with the git commit, are printed as JSON so runs can be compared.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from benchmarks.fixture_site import start_fixture_site
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - peak RSS is reported as null without psutil
+    psutil = None
+
+KINDS = ("static", "spa", "huge", "slow", "error")
+_ERROR_CODES = (404, 500, 503)
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise argparse.ArgumentTypeError(f"Unknown page kind '{kind}', expected one of {', '.join(KINDS)}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None, "mean": None}
+    ordered = sorted(values)
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "p50": at(0.50),
+        "p95": at(0.95),
+        "p99": at(0.99),
+        "max": round(ordered[-1] * 1000, 2),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 2),
+    }
+
+
+def git_commit() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+class URLSource:
+    """Draws fixture URLs by weight; every URL is distinct so nothing is served from cache"""
+
+    def __init__(self, base_url: str, mix: Dict[str, float], slow_delay: float, seed: int):
+        self.base_url = base_url
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.slow_delay = slow_delay
+        self.rng = random.Random(seed)
+        self.counter = 0
+
+    def next(self) -> tuple:
+        self.counter += 1
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        if kind == "error":
+            path = f"/error/{self.rng.choice(_ERROR_CODES)}?n={self.counter}"
+        elif kind == "slow":
+            path = f"/slow/{self.counter}?delay={self.slow_delay}"
+        else:
+            path = f"/{kind}/{self.counter}"
+        return kind, self.base_url + path
+
+
+class RSSSampler:
+    """Peak resident memory of a process and all its children (the browsers)"""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.2):
+        self.process = psutil.Process(pid) if psutil is not None and pid else None
+        self.interval = interval
+        self.peak = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self) -> None:
+        try:
+            total = self.process.memory_info().rss
+            for child in self.process.children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except psutil.Error:
+                    pass
+        except psutil.Error:
+            return
+        self.peak = max(self.peak, total)
+
+    async def _loop(self) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self.process is not None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> Optional[float]:
+        if self._task is None:
+            return None
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self.sample()
+        return round(self.peak / (1024 * 1024), 1)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def spawn_api(env: Dict[str, str], workers: int) -> tuple:
+    """Start uvicorn serving app.main:app; returns (process, base_url) once it answers"""
+    port = _free_port()
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning", "--workers", str(workers)]
+    process = subprocess.Popen(command, env={**os.environ, **env})
+    base_url = f"http://127.0.0.1:{port}"
+    async with aiohttp.ClientSession() as client:
+        for _ in range(300):
+            if process.poll() is not None:
+                raise RuntimeError(f"API server exited with status {process.returncode}")
+            try:
+                async with client.get(base_url + "/") as response:
+                    if response.status == 200:
+                        return process, base_url
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API server did not start within 60 seconds")
+
+
+async def pool_launches(client: aiohttp.ClientSession, base_url: str) -> Optional[int]:
+    """Pool browsers started so far, summed over every worker; None when /metrics is off.
+
+    /api/v1/pool/stats only describes the worker that answers it, so the count
+    comes from the crawl4ai_browser_launches counter, which prometheus_client
+    merges across workers through PROMETHEUS_MULTIPROC_DIR.
+    """
+    try:
+        async with client.get(base_url + "/metrics") as response:
+            text = await response.text()
+    except aiohttp.ClientError:
+        return None
+    # The family is declared before the first launch; a missing one means metrics are disabled
+    launches = 0 if "# TYPE crawl4ai_browser_launches" in text else None
+    for line in text.splitlines():
+        if line.startswith("crawl4ai_browser_launches_total{") and 'kind="pool"' in line:
+            launches = (launches or 0) + int(float(line.rsplit(" ", 1)[1]))
+    return launches
+
+
+async def crawl_one(client: aiohttp.ClientSession, api: str, payload: Dict[str, Any]) -> tuple:
+    started = time.perf_counter()
+    try:
+        async with client.post(api + "/api/v1/crawl", json=payload) as response:
+            body = await response.read()
+            status = response.status
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return type(e).__name__, time.perf_counter() - started, 0
+    return str(status), time.perf_counter() - started, len(body)
+
+
+async def crawl_batch(client: aiohttp.ClientSession, api: str, payload: Dict[str, Any]) -> tuple:
+    """Stream one batch; returns (status, seconds, bytes, per-item seconds, item failures)"""
+    started = time.perf_counter()
+    items: List[float] = []
+    failures = 0
+    size = 0
+    try:
+        async with client.post(api + "/api/v1/crawl/batch/stream", json=payload) as response:
+            async for line in response.content:
+                size += len(line)
+                if not line.strip():
+                    continue
+                event = json.loads(line)["type"]
+                if event in ("result", "error"):
+                    items.append(time.perf_counter() - started)
+                    failures += event == "error"
+            status = response.status
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        return type(e).__name__, time.perf_counter() - started, size, items, failures
+    return str(status), time.perf_counter() - started, size, items, failures
+
+
+async def run_load(args: argparse.Namespace, api: str, site_url: str) -> Dict[str, Any]:
+    source = URLSource(site_url, args.mix, args.slow_delay, args.seed)
+    options = {"fetch_mode": args.fetch_mode, "no_cache": not args.use_cache, "fast_mode": args.fast_mode}
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    latencies: List[float] = []
+    by_kind: Dict[str, List[float]] = {}
+    item_latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    item_failures = 0
+    response_bytes = 0
+    urls = 0
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as client:
+        for _ in range(args.warmup):
+            await crawl_one(client, api, {"url": source.next()[1], **options})
+        launches_before = await pool_launches(client, api)
+        pending = iter(range(args.requests))
+
+        async def worker() -> None:
+            nonlocal item_failures, response_bytes, urls
+            for _ in pending:
+                if args.mode == "crawl":
+                    kind, url = source.next()
+                    status, seconds, size = await crawl_one(client, api, {"url": url, **options})
+                    by_kind.setdefault(kind, []).append(seconds)
+                    urls += 1
+                else:
+                    batch = [source.next()[1] for _ in range(args.batch_size)]
+                    status, seconds, size, items, failed = await crawl_batch(
+                        client, api, {"urls": batch, "concurrent_limit": args.batch_size, **options}
+                    )
+                    item_latencies.extend(items)
+                    item_failures += failed
+                    urls += len(batch)
+                latencies.append(seconds)
+                statuses[status] = statuses.get(status, 0) + 1
+                response_bytes += size
+
+        rss = RSSSampler(args.pid)
+        rss.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        duration = time.perf_counter() - started
+        peak_rss_mb = await rss.stop()
+        launches_after = await pool_launches(client, api)
+
+    launches = None
+    if launches_before is not None and launches_after is not None:
+        launches = launches_after - launches_before
+    report: Dict[str, Any] = {
+        "requests": len(latencies),
+        "urls": urls,
+        "duration_seconds": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 2) if duration else None,
+        "urls_per_second": round(urls / duration, 2) if duration else None,
+        "statuses": dict(sorted(statuses.items())),
+        "latency_ms": percentiles(latencies),
+        "response_bytes": response_bytes,
+        "peak_rss_mb": peak_rss_mb,
+        "browser_launches": launches,
+        "browser_launches_per_request": round(launches / len(latencies), 4) if launches is not None and latencies else None,
+    }
+    if args.mode == "crawl":
+        report["latency_ms_by_kind"] = {kind: percentiles(values) for kind, values in sorted(by_kind.items())}
+    else:
+        report["item_latency_ms"] = percentiles(item_latencies)
+        report["item_failures"] = item_failures
+    return report
+
+
+async def bench(args: argparse.Namespace) -> Dict[str, Any]:
+    runner, site_url = await start_fixture_site(port=args.site_port)
+    process = None
+    metrics_dir = None
+    try:
+        api = args.base_url
+        if api is None:
+            # A fresh multiprocess directory, so /metrics sums counters over every uvicorn worker
+            metrics_dir = tempfile.mkdtemp(prefix="crawl4ai_bench_metrics_")
+            env = {"PROMETHEUS_MULTIPROC_DIR": metrics_dir, **dict(item.split("=", 1) for item in args.env)}
+            process, api = await spawn_api(env, args.workers)
+            args.pid = process.pid
+        results = await run_load(args, api.rstrip("/"), site_url)
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if metrics_dir is not None:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+        await runner.cleanup()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "pid")}
+    return {
+        "benchmark": "api_load",
+        "git": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("crawl", "batch"), default="crawl")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--requests", type=int, default=200, help="API requests to send after warm-up")
+    parser.add_argument("--batch-size", type=int, default=10, help="URLs per request in batch mode")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed crawl requests sent first")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("static=70,spa=10,huge=10,slow=5,error=5"))
+    parser.add_argument("--slow-delay", type=float, default=1.0, help="Seconds the slow pages wait before answering")
+    parser.add_argument("--fetch-mode", choices=("auto", "http", "browser"), default="auto")
+    parser.add_argument("--fast-mode", action="store_true")
+    parser.add_argument("--use-cache", action="store_true", help="Let the response cache serve repeated URLs")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request client timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--site-port", type=int, default=0, help="Fixture site port (0 picks a free one)")
+    parser.add_argument("--base-url", help="Load an already running API instead of spawning one")
+    parser.add_argument("--pid", type=int, help="PID of the --base-url server, to sample its peak RSS")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the spawned API")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the spawned API, e.g. CRAWL4AI_POOL_MAX_BROWSERS=4")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(bench(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Measure how fast fresh API workers become ready and serve their first request.
+
+Usage:
+    python -m benchmarks.bench_cold_start [--workers N] [--warmup-browsers N]
+                                          [--fetch-mode http|browser] [--runs N] [--output FILE]
+
+Starts gunicorn with the repo's ``gunicorn.conf.py``, once without and once
+with ``CRAWL4AI_PRELOAD``, and polls ``/`` and ``/ready``. Reported per mode:
+seconds until the server answered at all, seconds until ``/ready`` returned
+200, the latency of the first crawl of a fixture page, and the start-up
+timings the worker reported on ``/ready``. Medians over ``--runs`` starts.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from benchmarks.bench_api import _free_port, git_commit
+from benchmarks.fixture_site import start_fixture_site
+
+
+async def poll(client: aiohttp.ClientSession, url: str, deadline: float) -> Optional[Dict[str, Any]]:
+    """GET ``url`` until it answers 200; returns its JSON body, or None past the deadline"""
+    while time.perf_counter() < deadline:
+        try:
+            async with client.get(url) as response:
+                if response.status == 200:
+                    return await response.json()
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.05)
+    return None
+
+
+async def cold_start(args: argparse.Namespace, site: str, preload: bool) -> Dict[str, Any]:
+    port = _free_port()
+    workdir = tempfile.mkdtemp(prefix="crawl4ai_cold_start_")
+    env = {
+        **os.environ,
+        "CRAWL4AI_PRELOAD": "true" if preload else "false",
+        "CRAWL4AI_WARMUP_BROWSERS": str(args.warmup_browsers),
+        "CRAWL4AI_JOB_DB_PATH": os.path.join(workdir, "jobs.db"),
+        "CRAWL4AI_CACHE_ENABLED": "false",
+        "PROMETHEUS_MULTIPROC_DIR": os.path.join(workdir, "metrics"),
+    }
+    command = [sys.executable, "-m", "gunicorn", "app.main:app", "-c", "gunicorn.conf.py",
+               "--workers", str(args.workers), "--worker-class", "uvicorn.workers.UvicornWorker",
+               "--bind", f"127.0.0.1:{port}", "--log-level", "warning"]
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(command, env=env)
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as client:
+            deadline = started + args.timeout
+            if await poll(client, base_url + "/", deadline) is None:
+                raise RuntimeError("API server did not answer in time")
+            serving = time.perf_counter() - started
+            ready = await poll(client, base_url + "/ready", deadline)
+            ready_after = time.perf_counter() - started
+            request_started = time.perf_counter()
+            payload = {"url": f"{site}/static/1", "fetch_mode": args.fetch_mode, "no_cache": True}
+            async with client.post(base_url + "/api/v1/crawl", json=payload) as response:
+                await response.read()
+                status = response.status
+            first_request = time.perf_counter() - request_started
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return {
+        "serving_seconds": serving,
+        "ready_seconds": ready_after if ready is not None else None,
+        "first_request_seconds": first_request,
+        "first_request_status": status,
+        "worker": ready,
+    }
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def median(key: str) -> Optional[float]:
+        values = [run[key] for run in runs if run[key] is not None]
+        return round(statistics.median(values), 3) if values else None
+
+    return {
+        "serving_seconds": median("serving_seconds"),
+        "ready_seconds": median("ready_seconds"),
+        "first_request_seconds": median("first_request_seconds"),
+        "first_request_status": [run["first_request_status"] for run in runs],
+        "last_worker_report": runs[-1]["worker"],
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    runner, site = await start_fixture_site()
+    try:
+        results = {}
+        for preload in (False, True):
+            runs = [await cold_start(args, site, preload) for _ in range(args.runs)]
+            results["preload" if preload else "lazy"] = summarize(runs)
+    finally:
+        await runner.cleanup()
+    return {
+        "benchmark": "cold_start",
+        "git": git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--warmup-browsers", type=int, default=1, help="CRAWL4AI_WARMUP_BROWSERS for each worker")
+    parser.add_argument("--fetch-mode", choices=("auto", "http", "browser"), default="browser")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
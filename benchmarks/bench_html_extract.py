@@ -0,0 +1,89 @@
+"""Compare the HTML link/image extractors on a corpus of saved pages.
+
+Usage:
+    python -m benchmarks.bench_html_extract [--corpus DIR] [--repeat N]
+
+Every ``*.html`` file in the corpus directory is parsed by each backend. Without
+a corpus, synthetic small/medium/huge pages are generated so the benchmark can
+run anywhere. Results are printed as JSON.
+"""
+from pathlib import Path
+from typing import Dict, List
+import argparse
+import json
+import random
+import statistics
+import time
+
+from app.services.html_extract import EXTRACTORS, get_extractor
+
+
+def synthetic_page(links: int, images: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts = ["<!DOCTYPE html><html><head><title>Synthetic</title></head><body>"]
+    for i in range(max(links, images)):
+        parts.append(f"<div class='row-{i % 7}'><p>Paragraph {i} " + "lorem ipsum " * rng.randint(3, 20) + "</p>")
+        if i < links:
+            href = f"/section/{i % 50}/page-{i}.html" if i % 3 else f"https://cdn{i % 4}.example.com/a/{i}"
+            parts.append(f"<a href='{href}' rel='nofollow' title='Link {i}'>link {i}</a>")
+        if i < images:
+            parts.append(f"<img src='/img/{i}.png' srcset='/img/{i}@2x.png 2x' alt='image {i}'>")
+        parts.append("</div>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def load_corpus(directory: str = None) -> Dict[str, str]:
+    if directory:
+        return {
+            path.name: path.read_text(encoding="utf-8", errors="replace")
+            for path in sorted(Path(directory).glob("*.html"))
+        }
+    return {
+        "small.html": synthetic_page(links=50, images=10, seed=1),
+        "medium.html": synthetic_page(links=1000, images=200, seed=2),
+        "huge.html": synthetic_page(links=20000, images=5000, seed=3),
+    }
+
+
+def bench(corpus: Dict[str, str], repeat: int, include_attributes: bool) -> Dict[str, Dict[str, Dict[str, float]]]:
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name in EXTRACTORS:
+        extractor = get_extractor(name)
+        per_page = {}
+        for page, html in corpus.items():
+            timings: List[float] = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                resources = extractor.extract(
+                    html,
+                    base_url="https://example.com/docs/",
+                    extract_images=True,
+                    extract_links=True,
+                    include_attributes=include_attributes,
+                )
+                timings.append(time.perf_counter() - started)
+            per_page[page] = {
+                "bytes": len(html),
+                "links": len(resources.links),
+                "images": len(resources.images),
+                "median_ms": round(statistics.median(timings) * 1000, 3),
+                "min_ms": round(min(timings) * 1000, 3),
+            }
+        results[name] = per_page
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="Directory of saved *.html pages")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--attributes", action="store_true", help="Also collect srcset/alt/rel")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    print(json.dumps(bench(corpus, args.repeat, args.attributes), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Microbenchmarks for HTML resource extraction and response serialization.
+
+Usage:
+    python -m benchmarks.bench_serialization [--repeat N] [--output FILE]
+
+Times ``CrawlerService._extract_from_html`` on the fixture pages and on the
+synthetic corpus of ``bench_html_extract``, then JSON-encodes crawl and batch
+responses of growing size the way the endpoints do (``serialize_model``, with
+and without field selection, ``model_dump_json`` per stream item, and result
+pages spliced from stored JSON). Results are printed as JSON.
+"""
+from datetime import datetime
+from typing import Callable, Dict, List
+import argparse
+import json
+import statistics
+import time
+
+from app.models.requests import ResponseShape
+from app.models.responses import BaseCrawlResponse, BatchCrawlResponse, BatchMetadata, CrawlMetadata, URLResult
+from app.services.crawler import CrawlerService
+from app.services.executor import serialize_model
+from app.services.payload import encode_results_page
+from benchmarks.bench_api import git_commit
+from benchmarks.bench_html_extract import load_corpus
+from benchmarks.fixture_site import huge_page, spa_page, static_page
+
+
+def timed(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return {"median_ms": round(statistics.median(timings) * 1000, 3), "min_ms": round(min(timings) * 1000, 3)}
+
+
+def bench_extract(service: CrawlerService, repeat: int) -> Dict[str, Dict[str, float]]:
+    pages = {"fixture_static": static_page(1), "fixture_spa": spa_page(1), "fixture_huge": huge_page(1)}
+    pages.update(load_corpus())
+    results = {}
+    for name, html in pages.items():
+        resources = service._extract_from_html(html, True, True, "http://127.0.0.1/static/1")
+        results[name] = {
+            "bytes": len(html),
+            "links": len(resources.links),
+            "images": len(resources.images),
+            **timed(lambda: service._extract_from_html(html, True, True, "http://127.0.0.1/static/1"), repeat),
+        }
+    return results
+
+
+def crawl_response(n: int, markdown_chars: int, links: int) -> BaseCrawlResponse:
+    url = f"https://example.com/docs/page-{n}"
+    return BaseCrawlResponse(
+        url=url,
+        markdown=("# Heading\n\nSome paragraph text with a [link](https://example.com/a). " * (markdown_chars // 64 + 1))[:markdown_chars],
+        images=[f"https://example.com/img/{n}-{i}.png" for i in range(links // 5)],
+        links=[f"https://example.com/docs/page-{n}-{i}" for i in range(links)],
+        metadata=CrawlMetadata(
+            crawl_time=datetime.utcnow(),
+            content_type="text/html; charset=utf-8",
+            status_code=200,
+            headers={"content-type": "text/html; charset=utf-8", "server": "fixture", "cache-control": "max-age=60"},
+            final_url=url,
+            cache_status="miss",
+            elapsed_seconds=0.42,
+            fetch_tier="http",
+        ),
+    )
+
+
+def batch_response(items: int) -> BatchCrawlResponse:
+    results = [URLResult(**crawl_response(i, 4000, 40).model_dump()) for i in range(items)]
+    now = datetime.utcnow()
+    return BatchCrawlResponse(
+        successful_urls=results,
+        failed_urls=[],
+        metadata=BatchMetadata(start_time=now, end_time=now, total_urls=items, successful_count=items, failed_count=0),
+    )
+
+
+def bench_serialization(repeat: int) -> Dict[str, Dict[str, float]]:
+    responses = {
+        "crawl_small": crawl_response(1, 2000, 20),
+        "crawl_large": crawl_response(2, 200_000, 2000),
+        "batch_100": batch_response(100),
+    }
+    results = {}
+    for name, model in responses.items():
+        results[name] = {
+            "bytes": len(serialize_model(model)),
+            "serialize_model": timed(lambda: serialize_model(model), repeat),
+            "model_dump_json": timed(lambda: model.model_dump_json(), repeat),
+            "json_dumps_model_dump": timed(lambda: json.dumps(model.model_dump(mode="json")), repeat),
+        }
+    shape = ResponseShape(fields="markdown,links", max_markdown_chars=1000, max_links=20)
+    for name in ("crawl_small", "crawl_large"):
+        model = responses[name]
+        results[name]["shaped"] = {"bytes": len(serialize_model(model, shape)), **timed(lambda: serialize_model(model, shape), repeat)}
+    # The batch stream endpoint encodes one item at a time
+    batch = responses["batch_100"]
+    results["batch_100"]["stream_items"] = timed(lambda: [item.model_dump_json() for item in batch.successful_urls], repeat)
+    # Finished batches are paged from stored per-URL JSON
+    rows = [(True, item.model_dump_json()) for item in batch.successful_urls]
+    header = {"job_id": "bench", "offset": 0, "limit": len(rows), "total": len(rows)}
+    results["batch_100"]["results_page_spliced"] = timed(lambda: encode_results_page(header, rows), repeat)
+    results["batch_100"]["results_page_shaped"] = timed(lambda: encode_results_page(header, rows, shape), repeat)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    service = CrawlerService()
+    report = {
+        "benchmark": "micro",
+        "git": git_commit(),
+        "extract_from_html": bench_extract(service, args.repeat),
+        "serialization": bench_serialization(args.repeat),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Local fixture site for load tests: static, JS-rendered, huge-DOM, slow and failing pages.
+
+Usage:
+    python -m benchmarks.fixture_site [--host 127.0.0.1] [--port 8900]
+
+Routes (``{n}`` is any integer, used to vary content and defeat caching):
+    /static/{n}      plain article with links and images
+    /spa/{n}         empty app root filled in by JavaScript (needs a browser)
+    /huge/{n}        ~50k-node DOM with thousands of links
+    /slow/{n}        static page sent after ``?delay=`` seconds (default 2)
+    /error/{code}    status ``code``; 429 and 503 carry Retry-After
+    /sitemap.xml     sitemap of the static pages
+"""
+from typing import Dict, Optional
+import argparse
+import asyncio
+import random
+
+from aiohttp import web
+
+_WORDS = (
+    "crawler browser render page markdown extract latency throughput cache queue worker "
+    "schedule network request response header content document element script style"
+).split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def static_page(n: int, links: int = 40, images: int = 8) -> str:
+    rng = random.Random(n)
+    paragraphs = "".join(f"<p>{_text(rng, 60)}.</p>" for _ in range(12))
+    link_html = "".join(f'<li><a href="/static/{(n + i + 1) % 10000}">Related {i}</a></li>' for i in range(links))
+    image_html = "".join(f'<img src="/img/{n}-{i}.png" alt="figure {i}">' for i in range(images))
+    return (
+        f"<!DOCTYPE html><html><head><title>Static {n}</title></head><body>"
+        f"<article><h1>Static page {n}</h1>{paragraphs}{image_html}</article>"
+        f"<nav><ul>{link_html}</ul></nav></body></html>"
+    )
+
+
+def spa_page(n: int) -> str:
+    rng = random.Random(n)
+    paragraphs = "".join(f"<p>{_text(rng, 60)}.</p>" for _ in range(8))
+    return (
+        f"<!DOCTYPE html><html><head><title>App {n}</title></head><body>"
+        "<div id=\"root\"></div>"
+        "<noscript>You need to enable JavaScript to run this app.</noscript>"
+        "<script>setTimeout(function () {"
+        f"document.getElementById('root').innerHTML = {('<h1>App page ' + str(n) + '</h1>' + paragraphs)!r};"
+        "}, 100);</script></body></html>"
+    )
+
+
+def huge_page(n: int, rows: int = 5000) -> str:
+    rng = random.Random(n)
+    parts = [f"<!DOCTYPE html><html><head><title>Huge {n}</title></head><body><h1>Huge page {n}</h1><table>"]
+    for i in range(rows):
+        parts.append(
+            f"<tr class='r{i % 7}'><td>{i}</td><td><span>{_text(rng, 6)}</span></td>"
+            f"<td><a href='/static/{(n * rows + i) % 10000}'>row {i}</a></td>"
+            f"<td><img src='/img/h{n}-{i}.png' alt='row {i}'></td></tr>"
+        )
+    parts.append("</table></body></html>")
+    return "".join(parts)
+
+
+def build_app(default_delay: float = 2.0) -> web.Application:
+    # Pages are generated once per n and reused; content generation must not dominate the benchmark
+    cache: Dict[str, str] = {}
+
+    def cached(key: str, render) -> str:
+        page = cache.get(key)
+        if page is None:
+            page = cache[key] = render()
+        return page
+
+    def html(body: str) -> web.Response:
+        return web.Response(text=body, content_type="text/html")
+
+    async def static(request: web.Request) -> web.Response:
+        n = int(request.match_info["n"])
+        return html(cached(f"static/{n}", lambda: static_page(n)))
+
+    async def spa(request: web.Request) -> web.Response:
+        n = int(request.match_info["n"])
+        return html(cached(f"spa/{n}", lambda: spa_page(n)))
+
+    async def huge(request: web.Request) -> web.Response:
+        n = int(request.match_info["n"])
+        return html(cached(f"huge/{n % 20}", lambda: huge_page(n % 20)))
+
+    async def slow(request: web.Request) -> web.Response:
+        n = int(request.match_info["n"])
+        await asyncio.sleep(float(request.query.get("delay", default_delay)))
+        return html(cached(f"static/{n}", lambda: static_page(n)))
+
+    async def error(request: web.Request) -> web.Response:
+        code = int(request.match_info["code"])
+        headers: Optional[Dict[str, str]] = {"Retry-After": "1"} if code in (429, 503) else None
+        return web.Response(status=code, text=f"Fixture error {code}", headers=headers)
+
+    async def sitemap(request: web.Request) -> web.Response:
+        base = f"{request.scheme}://{request.host}"
+        urls = "".join(f"<url><loc>{base}/static/{i}</loc></url>" for i in range(200))
+        return web.Response(
+            text=f'<?xml version="1.0" encoding="UTF-8"?><urlset>{urls}</urlset>', content_type="application/xml"
+        )
+
+    app = web.Application()
+    app.router.add_get(r"/static/{n:\d+}", static)
+    app.router.add_get(r"/spa/{n:\d+}", spa)
+    app.router.add_get(r"/huge/{n:\d+}", huge)
+    app.router.add_get(r"/slow/{n:\d+}", slow)
+    app.router.add_get(r"/error/{code:\d+}", error)
+    app.router.add_get("/sitemap.xml", sitemap)
+    return app
+
+
+async def start_fixture_site(host: str = "127.0.0.1", port: int = 0) -> tuple:
+    """Start the site in the running loop; returns (runner, base_url)"""
+    runner = web.AppRunner(build_app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+    web.run_app(build_app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
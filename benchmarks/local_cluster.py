@@ -0,0 +1,155 @@
+"""Run a sharded batch through a coordinator and local worker node processes.
+
+Usage:
+    python -m benchmarks.local_cluster [--nodes N] [--hosts N] [--urls N]
+                                       [--kill-after N] [--fetch-mode http] [--output FILE]
+
+Starts ``--hosts`` fixture sites on separate ports (each port is its own host
+for routing), ``--nodes`` API processes as worker nodes and one API process in
+coordinator mode with ``CRAWL4AI_CLUSTER_NODES`` pointing at them. A batch of
+``--urls`` URLs is streamed through the coordinator. With ``--kill-after``, the
+node that served the N-th result is killed, so its unfinished URLs have to be
+reassigned. The report checks that every URL came back exactly once and shows
+how many URLs each node crawled and how many shards were reassigned.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+import aiohttp
+
+from benchmarks.bench_api import git_commit, spawn_api
+from benchmarks.fixture_site import start_fixture_site
+
+
+def node_env(directory: str, extra: Dict[str, str]) -> Dict[str, str]:
+    """Separate job, cache, session and index files per node, as on separate machines"""
+    os.makedirs(directory, exist_ok=True)
+    return {
+        "CRAWL4AI_JOB_DB_PATH": os.path.join(directory, "jobs.db"),
+        "CRAWL4AI_CACHE_DISK_PATH": os.path.join(directory, "cache.db"),
+        "CRAWL4AI_SESSION_STORE_DIR": os.path.join(directory, "sessions"),
+        "CRAWL4AI_LLM_CACHE_PATH": os.path.join(directory, "llm_cache.db"),
+        "CRAWL4AI_RECRAWL_INDEX_PATH": os.path.join(directory, "recrawl.db"),
+        **extra,
+    }
+
+
+async def stream_batch(api: str, payload: Dict[str, Any], on_item, timeout: float) -> Dict[str, Any]:
+    """Post a batch to the coordinator's stream endpoint; returns the items and the trailer"""
+    items: List[Dict[str, Any]] = []
+    metadata: Optional[Dict[str, Any]] = None
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as client:
+        async with client.post(api + "/api/v1/crawl/batch/stream", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event["type"] == "metadata":
+                    metadata = event["data"]
+                    continue
+                items.append(event)
+                await on_item(len(items))
+    return {"items": items, "metadata": metadata}
+
+
+async def served_by(api: str) -> Dict[str, int]:
+    async with aiohttp.ClientSession() as client:
+        async with client.get(api + "/api/v1/cluster/stats") as response:
+            return (await response.json())["urls_by_node"]
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    sites = [await start_fixture_site() for _ in range(args.hosts)]
+    processes: Dict[str, subprocess.Popen] = {}
+    workdir = tempfile.mkdtemp(prefix="crawl4ai_cluster_")
+    extra = {"CRAWL4AI_POOL_MIN_BROWSERS": "0", "CRAWL4AI_CACHE_ENABLED": "false"}
+    try:
+        for index in range(args.nodes):
+            process, base_url = await spawn_api(node_env(os.path.join(workdir, f"node{index}"), extra), 1)
+            processes[base_url] = process
+        coordinator_env = node_env(os.path.join(workdir, "coordinator"), extra)
+        coordinator_env["CRAWL4AI_CLUSTER_NODES"] = ",".join(processes)
+        coordinator_env["CRAWL4AI_CLUSTER_SHARD_SIZE"] = str(args.shard_size)
+        coordinator_env["CRAWL4AI_CLUSTER_NODE_COOLDOWN"] = "600"
+        coordinator, api = await spawn_api(coordinator_env, 1)
+        processes[api] = coordinator
+
+        urls = [f"{sites[i % args.hosts][1]}/slow/{i}?delay={args.delay}" for i in range(args.urls)]
+        payload = {"urls": urls, "fetch_mode": args.fetch_mode, "no_cache": True, "concurrent_limit": 4}
+        killed: List[str] = []
+
+        async def on_item(count: int) -> None:
+            if args.kill_after and count == args.kill_after and not killed:
+                # Kill the node that owns the most URLs so far: it still has shards in flight
+                counts = await served_by(api)
+                victim = max(counts, key=counts.get)
+                processes[victim].kill()
+                killed.append(victim)
+
+        started = time.perf_counter()
+        result = await stream_batch(api, payload, on_item, args.timeout)
+        duration = time.perf_counter() - started
+        stats = await served_by(api)
+    finally:
+        for process in processes.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in processes.values():
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for runner, _ in sites:
+            await runner.cleanup()
+
+    returned = [event["data"]["url"] for event in result["items"]]
+    metadata = result["metadata"] or {}
+    return {
+        "benchmark": "local_cluster",
+        "git": git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": {
+            "duration_seconds": round(duration, 3),
+            "urls": len(urls),
+            "returned": len(returned),
+            "unique_returned": len(set(returned)),
+            "all_urls_returned_once": sorted(returned) == sorted(urls),
+            "failed": sum(1 for event in result["items"] if event["type"] == "error"),
+            "killed_nodes": killed,
+            "urls_by_node": stats,
+            "cluster": metadata.get("cluster"),
+            "stages": metadata.get("stages"),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=3, help="Worker node processes")
+    parser.add_argument("--hosts", type=int, default=8, help="Fixture sites, each a separate host")
+    parser.add_argument("--urls", type=int, default=120)
+    parser.add_argument("--shard-size", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.2, help="Seconds each fixture page waits before answering")
+    parser.add_argument("--kill-after", type=int, default=0, help="Kill a busy node after this many results")
+    parser.add_argument("--fetch-mode", choices=("auto", "http", "browser"), default="http")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
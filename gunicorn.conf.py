@@ -0,0 +1,36 @@
+# Gunicorn settings shared by every deployment; the Procfile passes this file with -c
+import os
+import shutil
+import tempfile
+
+# prometheus_client writes each worker's samples here so /metrics can merge them
+metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "crawl4ai_metrics")
+)
+
+# CRAWL4AI_PRELOAD=true imports the app once in the master; workers fork with it already loaded
+preload_app = os.environ.get("CRAWL4AI_PRELOAD", "").strip().lower() in ("1", "true", "yes", "on")
+if preload_app:
+    # The preloaded app creates its metric files before on_starting runs
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def on_starting(server):
+    """Start every master with an empty metrics directory so old workers are not counted"""
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that exited"""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def when_ready(server):
+    """With preload_app, also import the modules the app only loads on first use, before workers fork"""
+    if server.cfg.preload_app:
+        from app.services.startup import preload_modules
+
+        server.log.info("Preloaded crawl4ai and playwright in %.2fs", preload_modules())
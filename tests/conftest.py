@@ -0,0 +1,39 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+import os
+import tempfile
+
+from aiohttp import web
+import pytest
+
+# Settings are read when app.config is imported, so point every on-disk store
+# at a scratch directory and keep browsers out of the tests before that happens
+_scratch = tempfile.mkdtemp(prefix="crawl4ai_tests_")
+for name, value in {
+    "CRAWL4AI_JOB_DB_PATH": os.path.join(_scratch, "jobs.db"),
+    "CRAWL4AI_CACHE_DISK_PATH": "",
+    "CRAWL4AI_LLM_CACHE_PATH": "",
+    "CRAWL4AI_RECRAWL_INDEX_PATH": os.path.join(_scratch, "fingerprints.db"),
+    "CRAWL4AI_SESSION_STORE_DIR": os.path.join(_scratch, "sessions"),
+    "CRAWL4AI_SINK_URI": os.path.join(_scratch, "results"),
+    "CRAWL4AI_POOL_MIN_BROWSERS": "0",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def serve():
+    """Serve an aiohttp app on a free local port in the running loop: ``async with serve(app) as base_url``"""
+    @asynccontextmanager
+    async def start(app: web.Application) -> AsyncIterator[str]:
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            yield f"http://127.0.0.1:{port}"
+        finally:
+            await runner.cleanup()
+
+    return start
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import BACKGROUND, BATCH, INTERACTIVE, AdmissionController, AdmissionRejected
+
+
+def _controller(**kwargs) -> AdmissionController:
+    options = {"max_units": 2, "max_queue": 10, "queue_timeout": 5.0, "max_batch_units": 2, "key_limit": 0, "key_limits": {}}
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    async def scenario():
+        controller = _controller(max_units=1)
+        held = await controller.acquire()
+        order = []
+
+        async def wait(name, priority):
+            ticket = await controller.acquire(priority=priority)
+            order.append(name)
+            ticket.release()
+
+        tasks = []
+        for name, priority in [("job", BACKGROUND), ("batch-1", BATCH), ("call-1", INTERACTIVE), ("batch-2", BATCH), ("call-2", INTERACTIVE)]:
+            tasks.append(asyncio.create_task(wait(name, priority)))
+            await asyncio.sleep(0)
+        assert controller.queued == 5
+        held.release()
+        await asyncio.gather(*tasks)
+        return order, controller
+
+    order, controller = asyncio.run(scenario())
+    assert order == ["call-1", "call-2", "batch-1", "batch-2", "job"]
+    assert controller.in_use == 0 and controller.queued == 0
+
+
+def test_new_requests_queue_behind_waiters_of_the_same_class():
+    async def scenario():
+        controller = _controller(max_units=2)
+        big = await controller.acquire(units=2, priority=BATCH)
+        waiter = asyncio.create_task(controller.acquire(units=2, priority=BATCH))
+        await asyncio.sleep(0)
+        big.release()
+        # The waiter got the freed units, so a new arrival has to queue
+        second = asyncio.create_task(controller.acquire(units=1, priority=BATCH))
+        await asyncio.sleep(0)
+        assert not second.done()
+        (await waiter).release()
+        (await second).release()
+        return controller
+
+    assert asyncio.run(scenario()).in_use == 0
+
+
+def test_key_quota_is_a_429_and_is_released_with_the_ticket():
+    async def scenario():
+        controller = _controller(max_units=10, key_limits={"team": 2})
+        first = await controller.acquire(units=2, key="team")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire(key="team")
+        other = await controller.acquire(key="someone-else")
+        first.release()
+        again = await controller.acquire(key="team")
+        again.release()
+        other.release()
+        return rejected.value, controller
+
+    rejected, controller = asyncio.run(scenario())
+    assert rejected.status_code == 429 and rejected.reason == "quota"
+    assert rejected.headers["Retry-After"] == str(rejected.retry_after)
+    assert controller.stats()["active_keys"] == 0
+
+
+def test_full_queue_and_queue_timeout_are_503s():
+    async def scenario():
+        controller = _controller(max_units=1, max_queue=1, queue_timeout=0.05)
+        held = await controller.acquire()
+        queued = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as full:
+            await controller.acquire()
+        with pytest.raises(AdmissionRejected) as timed_out:
+            await queued
+        # Background work is not bounded by the queue or its timeout
+        background = asyncio.create_task(controller.acquire(priority=BACKGROUND))
+        await asyncio.sleep(0.1)
+        held.release()
+        (await background).release()
+        return full.value, timed_out.value, controller
+
+    full, timed_out, controller = asyncio.run(scenario())
+    assert (full.status_code, full.reason) == (503, "queue_full")
+    assert (timed_out.status_code, timed_out.reason) == (503, "timeout")
+    assert controller.in_use == 0 and controller.queued == 0
+
+
+def test_cancelled_waiter_gives_back_its_place():
+    async def scenario():
+        controller = _controller(max_units=1)
+        held = await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire(key="team"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        held.release()
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.in_use == 0 and controller.queued == 0
+    assert controller.stats()["active_keys"] == 0
@@ -0,0 +1,69 @@
+from datetime import datetime
+import asyncio
+
+from app.models.requests import BatchCrawlRequest
+from app.models.responses import BaseCrawlResponse, BatchMetadata, CrawlMetadata, URLError, URLResult
+from app.services.crawler import CrawlerService
+from app.services.retry import CrawlError
+from app.services.scheduler import HostScheduler
+
+
+class FakeCrawls(CrawlerService):
+    """CrawlerService whose pages come back instantly; /fail/ URLs raise a permanent error"""
+
+    def __init__(self):
+        super().__init__(scheduler=HostScheduler())
+        self.crawled = []
+
+    async def crawl_url(self, request, budget=None, max_attempts=None):
+        url = str(request.url)
+        self.crawled.append(url)
+        await asyncio.sleep(0)
+        if "/fail/" in url:
+            raise CrawlError(f"HTTP 404 from {url}", 404)
+        metadata = CrawlMetadata(crawl_time=datetime.utcnow(), status_code=200, headers={}, final_url=url)
+        return BaseCrawlResponse(url=url, markdown="page", metadata=metadata)
+
+
+def _urls(count: int, path: str = "page"):
+    return [f"https://host-{i % 7}.example/{path}/{i}" for i in range(count)]
+
+
+def test_results_stream_with_a_trailer_and_progress():
+    service = FakeCrawls()
+    request = BatchCrawlRequest(urls=_urls(20) + _urls(5, "fail") + _urls(3), global_concurrent_limit=4)
+    progress = []
+
+    async def on_progress(completed, total):
+        progress.append((completed, total))
+
+    async def collect():
+        return [item async for item in service.crawl_batch_stream(request, on_progress)]
+
+    items = asyncio.run(collect())
+    metadata = items[-1]
+    assert isinstance(metadata, BatchMetadata)
+    assert sum(isinstance(item, URLResult) for item in items) == metadata.successful_count == 20
+    assert sum(isinstance(item, URLError) for item in items) == metadata.failed_count == 5
+    assert metadata.duplicate_count == 3
+    assert progress[-1] == (25, 25) and len(progress) == 25
+
+
+def test_a_paused_consumer_stops_the_crawl():
+    service = FakeCrawls()
+    limit = 4
+    request = BatchCrawlRequest(urls=_urls(200), global_concurrent_limit=limit)
+
+    async def read_one_then_pause():
+        stream = service.crawl_batch_stream(request)
+        await stream.__anext__()
+        await asyncio.sleep(0.2)
+        crawled_while_paused = len(service.crawled)
+        remaining = [item async for item in stream]
+        return crawled_while_paused, remaining
+
+    crawled_while_paused, remaining = asyncio.run(read_one_then_pause())
+    # Crawling limit plus result queue, plus the slot the consumed result gave back
+    assert crawled_while_paused <= 2 * limit + 1
+    assert len(remaining) == 200
+    assert len(service.crawled) == 200
@@ -0,0 +1,119 @@
+from types import SimpleNamespace
+import asyncio
+import os
+
+import psutil
+import pytest
+
+from app.services.browser_pool import BrowserPool, PooledBrowser, PoolTimeoutError
+
+
+class FakeCrawler:
+    def __init__(self):
+        self.crawler_strategy = SimpleNamespace(browser_manager=None)
+        self.ready = True
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def _pool(launch_seconds: float = 0.0, **kwargs) -> BrowserPool:
+    options = {"min_browsers": 0, "max_browsers": 2, "max_pages_per_browser": 1, "health_check_interval": 0, "memory_threshold_mb": None}
+    options.update(kwargs)
+    pool = BrowserPool(**options)
+    pool.launched = []
+
+    async def launch():
+        await asyncio.sleep(launch_seconds)
+        entry = PooledBrowser(FakeCrawler())
+        pool.launched.append(entry)
+        pool._stats["launches"] += 1
+        return entry
+
+    pool._launch = launch
+    return pool
+
+
+def test_pages_spread_over_browsers_up_to_the_limit():
+    async def scenario():
+        pool = _pool(acquire_timeout=0.05)
+        async with pool.acquire() as first, pool.acquire() as second:
+            assert first is not second
+            with pytest.raises(PoolTimeoutError):
+                async with pool.acquire():
+                    pass
+        async with pool.acquire() as again:
+            assert again in (first, second)
+        await pool.close()
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert pool.stats()["launches"] == 2 and pool.stats()["timeouts"] == 1
+    assert all(entry.crawler.closed for entry in pool.launched)
+
+
+def test_cancelled_checkout_keeps_the_launched_browser():
+    async def scenario():
+        pool = _pool(launch_seconds=0.2, acquire_timeout=0.05)
+        with pytest.raises(PoolTimeoutError):
+            async with pool.acquire():
+                pass
+        await asyncio.sleep(0.3)
+        stats = pool.stats()
+        async with pool.acquire():
+            pass
+        await pool.close()
+        return stats, pool
+
+    stats, pool = asyncio.run(scenario())
+    assert (stats["browsers"], stats["launching"], stats["active_pages"]) == (1, 0, 0)
+    assert len(pool.launched) == 1
+
+
+def test_health_top_up_reserves_launch_slots():
+    async def scenario():
+        pool = _pool(launch_seconds=0.05, min_browsers=2, max_browsers=2, max_pages_per_browser=4)
+        checkouts = [asyncio.create_task(pool._checkout()) for _ in range(2)]
+        await asyncio.sleep(0)
+        await asyncio.gather(pool.check_health(), *checkouts)
+        stats = pool.stats()
+        await pool.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["browsers"] == 2 and stats["launching"] == 0
+
+
+def test_dead_browsers_are_health_failures_not_recycles():
+    async def scenario():
+        pool = _pool(recycle_after_pages=2)
+        async with pool.acquire() as healthy, pool.acquire() as dead:
+            dead.ready = False
+        await pool.check_health()
+        await pool.check_health()
+        dead_removed = [b.crawler for b in pool._browsers] == [healthy]
+        async with pool.acquire():
+            pass
+        stats = pool.stats()
+        await pool.close()
+        return dead_removed, stats
+
+    dead_removed, stats = asyncio.run(scenario())
+    assert dead_removed
+    # The healthy browser reached recycle_after_pages; the dead one only counts as a failure
+    assert stats["recycles"] == 1 and stats["health_failures"] == 1
+
+
+def test_memory_counts_only_pool_browser_processes():
+    async def scenario():
+        pool = _pool()
+        async with pool.acquire():
+            pass
+        pool._browsers[0].pids = [os.getpid()]
+        memory_mb = pool._browser_memory_mb()
+        await pool.close()
+        return memory_mb
+
+    own_mb = psutil.Process().memory_info().rss / (1024 * 1024)
+    assert asyncio.run(scenario()) == pytest.approx(own_mb, rel=0.2)
@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+from app.models.requests import BaseCrawlRequest, FetchMode, SessionConfig
+from app.services.cache import CacheEntry, DiskCacheTier, MemoryCacheTier, ResponseCache, cache_key
+from app.services.crawler import CrawlerService
+from app.services.http_fetch import HTTPFetcher
+from app.services.scheduler import HostScheduler
+
+ARTICLE = "<html><head><title>Cached</title></head><body><article><h1>Cached page</h1>" + "<p>Some text about caching. </p>" * 40 + "</article></body></html>"
+
+
+def _site(requests):
+    async def page(request: web.Request) -> web.Response:
+        requests.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers={"ETag": '"v1"'})
+        return web.Response(text=ARTICLE, content_type="text/html", headers={"ETag": '"v1"'})
+
+    app = web.Application()
+    app.router.add_get("/page", page)
+    return app
+
+
+def test_cache_key_covers_options_but_not_url_noise():
+    base = BaseCrawlRequest(url="https://Example.com/a?x=1#top")
+    assert cache_key(base) == cache_key(BaseCrawlRequest(url="https://example.com/a?x=1"))
+    assert cache_key(base) != cache_key(BaseCrawlRequest(url="https://example.com/a?x=1", fast_mode=True))
+    assert cache_key(base) != cache_key(BaseCrawlRequest(url="https://example.com/a?x=1", session_id="s1"))
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    memory = MemoryCacheTier(max_bytes=250)
+    for key in "abc":
+        memory.set(CacheEntry(key, b"x" * 100, time.time()))
+    assert memory.get("a") is None and memory.get("c") is not None
+    assert memory.evictions == 1
+
+
+def test_disk_tier_is_shared_between_caches(tmp_path):
+    path = str(tmp_path / "cache.db")
+
+    async def scenario():
+        writer = ResponseCache(memory_max_bytes=1 << 20, disk_path=path, disk_max_bytes=1 << 20, default_ttl=60)
+        reader = ResponseCache(memory_max_bytes=1 << 20, disk_path=path, disk_max_bytes=1 << 20, default_ttl=60)
+        await writer.store("key", b"payload", {"ETag": '"v1"'})
+        return await reader.lookup("key")
+
+    entry, tier = asyncio.run(scenario())
+    assert tier == "disk" and entry.payload == b"payload" and entry.etag == '"v1"'
+    assert DiskCacheTier(path, 1 << 20).stats()["entries"] == 1
+
+
+def test_stale_entries_are_revalidated_with_a_conditional_get(serve):
+    requests = []
+
+    async def scenario():
+        cache = ResponseCache(memory_max_bytes=1 << 20, disk_path=None, disk_max_bytes=0, default_ttl=60)
+        service = CrawlerService(cache=cache, fetcher=HTTPFetcher(), scheduler=HostScheduler())
+        try:
+            async with serve(_site(requests)) as base_url:
+                request = BaseCrawlRequest(url=f"{base_url}/page", fetch_mode=FetchMode.HTTP)
+                statuses = [(await service.crawl_url(request)).metadata.cache_status]
+                statuses.append((await service.crawl_url(request)).metadata.cache_status)
+                await asyncio.sleep(0.01)
+                stale = request.model_copy(update={"max_age": 0})
+                statuses.append((await service.crawl_url(stale)).metadata.cache_status)
+            return statuses, await cache.stats()
+        finally:
+            await service.http_fetcher.close()
+
+    statuses, stats = asyncio.run(scenario())
+    assert statuses == ["miss", "hit", "revalidated"]
+    assert requests == [None, '"v1"']
+    assert (stats["misses"], stats["memory_hits"], stats["revalidated"]) == (1, 1, 1)
+
+
+def test_login_pages_are_not_revalidated_anonymously_and_count_as_misses(serve):
+    requests = []
+
+    async def scenario():
+        cache = ResponseCache(memory_max_bytes=1 << 20, disk_path=None, disk_max_bytes=0, default_ttl=60)
+        service = CrawlerService(cache=cache, fetcher=HTTPFetcher(), scheduler=HostScheduler())
+        try:
+            async with serve(_site(requests)) as base_url:
+                request = BaseCrawlRequest(
+                    url=f"{base_url}/page", fetch_mode=FetchMode.HTTP, session_config=SessionConfig(auth_required=True)
+                )
+                await service.crawl_url(request)
+                await asyncio.sleep(0.01)
+                stale = request.model_copy(update={"max_age": 0})
+                status = (await service.crawl_url(stale)).metadata.cache_status
+            return status, await cache.stats()
+        finally:
+            await service.http_fetcher.close()
+
+    status, stats = asyncio.run(scenario())
+    assert status == "miss"
+    assert requests == [None, None]
+    assert (stats["stale"], stats["misses"], stats["revalidated"]) == (1, 2, 0)
+    assert stats["hit_ratio"] == 0.0
@@ -0,0 +1,126 @@
+from datetime import datetime
+from typing import Any, Dict, List
+import asyncio
+from collections import Counter
+
+from app.models.requests import BatchCrawlRequest, SinkConfig
+from app.models.responses import BatchMetadata, CrawlMetadata, URLError, URLResult
+from app.services.cluster import ClusterCoordinator, HashRing, _NodeUnavailable
+from app.services.urls import normalize_url
+
+NODES = ["http://node-a", "http://node-b", "http://node-c"]
+
+
+def _result(url: str) -> URLResult:
+    return URLResult(
+        url=url,
+        markdown="page",
+        metadata=CrawlMetadata(crawl_time=datetime.utcnow(), status_code=200, headers={}, final_url=url),
+    )
+
+
+class FakeCluster(ClusterCoordinator):
+    """Coordinator whose nodes answer in-process; nodes in ``dead`` fail after ``fail_after`` results"""
+
+    def __init__(self, dead: Dict[str, int] = None, **kwargs: Any):
+        super().__init__(nodes=NODES, node_cooldown=60, **kwargs)
+        self.dead = dead or {}
+        self.bodies: List[Dict[str, Any]] = []
+
+    async def _stream_shard(self, node, body, remaining, queue) -> BatchMetadata:
+        self.bodies.append(body)
+        reported = 0
+        for url in list(remaining.values()):
+            if node in self.dead and reported >= self.dead[node]:
+                raise _NodeUnavailable("connection reset")
+            remaining.pop(normalize_url(url))
+            await queue.put(("item", node, _result(url)))
+            reported += 1
+        if node in self.dead:
+            raise _NodeUnavailable("stream ended before the batch trailer")
+        return BatchMetadata(start_time=datetime.utcnow(), total_urls=reported, successful_count=reported, failed_count=0)
+
+
+async def _collect(cluster: ClusterCoordinator, request: BatchCrawlRequest) -> List[Any]:
+    return [item async for item in cluster.crawl_batch_stream(request)]
+
+
+def test_preference_lists_every_node_once_starting_at_the_home_node():
+    ring = HashRing(NODES, virtual_nodes=160)
+    for host in ("example.com", "example.org", "docs.python.org"):
+        preference = list(ring.preference(host))
+        assert sorted(preference) == sorted(NODES)
+        assert ring.node_for(host) == preference[0]
+        assert ring.node_for(host, down=[preference[0]]) == preference[1]
+    assert ring.node_for("example.com", down=NODES) is None
+
+
+def test_preference_is_stable_when_a_node_is_added():
+    hosts = [f"host-{i}.example" for i in range(500)]
+    before = HashRing(NODES, virtual_nodes=160)
+    after = HashRing(NODES + ["http://node-d"], virtual_nodes=160)
+    moved = [h for h in hosts if before.node_for(h) != after.node_for(h)]
+    # Only hosts taken over by the new node move
+    assert all(after.node_for(h) == "http://node-d" for h in moved)
+    assert 0 < len(moved) < len(hosts) / 2
+
+
+def test_route_keeps_hosts_together_and_splits_by_shard_size():
+    cluster = ClusterCoordinator(nodes=NODES, shard_size=4)
+    urls = [f"https://big.example/{i}" for i in range(10)] + [f"https://small-{i}.example/" for i in range(6)]
+    shards, unroutable = cluster.route(urls)
+    assert unroutable == []
+    assert sorted(url for _, shard in shards for url in shard) == sorted(urls)
+    assert all(len(shard) <= 4 for _, shard in shards)
+    home = cluster.ring.node_for("big.example")
+    assert {node for node, shard in shards if any("big.example" in url for url in shard)} == {home}
+
+
+def test_route_skips_down_nodes_and_reports_unroutable_urls():
+    cluster = ClusterCoordinator(nodes=NODES)
+    for node in NODES:
+        cluster._mark_down(node, "test")
+    shards, unroutable = cluster.route(["https://example.com/"])
+    assert shards == [] and unroutable == ["https://example.com/"]
+
+
+def test_failed_node_urls_are_reassigned_once_each():
+    urls = [f"https://host-{i}.example/page" for i in range(30)]
+    cluster = FakeCluster(shard_size=5)
+    victim = cluster.ring.node_for("host-0.example")
+    cluster.dead = {victim: 1}
+    items = asyncio.run(_collect(cluster, BatchCrawlRequest(urls=urls)))
+
+    metadata = items[-1]
+    results = items[:-1]
+    assert isinstance(metadata, BatchMetadata)
+    assert all(isinstance(item, URLResult) for item in results)
+    assert Counter(str(item.url) for item in results) == Counter(urls)
+    assert metadata.successful_count == len(urls) and metadata.failed_count == 0
+    assert metadata.cluster.reassigned_shards >= 1
+    assert metadata.cluster.shards == cluster.stats()["shards"]
+    assert sum(metadata.cluster.urls_by_node.values()) == len(urls)
+    assert victim in cluster.down_nodes()
+
+
+def test_urls_fail_once_every_node_is_down():
+    urls = [f"https://host-{i}.example/" for i in range(6)]
+    cluster = FakeCluster(dead={node: 0 for node in NODES}, max_reassignments=5)
+    items = asyncio.run(_collect(cluster, BatchCrawlRequest(urls=urls)))
+    assert sorted(str(item.url) for item in items[:-1]) == sorted(urls)
+    assert all(isinstance(item, URLError) and item.retryable for item in items[:-1])
+    assert items[-1].failed_count == len(urls)
+
+
+def test_shard_bodies_leave_the_sink_to_the_coordinator():
+    urls = [f"https://host-{i}.example/" for i in range(4)]
+    cluster = FakeCluster()
+    request = BatchCrawlRequest(urls=urls, sink=SinkConfig(format="jsonl"), no_cache=True)
+    asyncio.run(_collect(cluster, request))
+    assert cluster.bodies
+    for body in cluster.bodies:
+        assert "sink" not in body
+        assert body["no_cache"] is True
+        # The node accepts the body its /crawl/batch/stream would get from a client
+        BatchCrawlRequest.model_validate(body)
+    assert sorted(url for body in cluster.bodies for url in body["urls"]) == sorted(urls)
@@ -0,0 +1,25 @@
+from app.services.frontier import BloomFilter, url_key
+
+
+def test_added_keys_are_always_found():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [url_key(f"https://example.com/{i}") for i in range(1000)]
+    # A key may already look present (a false positive), so a few adds report False
+    added = sum(bloom.add(key) for key in keys)
+    assert added > 980 and bloom.count == added
+    assert all(key in bloom for key in keys)
+    assert not bloom.add(keys[0])
+    assert bloom.count == added
+
+
+def test_false_positive_rate_stays_near_the_target():
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    for i in range(5000):
+        bloom.add(url_key(f"https://example.com/seen/{i}"))
+    false_positives = sum(url_key(f"https://example.com/unseen/{i}") in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.02
+
+
+def test_url_keys_use_the_normalized_url():
+    assert url_key("https://Example.com/a?b=1#frag") == url_key("https://example.com/a?b=1")
+    assert url_key("https://example.com/a") != url_key("https://example.com/b")
@@ -0,0 +1,161 @@
+import asyncio
+from datetime import datetime
+
+from aiohttp import web
+
+from app.models.requests import BaseCrawlRequest, FetchMode, SessionConfig
+from app.models.responses import BaseCrawlResponse, CrawlMetadata
+from app.services.cache import ResponseCache
+from app.services.crawler import CrawlerService
+from app.services.html_extract import ExtractedResources
+from app.services.http_fetch import HTTPFetcher, HostTierMemory, detect_js_shell
+from app.services.scheduler import HostScheduler
+
+ARTICLE = "<html><head><title>Static</title></head><body><article><h1>Static page</h1>" + "<p>Plain server rendered text. </p>" * 40 + "</article></body></html>"
+SPA_SHELL = '<html><head><title>App</title></head><body><div id="root"></div><script src="/app.js"></script></body></html>'
+NOSCRIPT_SHELL = "<html><body><noscript>You need to enable JavaScript to run this app.</noscript><script src=\"/app.js\"></script></body></html>"
+
+
+def _site(hits):
+    async def page(request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        hits.append(name)
+        if name == "static":
+            return web.Response(text=ARTICLE, content_type="text/html")
+        if name == "nocharset":
+            return web.Response(body=ARTICLE.encode(), headers={"Content-Type": "text/html"})
+        if name == "spa":
+            return web.Response(text=SPA_SHELL, content_type="text/html")
+        if name == "noscript":
+            return web.Response(text=NOSCRIPT_SHELL, content_type="text/html")
+        if name == "blocked":
+            return web.Response(status=403, text="<html><body>Access denied</body></html>", content_type="text/html")
+        if name == "plain":
+            return web.Response(text="just some text", content_type="text/plain")
+        return web.Response(body=b"\x89PNG\r\n", content_type="image/png")
+
+    app = web.Application()
+    app.router.add_get("/{name}", page)
+    return app
+
+
+class FakeBrowser(CrawlerService):
+    """Answers the browser tier without launching Chromium, recording which URLs reached it"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.rendered = []
+
+    async def _render_in_browser(self, request: BaseCrawlRequest) -> BaseCrawlResponse:
+        self.rendered.append(str(request.url))
+        url = str(request.url)
+        metadata = CrawlMetadata(crawl_time=datetime.utcnow(), status_code=200, headers={}, final_url=url)
+        return self._build_response(request, "# Rendered", ExtractedResources(url), metadata)
+
+
+def _service() -> FakeBrowser:
+    cache = ResponseCache(memory_max_bytes=1 << 20, disk_path=None, disk_max_bytes=0, default_ttl=60)
+    return FakeBrowser(cache=cache, fetcher=HTTPFetcher(), scheduler=HostScheduler())
+
+
+def _crawl(serve, paths, fetch_mode=FetchMode.AUTO, **request_fields):
+    """Crawl each path against a fresh local site and service; returns (responses, service, hits)"""
+    hits = []
+
+    async def scenario():
+        service = _service()
+        try:
+            async with serve(_site(hits)) as base_url:
+                responses = []
+                for path in paths:
+                    request = BaseCrawlRequest(url=f"{base_url}/{path}", fetch_mode=fetch_mode, **request_fields)
+                    responses.append(await service.crawl_url(request))
+                return responses, service
+        finally:
+            await service.http_fetcher.close()
+
+    responses, service = asyncio.run(scenario())
+    return responses, service, hits
+
+
+def test_detect_js_shell():
+    assert detect_js_shell(ARTICLE) is None
+    assert detect_js_shell(SPA_SHELL) == "spa_root"
+    assert detect_js_shell(NOSCRIPT_SHELL) == "noscript"
+    assert detect_js_shell("<html><body><script>render()</script></body></html>") == "empty_body"
+    # A mount point next to a real article is server rendered, not a shell
+    assert detect_js_shell(ARTICLE.replace("<article>", '<div id="root"></div><article>')) is None
+
+
+def test_static_pages_are_served_over_http(serve):
+    (response,), service, hits = _crawl(serve, ["static"])
+    assert response.metadata.fetch_tier == "http"
+    assert response.metadata.escalation_reason is None
+    assert "Static page" in response.markdown
+    assert service.rendered == [] and hits == ["static"]
+    assert service.http_fetcher.stats()["served"] == 1
+
+
+def test_pages_without_a_charset_are_read_as_utf8(serve):
+    (response,), service, _ = _crawl(serve, ["nocharset"])
+    assert response.metadata.fetch_tier == "http"
+    assert "Static page" in response.markdown
+
+
+def test_js_shells_escalate_to_the_browser(serve):
+    responses, service, _ = _crawl(serve, ["spa", "noscript"])
+    assert [r.metadata.fetch_tier for r in responses] == ["browser", "browser"]
+    assert [r.metadata.escalation_reason for r in responses] == ["spa_root", "noscript"]
+    assert all(r.markdown == "# Rendered" for r in responses)
+    assert len(service.rendered) == 2
+
+
+def test_blocked_and_non_html_responses_escalate(serve):
+    responses, service, _ = _crawl(serve, ["blocked", "image"])
+    assert [r.metadata.escalation_reason for r in responses] == ["blocked_status", "content_type"]
+    assert service.http_fetcher.stats()["escalations"] == {"blocked_status": 1, "content_type": 1}
+
+
+def test_plain_text_is_served_without_a_browser(serve):
+    (response,), service, _ = _crawl(serve, ["plain"])
+    assert response.metadata.fetch_tier == "http"
+    assert response.markdown == "just some text"
+    assert service.rendered == []
+
+
+def test_hosts_that_keep_escalating_skip_the_static_fetch(serve):
+    responses, service, hits = _crawl(serve, ["spa", "noscript", "static"])
+    # The third page goes straight to the browser without a static probe
+    assert hits == ["spa", "noscript"]
+    assert responses[2].metadata.escalation_reason == "host_memory"
+    assert len(service.http_fetcher.stats()["memory"]["browser_hosts"]) == 1
+
+
+def test_forced_http_mode_never_renders(serve):
+    responses, service, _ = _crawl(serve, ["spa", "blocked"], fetch_mode=FetchMode.HTTP)
+    assert [r.metadata.fetch_tier for r in responses] == ["http", "http"]
+    assert responses[1].metadata.status_code == 403
+    assert service.rendered == []
+
+
+def test_browser_mode_and_logins_skip_the_http_tier(serve):
+    _, service, hits = _crawl(serve, ["static"], fetch_mode=FetchMode.BROWSER)
+    assert hits == [] and len(service.rendered) == 1
+
+    _, service, hits = _crawl(serve, ["static"], session_config=SessionConfig(auth_required=True))
+    assert hits == [] and len(service.rendered) == 1
+
+
+def test_host_memory_needs_escalations_to_outnumber_successes():
+    memory = HostTierMemory(ttl=60, min_escalations=2)
+    memory.record("a.test", escalated=True)
+    assert not memory.prefers_browser("a.test")
+    memory.record("a.test", escalated=True)
+    assert memory.prefers_browser("a.test")
+    memory.record("a.test", escalated=False)
+    memory.record("a.test", escalated=False)
+    assert not memory.prefers_browser("a.test")
+
+    expired = HostTierMemory(ttl=0, min_escalations=1)
+    expired.record("b.test", escalated=True)
+    assert not expired.prefers_browser("b.test")
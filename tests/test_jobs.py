@@ -0,0 +1,145 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime, timedelta
+import asyncio
+
+from app.models.requests import BatchCrawlRequest
+from app.models.responses import BatchCrawlResponse, BatchMetadata
+from app.services.jobs import CANCELLED, COMPLETED, PENDING, RUNNING, JobStore, JobWorker
+
+
+def _store(tmp_path, **kwargs) -> JobStore:
+    return JobStore(str(tmp_path / "jobs.db"), **kwargs)
+
+
+def _request(*paths: str) -> BatchCrawlRequest:
+    return BatchCrawlRequest(urls=[f"https://example.com/{path}" for path in paths])
+
+
+def test_jobs_are_claimed_oldest_first_and_only_once(tmp_path):
+    store = _store(tmp_path)
+    first = store.enqueue(_request("a", "b"))
+    second = store.enqueue(_request("c"))
+    assert first.status == PENDING and first.total_count == 2
+
+    job_id, request = store.claim_next("worker-1")
+    assert job_id == first.job_id
+    assert [str(url) for url in request.urls] == ["https://example.com/a", "https://example.com/b"]
+    assert store.get(job_id).status == RUNNING
+    assert store.claim_next("worker-2")[0] == second.job_id
+    assert store.claim_next("worker-3") is None
+
+
+def test_concurrent_workers_never_claim_the_same_job(tmp_path):
+    store = _store(tmp_path)
+    jobs = {store.enqueue(_request(str(i))).job_id for i in range(20)}
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        claims = list(pool.map(lambda i: store.claim_next(f"worker-{i}"), range(30)))
+    claimed = [claim[0] for claim in claims if claim]
+    assert sorted(claimed) == sorted(jobs)
+
+
+def test_cancel_pending_and_running_jobs(tmp_path):
+    store = _store(tmp_path)
+    pending = store.enqueue(_request("a"))
+    running = store.enqueue(_request("b", "c"))
+
+    cancelled = store.cancel(pending.job_id)
+    assert cancelled.status == CANCELLED
+    # A cancelled job is never handed to a worker
+    job_id, _ = store.claim_next("worker")
+    assert job_id == running.job_id
+
+    assert store.update_progress(job_id, 1, 2) is False
+    assert store.cancel(job_id).status == RUNNING
+    # The worker learns about it on its next progress write or heartbeat
+    assert store.update_progress(job_id, 2, 2) is True
+    assert store.heartbeat(job_id) is True
+    store.finish(job_id, CANCELLED, "Job cancelled")
+    assert store.get(job_id).status == CANCELLED
+    assert store.cancel("no-such-job") is None
+
+
+def test_stale_running_jobs_are_requeued(tmp_path):
+    store = _store(tmp_path)
+    stale = store.enqueue(_request("a"))
+    fresh = store.enqueue(_request("b"))
+    store.claim_next("lost-worker")
+    store.claim_next("live-worker")
+    old = (datetime.utcnow() - timedelta(minutes=10)).isoformat()
+    with closing(store._connect()) as conn:
+        conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ?", (old, stale.job_id))
+
+    assert store.requeue_stale(stale_after=60) == 1
+    assert store.get(stale.job_id).status == PENDING
+    assert store.get(fresh.job_id).status == RUNNING
+    assert store.claim_next("new-worker")[0] == stale.job_id
+
+
+def test_finished_results_are_paged_and_expire(tmp_path):
+    store = _store(tmp_path, result_ttl=0)
+    job_id = store.enqueue(_request("a", "b", "c")).job_id
+    store.claim_next("worker")
+    items = [(f"https://example.com/{name}", ok, '{"ok": %s}' % str(ok).lower()) for name, ok in (("a", True), ("b", False), ("c", True))]
+    store.finish(job_id, COMPLETED, "done", {"metadata": None}, items)
+
+    status = store.get(job_id)
+    assert status.status == COMPLETED and status.progress == 100.0
+    total, rows = store.results(job_id, offset=1, limit=5)
+    assert total == 3 and [row["url"] for row in rows] == ["https://example.com/b", "https://example.com/c"]
+    assert store.results(job_id, 0, 5, ok=False)[0] == 1
+    assert store.result_for(job_id, "https://example.com/c")["ok"] == 1
+
+    expiring = _store(tmp_path, result_ttl=1)
+    job_id = expiring.enqueue(_request("d")).job_id
+    expiring.finish(job_id, COMPLETED, "done")
+    with closing(expiring._connect()) as conn:
+        conn.execute("UPDATE jobs SET expires_at = ? WHERE job_id = ?", (datetime.utcnow().isoformat(), job_id))
+    assert expiring.get(job_id) is None
+    assert expiring.purge_expired() == 1
+
+
+class CountingStore(JobStore):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.progress_writes = []
+
+    def update_progress(self, job_id, completed, total):
+        self.progress_writes.append(completed)
+        return super().update_progress(job_id, completed, total)
+
+
+class FakeCrawler:
+    """Reports progress for every URL without crawling, optionally stopping short of the total"""
+
+    def __init__(self, report: int = None):
+        self.report = report
+
+    async def crawl_batch(self, request, progress_callback):
+        total = len(request.urls)
+        for completed in range(1, (self.report or total) + 1):
+            await progress_callback(completed, total)
+        metadata = BatchMetadata(start_time=datetime.utcnow(), total_urls=total, successful_count=0, failed_count=0)
+        return BatchCrawlResponse(successful_urls=[], failed_urls=[], metadata=metadata)
+
+
+def _run_job(store, crawler, request):
+    job_id = store.enqueue(request).job_id
+    claimed_id, claimed = store.claim_next("worker")
+    worker = JobWorker(store, crawler, progress_interval=60)
+    asyncio.run(worker._execute(claimed_id, claimed))
+    return store.get(job_id)
+
+
+def test_progress_writes_are_throttled_with_a_final_write(tmp_path):
+    store = CountingStore(str(tmp_path / "jobs.db"))
+    status = _run_job(store, FakeCrawler(), _request(*map(str, range(500))))
+    assert store.progress_writes == [1, 500]
+    assert status.status == COMPLETED and status.completed_count == 500
+
+
+def test_last_progress_is_written_when_the_crawl_stops_short(tmp_path):
+    store = CountingStore(str(tmp_path / "jobs.db"))
+    status = _run_job(store, FakeCrawler(report=120), _request(*map(str, range(500))))
+    assert store.progress_writes == [1, 120]
+    assert status.completed_count == 120
@@ -0,0 +1,181 @@
+from typing import Any, List
+import asyncio
+import time
+
+import pytest
+
+from app.models.requests import ExtractionType, LLMConfig
+from app.services import llm_providers
+from app.services.cache import ResponseCache
+from app.services.llm import PROMPT_OVERHEAD_TOKENS, LLMEngine, _merge_structured, chunk_markdown, count_tokens
+from app.services.llm_providers import (
+    COMBINE, LLMProvider, LLMResponseError, MockProvider, RateLimiter, register_provider
+)
+
+PAGE = "# Pricing\n\nThe basic plan costs ten dollars. The pro plan costs twenty dollars. Both renew monthly."
+
+
+class ScriptedProvider(LLMProvider):
+    """Answers each call with the next scripted answer"""
+
+    name = "scripted"
+    supports_batching = False
+
+    def __init__(self, answers: List[Any]):
+        self.answers = list(answers)
+
+    async def complete(self, call) -> List[Any]:
+        return [self.answers.pop(0) for _ in call.documents]
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(llm_providers, "_providers", {})
+    return LLMEngine(memo=ResponseCache(memory_max_bytes=1 << 20, disk_path=None, disk_max_bytes=0, default_ttl=60), batch_window=0)
+
+
+def test_mock_provider_is_opt_in():
+    assert "mock" not in llm_providers._providers
+
+
+def test_results_are_memoized(engine):
+    provider = MockProvider(record_calls=10)
+    register_provider(provider)
+    config = LLMConfig(provider="mock")
+
+    async def twice():
+        return [await engine.extract(PAGE, ExtractionType.QA, config=config) for _ in range(2)]
+
+    first, second = asyncio.run(twice())
+    assert first == second == [{"question": "What does Pricing say?", "answer": "# Pricing The basic plan costs ten dollars."}]
+    assert len(provider.calls) == 1
+    assert engine.stats()["memo_hits"] == 1
+
+
+@pytest.mark.parametrize("task, answer", [
+    (ExtractionType.QA, [{"question": "Price?"}]),
+    (ExtractionType.QA, {"question": "Price?", "answer": "ten"}),
+    (ExtractionType.SUMMARY, ["not", "a", "string"]),
+    (ExtractionType.SCHEMA, ["not an object"]),
+])
+def test_malformed_answers_raise_and_are_not_memoized(engine, task, answer):
+    register_provider(ScriptedProvider([answer, {"price": "ten"} if task == ExtractionType.SCHEMA else None]))
+    config = LLMConfig(provider="scripted")
+    schema = {"properties": {"price": {"type": "string"}}} if task == ExtractionType.SCHEMA else None
+
+    async def extract():
+        return await engine.extract(PAGE, task, schema=schema, config=config)
+
+    with pytest.raises(LLMResponseError):
+        asyncio.run(extract())
+    entry, _ = asyncio.run(engine.memo.lookup(engine.memo_key(PAGE, task.value, schema, config)))
+    assert entry is None
+    if task == ExtractionType.SCHEMA:
+        # The next call asks the provider again instead of serving a cached fallback
+        assert asyncio.run(extract()) == {"price": "ten"}
+
+
+def _long_page(sections: int = 8) -> str:
+    return "\n\n".join(
+        f"## Section {i}\n\n" + " ".join(f"Section {i} sentence {j} about plans." for j in range(25))
+        for i in range(sections)
+    )
+
+
+def test_chunks_keep_paragraphs_whole_and_fit_the_budget():
+    page = _long_page()
+    chunks = chunk_markdown(page, 300)
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 300 for chunk in chunks)
+    assert "\n\n".join(chunks).split("\n\n") == page.split("\n\n")
+    # A single paragraph over budget falls back to sentence splits
+    oversized = chunk_markdown(" ".join(f"Sentence {i} of one long paragraph." for i in range(400)), 300)
+    assert len(oversized) > 1 and all(count_tokens(chunk) <= 300 for chunk in oversized)
+
+
+def test_long_pages_are_chunked_and_merged(engine):
+    provider = MockProvider(record_calls=100)
+    register_provider(provider)
+    config = LLMConfig(provider="mock", max_input_tokens=500)
+    page = _long_page()
+
+    async def extract():
+        summary = await engine.extract(page, ExtractionType.SUMMARY, config=config)
+        qa = await engine.extract(page, ExtractionType.QA, config=config)
+        return summary, qa
+
+    summary, qa = asyncio.run(extract())
+    chunks = len(chunk_markdown(page, 500 - PROMPT_OVERHEAD_TOKENS))
+    tasks = [call.task for call in provider.calls]
+    assert tasks.count("summary") == chunks and tasks.count("qa") == chunks
+    # Partial summaries are reduced with one more call
+    assert tasks.count(COMBINE) == 1 and summary.startswith("## Section 0 Section 0 sentence 0")
+    # One question per chunk heading, none repeated
+    questions = [pair["question"] for pair in qa]
+    assert len(questions) == len(set(questions)) == chunks
+
+
+def test_structured_results_merge_field_by_field():
+    merged = _merge_structured([{"price": None, "tags": ["a"]}, {"price": "ten", "tags": ["a", "b"]}, {"price": "nine"}])
+    assert merged == {"price": "ten", "tags": ["a", "b"]}
+
+
+def test_small_pages_share_a_call_until_the_window_closes(monkeypatch):
+    monkeypatch.setattr(llm_providers, "_providers", {})
+    provider = MockProvider(record_calls=10)
+    register_provider(provider)
+    memo = ResponseCache(memory_max_bytes=1 << 20, disk_path=None, disk_max_bytes=0, default_ttl=60)
+    engine = LLMEngine(memo=memo, batch_window=0.05, batch_max_documents=2)
+    config = LLMConfig(provider="mock")
+
+    async def extract():
+        pages = [f"# Page {i}\n\nPage {i} is short." for i in range(3)]
+        return await asyncio.gather(*(engine.extract(page, ExtractionType.SUMMARY, config=config) for page in pages))
+
+    summaries = asyncio.run(extract())
+    assert summaries == ["# Page 0 Page 0 is short.", "# Page 1 Page 1 is short.", "# Page 2 Page 2 is short."]
+    # Two documents fill a batch at once; the third goes out when its timer fires
+    assert [len(call.documents) for call in provider.calls] == [2, 1]
+    assert engine.stats()["batched_calls"] == 1 and engine.stats()["pending_batches"] == 0
+
+
+def test_memo_hits_show_in_cache_stats(engine):
+    register_provider(MockProvider())
+    config = LLMConfig(provider="mock")
+
+    async def twice():
+        for _ in range(2):
+            await engine.extract(PAGE, ExtractionType.SUMMARY, config=config)
+        return await engine.memo.stats()
+
+    stats = asyncio.run(twice())
+    assert (stats["memory_hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+
+
+def test_rate_limiter_waits_for_tokens_and_caps_concurrency():
+    async def scenario():
+        limiter = RateLimiter(requests_per_minute=600, max_concurrency=2)
+        limiter.tokens = 0
+        started = time.monotonic()
+        async with limiter:
+            pass
+        waited = time.monotonic() - started
+
+        slots = RateLimiter(requests_per_minute=6000, max_concurrency=2)
+        running = peak = 0
+
+        async def call():
+            nonlocal running, peak
+            async with slots:
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        return limiter, waited, peak
+
+    limiter, waited, peak = asyncio.run(scenario())
+    # An empty bucket refills at ten requests a second
+    assert waited >= 0.09 and limiter.waited_seconds >= 0.09
+    assert peak == 2
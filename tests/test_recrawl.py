@@ -0,0 +1,126 @@
+from datetime import datetime
+import asyncio
+
+from app.models.requests import BatchCrawlRequest
+from app.models.responses import BaseCrawlResponse, BatchMetadata, CrawlMetadata, URLResult
+from app.services.crawler import CrawlerService
+from app.services.recrawl import (
+    CHANGED, MISSING, NEW, REMOVED, UNAVAILABLE, UNCHANGED, ChangeTracker, FingerprintIndex, content_fingerprint,
+    hamming, simhash,
+)
+from app.services.scheduler import HostScheduler
+
+ARTICLE = " ".join(f"Paragraph {i} talks about crawling pages politely and caching what comes back." for i in range(40))
+
+
+def test_simhash_is_close_for_small_edits_and_far_for_different_text():
+    base = simhash(ARTICLE)
+    assert simhash(ARTICLE) == base
+    assert simhash(ARTICLE.upper()) == base
+    assert hamming(base, simhash(ARTICLE.replace("Paragraph 7 ", "Paragraph seven "))) <= 6
+    assert hamming(base, simhash("An entirely different page about gardening, tomatoes and soil.")) > 16
+    assert simhash("") == 0
+
+
+def test_content_fingerprint_ignores_whitespace():
+    assert content_fingerprint("a  b\n\nc") == content_fingerprint("a b c")
+
+
+def test_change_tracker_classifies_against_the_previous_run(tmp_path):
+    index = FingerprintIndex(str(tmp_path / "fingerprints.db"))
+    urls = ["https://example.com/same", "https://example.com/edited", "https://example.com/rewritten", "https://example.com/gone"]
+    headers = {"ETag": '"v1"'}
+
+    async def run(pages, statuses=None):
+        tracker = ChangeTracker(index, "test", threshold=6)
+        await tracker.load(urls)
+        classified = {
+            url: tracker.classify(url, (statuses or {}).get(url, 200), headers, content_fingerprint(text))[0]
+            for url, text in pages.items()
+        }
+        await tracker.flush(force=True)
+        return tracker, classified
+
+    _, first = asyncio.run(run({url: ARTICLE for url in urls}))
+    assert set(first.values()) == {NEW}
+
+    tracker, second = asyncio.run(run({
+        urls[0]: ARTICLE,
+        urls[1]: ARTICLE.replace("Paragraph 7 ", "Paragraph seven "),
+        urls[2]: "An entirely different page about gardening, tomatoes and soil.",
+        urls[3]: "Not found",
+    }, statuses={urls[3]: 404}))
+    assert second == {urls[0]: UNCHANGED, urls[1]: UNCHANGED, urls[2]: CHANGED, urls[3]: REMOVED}
+    assert (tracker.summary.unchanged, tracker.summary.changed, tracker.summary.removed) == (2, 1, 1)
+    assert tracker.validators(urls[0]).etag == '"v1"'
+
+    records = index.get_many("test", urls)
+    assert urls[3] not in records
+    # A page counted as unchanged keeps the stored baseline so drift still adds up
+    assert records[urls[1]].simhash == simhash(" ".join(ARTICLE.split()))
+    assert index.get_many("other", urls) == {}
+
+
+def test_error_pages_never_become_the_baseline(tmp_path):
+    index = FingerprintIndex(str(tmp_path / "fingerprints.db"))
+    url = "https://example.com/account"
+
+    async def run(status, text):
+        tracker = ChangeTracker(index, "test", threshold=6)
+        await tracker.load([url])
+        fingerprint = content_fingerprint(text) if 200 <= status < 300 else None
+        status, _ = tracker.classify(url, status, {}, fingerprint)
+        await tracker.flush(force=True)
+        return status, tracker.summary
+
+    assert asyncio.run(run(403, "Access denied"))[0] == UNAVAILABLE
+    assert index.get_many("test", [url]) == {}
+    assert asyncio.run(run(200, ARTICLE))[0] == NEW
+    status, summary = asyncio.run(run(401, "Please log in"))
+    assert status == UNAVAILABLE and summary.unavailable == 1
+    assert asyncio.run(run(200, ARTICLE))[0] == UNCHANGED
+
+
+class FakePages(CrawlerService):
+    """Serves each URL's (status, markdown) from ``pages`` without a browser"""
+
+    def __init__(self, fingerprints):
+        super().__init__(scheduler=HostScheduler(), fingerprints=fingerprints)
+        self.pages = {}
+
+    async def crawl_url(self, request, budget=None, max_attempts=None):
+        url = str(request.url)
+        status, markdown = self.pages[url]
+        metadata = CrawlMetadata(crawl_time=datetime.utcnow(), status_code=status, headers={}, final_url=url)
+        return BaseCrawlResponse(url=url, markdown=markdown, metadata=metadata)
+
+
+def test_incremental_batches_report_every_page(tmp_path):
+    service = FakePages(FingerprintIndex(str(tmp_path / "fingerprints.db")))
+    urls = [f"https://example.com/{name}" for name in ("a", "b", "never", "blocked")]
+    request = BatchCrawlRequest(urls=urls, incremental=True, recrawl_set="test")
+
+    async def run(pages):
+        service.pages.update({f"https://example.com/{name}": page for name, page in pages.items()})
+        items = [item async for item in service.crawl_batch_stream(request)]
+        results = {str(item.url): item for item in items if isinstance(item, URLResult)}
+        return results, items[-1]
+
+    results, trailer = asyncio.run(run({
+        "a": (200, ARTICLE), "b": (200, "Page b"), "never": (404, "Not found"), "blocked": (403, "Access denied")
+    }))
+    assert isinstance(trailer, BatchMetadata)
+    assert {url.rsplit("/", 1)[1]: item.change_status for url, item in results.items()} == {
+        "a": NEW, "b": NEW, "never": MISSING, "blocked": UNAVAILABLE
+    }
+    assert results[urls[3]].markdown == ""
+    changes = trailer.changes
+    assert (changes.new, changes.missing, changes.unavailable) == (2, 1, 1)
+
+    # A block page in front of an indexed URL leaves its baseline alone
+    results, trailer = asyncio.run(run({"a": (403, "Access denied"), "blocked": (200, "Now public")}))
+    assert {url.rsplit("/", 1)[1]: item.change_status for url, item in results.items()} == {
+        "a": UNAVAILABLE, "never": MISSING, "blocked": NEW
+    }
+    results, trailer = asyncio.run(run({"a": (200, ARTICLE)}))
+    assert urls[0] not in results and trailer.changes.unchanged == 3
@@ -0,0 +1,113 @@
+from datetime import datetime
+import asyncio
+
+import pytest
+
+from app.models.requests import BaseCrawlRequest, RetryConfig
+from app.models.responses import BaseCrawlResponse, CrawlMetadata
+from app.services.crawler import CrawlerService
+from app.services.retry import (
+    CrawlError, RetryBudget, RetryPolicy, classify_failure, is_retryable, is_retryable_status,
+)
+from app.services.scheduler import HostScheduler
+
+URL = "https://example.com/page"
+
+
+@pytest.mark.parametrize("status_code, retryable", [
+    (None, False), (200, False), (404, False), (403, False), (408, True), (425, True), (429, True), (500, True), (503, True),
+])
+def test_status_classification(status_code, retryable):
+    assert is_retryable_status(status_code) is retryable
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (asyncio.TimeoutError(), True),
+    (ConnectionResetError(), True),
+    (RuntimeError("net::ERR_CONNECTION_RESET at https://example.com"), True),
+    (RuntimeError("Target closed"), True),
+    (RuntimeError("net::ERR_NAME_NOT_RESOLVED at https://nowhere.invalid"), False),
+    (RuntimeError("net::ERR_CERT_DATE_INVALID"), False),
+    (RuntimeError("something odd happened"), False),
+    (ValueError("bad input"), False),
+    (CrawlError("HTTP 503", 503, retryable=True), True),
+])
+def test_exception_classification(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_failed_results_are_classified_by_status_before_message():
+    assert classify_failure("Timeout waiting for page", 404) is False
+    assert classify_failure("anything", 502) is True
+    assert classify_failure("ERR_NAME_NOT_RESOLVED", 503) is False
+    assert classify_failure("navigation timed out") is True
+
+
+def test_backoff_is_jittered_within_bounds_and_honors_retry_after():
+    policy = RetryPolicy(RetryConfig(min_delay=1.0, max_delay=8.0))
+    for attempt, ceiling in ((1, 1.0), (2, 2.0), (3, 4.0), (6, 8.0)):
+        delays = [policy.delay(attempt) for _ in range(50)]
+        assert all(1.0 <= delay <= ceiling for delay in delays)
+    assert policy.delay(1, retry_after=5.0) == 5.0
+    # Retry-After is capped by max_delay
+    assert policy.delay(1, retry_after=60.0) == 8.0
+    assert RetryPolicy(RetryConfig(min_delay=1.0, max_delay=8.0, exponential=False)).delay(5) == 1.0
+
+
+def test_budget_allows_retries_in_proportion_to_first_attempts():
+    budget = RetryBudget(ratio=0.2, min_retries=2, max_tokens=3)
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+    for _ in range(5):
+        budget.record_attempt()
+    assert budget.try_spend() and not budget.try_spend()
+    for _ in range(100):
+        budget.record_attempt()
+    # Quiet periods cannot bank more than max_tokens
+    assert sum(budget.try_spend() for _ in range(10)) == 3
+    assert (budget.retries, budget.exhausted) == (6, 9)
+
+
+class ScriptedCrawls(CrawlerService):
+    """Raises the scripted errors in turn, then returns a page"""
+
+    def __init__(self, errors):
+        super().__init__(scheduler=HostScheduler())
+        self.errors = list(errors)
+        self.attempts = 0
+
+    async def _crawl_uncached(self, request):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        metadata = CrawlMetadata(crawl_time=datetime.utcnow(), status_code=200, headers={}, final_url=URL)
+        return BaseCrawlResponse(url=URL, markdown="page", metadata=metadata)
+
+
+def _crawl(service, budget, max_attempts=3):
+    request = BaseCrawlRequest(url=URL, no_cache=True, retry_config=RetryConfig(max_attempts=max_attempts, min_delay=0.0, max_delay=0.0))
+    return asyncio.run(service.crawl_url(request, budget))
+
+
+def test_transient_failures_are_retried_up_to_max_attempts():
+    service = ScriptedCrawls([CrawlError("HTTP 503", 503, retryable=True)] * 2)
+    response = _crawl(service, RetryBudget(min_retries=10))
+    assert service.attempts == 3 and response.metadata.attempt_count == 3
+
+    service = ScriptedCrawls([CrawlError("HTTP 503", 503, retryable=True)] * 5)
+    with pytest.raises(CrawlError) as failed:
+        _crawl(service, RetryBudget(min_retries=10))
+    assert service.attempts == 3 and failed.value.attempt_count == 3
+
+
+def test_permanent_failures_and_an_empty_budget_stop_retries():
+    service = ScriptedCrawls([RuntimeError("net::ERR_NAME_NOT_RESOLVED")])
+    with pytest.raises(CrawlError) as failed:
+        _crawl(service, RetryBudget(min_retries=10))
+    assert service.attempts == 1 and failed.value.retryable is False
+
+    budget = RetryBudget(ratio=0.0, min_retries=0)
+    service = ScriptedCrawls([CrawlError("HTTP 429", 429, retryable=True)])
+    with pytest.raises(CrawlError):
+        _crawl(service, budget)
+    assert service.attempts == 1 and budget.exhausted == 1
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import asyncio
+import time
+
+import pytest
+
+from app.models.requests import BaseCrawlRequest, RetryConfig
+from app.models.responses import BaseCrawlResponse, CrawlMetadata
+from app.services.crawler import CrawlerService
+from app.services.retry import CrawlError, RetryBudget
+from app.services.scheduler import HostScheduler, parse_retry_after
+
+URL = "https://example.com/page"
+
+
+def _scheduler(**kwargs) -> HostScheduler:
+    options = {"initial_host_limit": 2, "max_host_limit": 8, "min_host_delay": 0.0, "latency_factor": 3.0}
+    options.update(kwargs)
+    return HostScheduler(**options)
+
+
+def _limit(scheduler: HostScheduler) -> float:
+    return scheduler.stats()["hosts"]["example.com"]["limit"]
+
+
+def test_limit_grows_additively_and_halves_on_throttling():
+    async def scenario():
+        scheduler = _scheduler()
+        for _ in range(6):
+            await scheduler.report(URL, 0.1, status_code=200)
+        grown = _limit(scheduler)
+        await scheduler.report(URL, None, status_code=429)
+        throttled = _limit(scheduler)
+        await scheduler.report(URL, None, error=True)
+        return grown, throttled, scheduler.stats()["hosts"]["example.com"]
+
+    grown, throttled, host = asyncio.run(scenario())
+    assert 3.5 < grown < 4.5
+    assert throttled == pytest.approx(grown / 2, abs=0.01)
+    assert host["limit"] == pytest.approx(throttled / 2, abs=0.01)
+    assert (host["successes"], host["throttles"], host["errors"]) == (6, 1, 1)
+
+
+def test_latency_floors_are_kept_per_fetch_tier():
+    async def scenario():
+        scheduler = _scheduler(initial_host_limit=4)
+        await scheduler.report(URL, 0.02, status_code=200, tier="http")
+        # Renders are far slower than the plain GET but normal for the browser tier
+        for _ in range(5):
+            await scheduler.report(URL, 1.5, status_code=200, tier="browser")
+        steady = _limit(scheduler)
+        # A real spike on the browser tier still backs off
+        for _ in range(10):
+            await scheduler.report(URL, 20.0, status_code=200, tier="browser")
+        return steady, _limit(scheduler), scheduler.stats()["hosts"]["example.com"]["latency_ewma_seconds"]
+
+    steady, spiked, ewma = asyncio.run(scenario())
+    assert steady > 4
+    assert spiked < steady
+    assert set(ewma) == {"http", "browser"}
+
+
+def test_unknown_latency_does_not_move_the_floor():
+    async def scenario():
+        scheduler = _scheduler()
+        await scheduler.report(URL, None, status_code=404)
+        await scheduler.report(URL, 1.0, status_code=200)
+        return scheduler._host("example.com")
+
+    state = asyncio.run(scenario())
+    assert state.latency_floor == {"browser": 1.0}
+
+
+def test_slots_respect_the_host_limit_and_retry_after():
+    async def scenario():
+        scheduler = _scheduler(initial_host_limit=2)
+        active = peak = 0
+
+        async def request():
+            nonlocal active, peak
+            async with scheduler.slot(URL):
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(request() for _ in range(8)))
+        await scheduler.report(URL, None, status_code=503, retry_after=0.2)
+        started = time.monotonic()
+        async with scheduler.slot(URL):
+            waited = time.monotonic() - started
+        return peak, waited
+
+    peak, waited = asyncio.run(scenario())
+    assert peak == 2
+    assert waited >= 0.15
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(None) is None and parse_retry_after("soon") is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= parse_retry_after(later) <= 30
+
+
+def test_reported_fetch_time_excludes_retry_backoff():
+    class FlakyCrawls(CrawlerService):
+        def __init__(self):
+            super().__init__(scheduler=_scheduler())
+            self.attempts = 0
+
+        async def _crawl_uncached(self, request):
+            self.attempts += 1
+            if self.attempts == 1:
+                raise CrawlError("HTTP 503", 503, retryable=True)
+            await asyncio.sleep(0.01)
+            metadata = CrawlMetadata(crawl_time=datetime.utcnow(), status_code=200, headers={}, final_url=URL, fetch_tier="http")
+            return BaseCrawlResponse(url=URL, markdown="page", metadata=metadata)
+
+    async def scenario():
+        service = FlakyCrawls()
+        request = BaseCrawlRequest(url=URL, no_cache=True, retry_config=RetryConfig(min_delay=0.2, max_delay=0.2))
+        return await service.crawl_url(request, RetryBudget(min_retries=5))
+
+    metadata = asyncio.run(scenario()).metadata
+    assert metadata.attempt_count == 2
+    assert metadata.elapsed_seconds >= 0.2
+    assert metadata.fetch_seconds < 0.1
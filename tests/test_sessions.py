@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from app.models.requests import CreateSessionRequest
+from app.services.session import SessionLimitError, SessionService
+
+
+class FakeBrowser:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeSessions(SessionService):
+    """Sessions whose browsers are stand-ins; ``gate`` holds launches until it is set"""
+
+    def __init__(self, **kwargs):
+        super().__init__(sweep_interval=0, **kwargs)
+        self.launched = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def _launch(self, session):
+        await self.gate.wait()
+        session.crawler = FakeBrowser(f"{session.session_id}-{len(self.launched)}")
+        self.launched.append(session.crawler)
+
+    async def _login(self, session, config):
+        pass
+
+
+def _create(service, session_id):
+    return service.create_session(CreateSessionRequest(session_id=session_id, login_url="https://example.com/login"))
+
+
+def test_logout_waits_for_in_flight_crawls(tmp_path):
+    async def scenario():
+        service = FakeSessions(store_dir=str(tmp_path))
+        await _create(service, "s1")
+        async with service.use("s1") as session:
+            browser = session.crawler
+            assert await service.close_session("s1")
+            assert not browser.closed and service.stats()["retiring"] == 1
+        assert browser.closed and service.stats()["retiring"] == 0
+        assert not await service.exists("s1")
+
+    asyncio.run(scenario())
+
+
+def test_logging_in_again_retires_the_old_browser_after_its_crawls(tmp_path):
+    async def scenario():
+        service = FakeSessions(store_dir=str(tmp_path))
+        await _create(service, "s1")
+        async with service.use("s1") as old:
+            old_browser = old.crawler
+            await _create(service, "s1")
+            assert not old_browser.closed
+            async with service.use("s1") as new:
+                assert new.crawler is not old_browser
+        assert old_browser.closed
+        assert [b.closed for b in service.launched] == [True, False]
+
+    asyncio.run(scenario())
+
+
+def test_browsers_launch_outside_the_lock(tmp_path):
+    async def scenario():
+        service = FakeSessions(store_dir=str(tmp_path), max_live=3)
+        await _create(service, "fast")
+        service.gate.clear()
+        slow = asyncio.create_task(_create(service, "slow"))
+        await asyncio.sleep(0.01)
+        # Other sessions can be closed and borrowed while a browser is starting
+        async with service.use("fast"):
+            pass
+        assert await asyncio.wait_for(service.close_session("fast"), 1)
+        assert not slow.done()
+        service.gate.set()
+        await slow
+        assert service.stats()["live"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_crawls_revive_a_session_once(tmp_path):
+    async def scenario():
+        first = FakeSessions(store_dir=str(tmp_path))
+        await _create(first, "s1")
+        await first.close()
+
+        service = FakeSessions(store_dir=str(tmp_path))
+        service.gate.clear()
+
+        async def crawl():
+            async with service.use("s1") as session:
+                return session.crawler
+
+        crawls = [asyncio.create_task(crawl()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        service.gate.set()
+        browsers = await asyncio.gather(*crawls)
+        assert len(service.launched) == 1 and all(b is browsers[0] for b in browsers)
+        assert service.stats()["restored"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_starting_browsers_count_against_max_live(tmp_path):
+    async def scenario():
+        service = FakeSessions(store_dir=str(tmp_path), max_live=1)
+        service.gate.clear()
+        slow = asyncio.create_task(_create(service, "s1"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(SessionLimitError):
+            await _create(service, "s2")
+        service.gate.set()
+        await slow
+        assert len(service.launched) == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,99 @@
+from datetime import datetime
+import asyncio
+
+import pytest
+
+from app.models.requests import BaseCrawlRequest
+from app.models.responses import BaseCrawlResponse, CrawlMetadata
+from app.services.cache import ResponseCache
+from app.services.crawler import CrawlerService
+from app.services.scheduler import HostScheduler
+from app.services.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    calls = []
+
+    async def scenario():
+        flight = SingleFlight()
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "page"
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(10)), flight.do("other", work))
+        return results, flight.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert results == ["page"] * 11
+    assert len(calls) == 2
+    assert stats == {"inflight": 0, "leaders": 2, "followers": 9}
+
+
+def test_failures_reach_every_caller_and_are_not_remembered():
+    async def scenario():
+        flight = SingleFlight()
+        attempts = []
+
+        async def failing():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        outcomes = await asyncio.gather(*(flight.do("key", failing) for _ in range(3)), return_exceptions=True)
+        # The next call after a failure starts over
+        again = await asyncio.gather(flight.do("key", failing), return_exceptions=True)
+        return outcomes + again, attempts
+
+    outcomes, attempts = asyncio.run(scenario())
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert len(attempts) == 2
+
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_work():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "page"
+
+        leader = asyncio.create_task(flight.do("key", work))
+        follower = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "page"
+
+
+def test_identical_crawls_are_coalesced_and_copied_per_caller():
+    class CountingCrawls(CrawlerService):
+        def __init__(self):
+            super().__init__(
+                cache=ResponseCache(memory_max_bytes=1 << 20, disk_path=None, disk_max_bytes=0, default_ttl=60),
+                singleflight=SingleFlight(),
+                scheduler=HostScheduler(),
+            )
+            self.renders = 0
+
+        async def _crawl_uncached(self, request):
+            self.renders += 1
+            await asyncio.sleep(0.05)
+            url = str(request.url)
+            metadata = CrawlMetadata(crawl_time=datetime.utcnow(), status_code=200, headers={}, final_url=url)
+            return BaseCrawlResponse(url=url, markdown="page", metadata=metadata)
+
+    async def scenario():
+        service = CountingCrawls()
+        request = BaseCrawlRequest(url="https://example.com/a", no_cache=True)
+        responses = await asyncio.gather(*(service.crawl_url(request) for _ in range(5)))
+        return service, responses
+
+    service, responses = asyncio.run(scenario())
+    assert service.renders == 1
+    responses[0].markdown = "changed by one caller"
+    assert all(response.markdown == "page" for response in responses[1:])
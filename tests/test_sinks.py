@@ -0,0 +1,78 @@
+from datetime import datetime
+import asyncio
+import gzip
+import json
+import os
+
+from app.config import settings
+from app.models.requests import SinkConfig
+from app.models.responses import CrawlMetadata, URLError, URLResult
+from app.services.sinks import MANIFEST_NAME, LocalStore, ResultSink
+
+
+def _items(count: int):
+    for i in range(count):
+        url = f"https://example.com/{i}"
+        if i % 10 == 9:
+            yield URLError(url=url, error="HTTP 500", attempt_count=1, last_attempt=datetime.utcnow(), status_code=500)
+        else:
+            yield URLResult(
+                url=url,
+                # Incompressible enough that parts roll over at the size limit
+                markdown=os.urandom(4096).hex(),
+                metadata=CrawlMetadata(crawl_time=datetime.utcnow(), status_code=200, headers={}, final_url=url),
+            )
+
+
+def _read_lines(path: str):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_parts_roll_over_and_the_manifest_lists_them(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "sink_buffer_bytes", 64 * 1024)
+    store = LocalStore(str(tmp_path))
+
+    async def write():
+        sink = ResultSink("job-1", SinkConfig(format="jsonl", compression="gzip", max_file_mb=1), store=store)
+        for item in _items(300):
+            await sink.write(item)
+        return await sink.close(None)
+
+    manifest = asyncio.run(write())
+    assert (manifest.records, manifest.succeeded, manifest.failed) == (300, 270, 30)
+    assert len(manifest.files) >= 2
+    assert [f.uri.rsplit("/", 1)[1] for f in manifest.files] == [f"part-{i:05d}.jsonl.gz" for i in range(len(manifest.files))]
+    # Every part but the last reached the size limit
+    assert all(f.bytes >= 1024 * 1024 for f in manifest.files[:-1])
+
+    lines = []
+    for part in manifest.files:
+        records = _read_lines(part.uri[len("file://"):])
+        assert len(records) == part.records
+        lines.extend(records)
+    assert [line["data"]["url"] for line in lines] == [f"https://example.com/{i}" for i in range(300)]
+    assert sum(line["type"] == "error" for line in lines) == 30
+
+    with open(tmp_path / "job-1" / MANIFEST_NAME) as f:
+        document = json.load(f)
+    assert document["job_id"] == "job-1" and len(document["files"]) == len(manifest.files)
+    assert os.listdir(store.spool_dir) == []
+
+
+def test_abort_removes_stored_parts(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "sink_buffer_bytes", 64 * 1024)
+    store = LocalStore(str(tmp_path))
+
+    async def write_and_abort():
+        sink = ResultSink("job-2", SinkConfig(format="jsonl", compression="none", max_file_mb=1), store=store)
+        for item in _items(200):
+            await sink.write(item)
+        stored = len(sink.files)
+        await sink.abort()
+        return stored
+
+    assert asyncio.run(write_and_abort()) >= 1
+    assert os.listdir(tmp_path / "job-2") == []
+    assert os.listdir(store.spool_dir) == []